@@ -1,78 +1,109 @@
-from flask import Flask, request, jsonify, render_template, Response
+from flask import Flask, request, jsonify, render_template, Response, send_file
 import sqlite3
 import json
 import os
 import sys
 from pathlib import Path
-import importlib
 import traceback
 import threading
 import uuid
 import time
 
 # 导入配置
-from config import JOURNAL_CONFIGS, MAX_REQUEST_TIMEOUT, MAX_PLAYWRIGHT_WAIT_MS, CLASH_API_CONFIG, CLASH_EXCLUDE_KEYWORDS
+from config import JOURNAL_CONFIGS, MAX_REQUEST_TIMEOUT, MAX_PLAYWRIGHT_WAIT_MS, CLASH_API_CONFIG, CLASH_EXCLUDE_KEYWORDS, DATABASE_PATH, DB_READ_POOL_SIZE, DB_MMAP_SIZE, DB_CACHE_SIZE_KB, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS, COLUMNAR_SEARCH_ENABLED, SEARCH_ENGINE_DEFAULT, RELEVANCE_SEARCH_ENABLED, RELEVANCE_INDEX_DIR, RELEVANCE_DEFAULT_LIMIT, RELEVANCE_DELTA_LIMIT, BATCH_ERROR_HISTORY, BATCH_PROGRESS_KEEPALIVE_SECONDS, HTTP_CACHE_CONTROL, HTTP_COMPRESS_MIN_BYTES, HTTP_GZIP_LEVEL, HTTP_BROTLI_QUALITY, PROFILING_ENABLED, PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_SAMPLE_INTERVAL, ENRICH_BATCH_SIZE, ENRICH_WORKERS, ENRICH_RATE_PER_MINUTE, ENRICH_MAX_ATTEMPTS, POLL_ENABLED, POLL_INITIAL_INTERVAL_SECONDS, POLL_MIN_INTERVAL_SECONDS, POLL_MAX_INTERVAL_SECONDS, ABSTRACT_COMPRESSION, ABSTRACT_ZSTD_LEVEL, ABSTRACT_MIN_BYTES
 from crawlers.base_crawler import BaseJournalCrawler
 from parsers.base_parser import BaseJournalParser
-from utils.clash_manager import ClashManager
+from utils.db import Database
+from utils.cache import QueryCache, normalize_payload
+from utils.stats import read_journal_totals, read_period_stats
+from utils.ingest import normalize_doi, upsert_articles
+from utils.dedup import read_clusters
+from utils import alerts
+from utils import enrich
+from utils.progress import BatchTask
+from utils.journal_meta import read_journal_meta, sync_journal_meta
+from utils import metrics
+from utils.http_cache import HttpCaching
+from utils.profiling import Profiler, new_profile_id
+from utils.plugins import PluginRegistry
+from utils.polling import PollScheduler
+from utils.migrations import BackfillRunner, run_migrations
+from utils import columnar, facets, relevance
+from utils.articles import build_search_conditions, fetch_articles
+from utils.compression import configure as configure_compression, decode_abstract
 
 app = Flask(__name__)
-DATABASE = 'databases/journals.db'
+DATABASE = DATABASE_PATH
 COOKIE_DIR = 'cookies'
 # 确保cookie目录存在
 os.makedirs(COOKIE_DIR, exist_ok=True)
 os.makedirs(os.path.dirname(DATABASE), exist_ok=True)
-
+# 摘要压缩: 新写入的摘要是否压缩；读取时总能解压已压缩的行
+configure_compression(write=ABSTRACT_COMPRESSION, level=ABSTRACT_ZSTD_LEVEL, min_bytes=ABSTRACT_MIN_BYTES)
+db = Database(DATABASE, read_pool_size=DB_READ_POOL_SIZE, mmap_size=DB_MMAP_SIZE, cache_size_kb=DB_CACHE_SIZE_KB)
+query_cache = QueryCache(lambda: db.generation, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl_seconds=QUERY_CACHE_TTL_SECONDS)
+http_caching = HttpCaching(
+    app, lambda: db.generation, lambda: db.last_modified, cache_control=HTTP_CACHE_CONTROL,
+    compress_min_bytes=HTTP_COMPRESS_MIN_BYTES, gzip_level=HTTP_GZIP_LEVEL, brotli_quality=HTTP_BROTLI_QUALITY,
+)
+profiler = Profiler(PROFILE_DIR, max_files=PROFILE_MAX_FILES, sample_interval=PROFILE_SAMPLE_INTERVAL)
+if PROFILING_ENABLED:
+    profiler.init_app(app)
+
+# 爬虫/解析器注册表，第一次爬取某期刊时才导入对应模块（Playwright、bs4）
+plugins = PluginRegistry(JOURNAL_CONFIGS)
 # 用于存储批量任务状态的全局字典
 batch_tasks = {}
+# 后台回填任务，由 start_backfills() 创建
+backfill_runner = None
+# 列式搜索引擎，第一次以 engine=columnar 搜索时加载
+columnar_engine = None
+columnar_engine_lock = threading.Lock()
+# BM25 相关度索引，启动后在后台加载（或首次构建）
+relevance_index = None
+relevance_index_lock = threading.Lock()
+
 def init_db():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    # c.execute("DROP TABLE IF EXISTS journals")  # 移除每次启动时清空数据库的操作
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS journals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        journal_code TEXT NOT NULL,
-        title TEXT NOT NULL,
-        url TEXT NOT NULL UNIQUE,
-        doi TEXT,
-        date TEXT,
-        authors TEXT,
-        abstract TEXT,
-        date_iso TEXT
-        )
-    ''')
-    # Add date_iso column if it doesn't exist for backward compatibility
-    try:
-        c.execute("ALTER TABLE journals ADD COLUMN date_iso TEXT")
-        conn.commit()
-    except sqlite3.OperationalError:
-        pass # Column already exists
-
-    # Backfill date_iso for existing rows
-    c.execute("SELECT id, date FROM journals WHERE date_iso IS NULL")
-    rows_to_update = c.fetchall()
-    if rows_to_update:
-        print(f"Backfilling date_iso for {len(rows_to_update)} rows...")
-        from datetime import datetime
-        for row_id, date_str in rows_to_update:
-            if date_str:
-                try:
-                    # This is where the conversion happens
-                    date_iso = datetime.strptime(date_str, '%B %d, %Y').strftime('%Y-%m-%d')
-                    c.execute("UPDATE journals SET date_iso = ? WHERE id = ?", (date_iso, row_id))
-                except (ValueError, TypeError):
-                    pass # Skip rows with invalid date format
-        conn.commit()
-        print("Backfilling complete.")
-
-    conn.close()
+    """执行未完成的结构迁移（很快），耗时的数据回填交给 start_backfills() 在后台完成。"""
+    with db.write() as conn:
+        applied = run_migrations(conn)
+        synced = sync_journal_meta(conn, JOURNAL_CONFIGS)
+    if applied:
+        print(f"Applied migrations: {applied}")
+    if synced:
+        print(f"Synced {synced} journal configs into journal_meta")
+
+def _poll_fetch(journal_code, url):
+    # 后台轮询只用无头模式，不弹出浏览器窗口
+    html_content, _, error = plugins.crawler(journal_code).crawl_page(url, cookie_dir=COOKIE_DIR, headed_fallback=False)
+    if error:
+        raise Exception(str(error))
+    if not html_content:
+        raise Exception("未获取到HTML内容")
+    return html_content
+
+def _poll_ingest(journal_code, html_content):
+    return store_articles(plugins.parser(journal_code).parse_html(html_content))
+
+# 当前期/ASAP 定时轮询，POLL_ENABLED 时随服务启动
+poll_scheduler = PollScheduler(
+    db, JOURNAL_CONFIGS, _poll_fetch, _poll_ingest, initial_interval=POLL_INITIAL_INTERVAL_SECONDS,
+    min_interval=POLL_MIN_INTERVAL_SECONDS, max_interval=POLL_MAX_INTERVAL_SECONDS,
+)
+
+def start_backfills():
+    global backfill_runner
+    backfill_runner = BackfillRunner(db)
+    backfill_runner.start()
+    return backfill_runner
 
 @app.route('/')
+@http_caching.conditional(static=True)
 def index():
     return render_template('index.html', journal_configs=JOURNAL_CONFIGS)
 
 @app.route('/batch_crawl_page')
+@http_caching.conditional(static=True)
 def batch_crawl_page():
     return render_template('batch_crawl.html')
 
@@ -96,11 +127,9 @@ def crawl():
         return jsonify({"status": "error", "message": f"Unknown journal code: {journal_code}"}), 400
 
     try:
-        # 动态导入爬虫类
-        crawler_module = importlib.import_module("crawlers.acs_crawler")
-        CrawlerClass = getattr(crawler_module, config["crawler_class"])
-        crawler_instance: BaseJournalCrawler = CrawlerClass(config)
-        print(f"爬虫类: {CrawlerClass}")  # 添加日志
+        # 爬虫和解析器在第一次使用时导入，按期刊缓存实例
+        crawler_instance: BaseJournalCrawler = plugins.crawler(journal_code)
+        print(f"爬虫类: {type(crawler_instance)}")  # 添加日志
         
         html_content, cookies, error = crawler_instance.crawl_page(target_url, cookie_dir=COOKIE_DIR, headless=False) # 允许自动切换到非无头模式
         print(f"从 {target_url} 获取到的 HTML 内容长度: {len(html_content) if html_content else 0}")  # 添加日志
@@ -114,116 +143,206 @@ def crawl():
         if not html_content:
             return jsonify({"status": "error", "message": f"未从 {target_url} 获取到 HTML 内容"}), 500
         
-        # 动态导入解析器类
-        parser_module = importlib.import_module(config['parser_module'])
-        ParserClass = getattr(parser_module, "AcsJournalParser")  # 直接使用正确的类名
-        parser_instance: BaseJournalParser = ParserClass(config)
+        parser_instance: BaseJournalParser = plugins.parser(journal_code)
         
         journal_articles = parser_instance.parse_html(html_content)
         
         # 存储到数据库
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
-        inserted_count = 0
-        updated_count = 0
-        for article in journal_articles:
-            from datetime import datetime
-            date_iso = None
-            try:
-                date_iso = datetime.strptime(article['date'], '%B %d, %Y').strftime('%Y-%m-%d')
-            except (ValueError, TypeError):
-                pass
-
-            # 使用 INSERT OR REPLACE 实现 UPSERT 功能
-            c.execute(
-                "INSERT OR REPLACE INTO journals (journal_code, title, url, doi, date, authors, abstract, date_iso) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (article['journal_code'], article['title'], article['url'], article['doi'], article['date'], article['authors'], article['abstract'], date_iso)
-            )
-            
-            # 检查是否是新插入还是更新
-            if c.lastrowid:
-                inserted_count += 1
-                print(f"新增文章: {article['title'][:50]}...")
-            else:
-                updated_count += 1
-                print(f"更新文章: {article['title'][:50]}...")
-        conn.commit()
-        conn.close()
-        
-        print(f"成功爬取并保存了 {inserted_count} 篇新文章，更新了 {updated_count} 篇文章")  # 添加日志
-        return jsonify({"status": "success", "message": f"Successfully crawled and saved {inserted_count} new articles and updated {updated_count} articles from {target_url}"})
+        counts = store_articles(journal_articles)
+        inserted_count = counts['inserted']
+        updated_count = counts['updated']
+        unchanged_count = counts['unchanged']
+
+        print(f"成功爬取并保存了 {inserted_count} 篇新文章，更新了 {updated_count} 篇文章，{unchanged_count} 篇未变化")  # 添加日志
+        return jsonify({
+            "status": "success",
+            "message": f"Successfully crawled and saved {inserted_count} new articles and updated {updated_count} articles ({unchanged_count} unchanged) from {target_url}",
+            "inserted": inserted_count,
+            "updated": updated_count,
+            "unchanged": unchanged_count,
+            "alert_matches": sum(counts['alerts'].values())
+        })
     except Exception as e:
         print(f"发生异常: {e}")  # 添加日志
         print(traceback.format_exc())  # 打印完整的 traceback 信息到控制台
         return jsonify({"status": "error", "message": f"服务器内部错误: {e}"}), 500
 
 @app.route('/search_page')
+@http_caching.conditional(static=True)
 def search_page():
     return render_template('search.html')
 
 @app.route('/journal_configs', methods=['GET'])
+@http_caching.conditional(static=True)
 def get_journal_configs():
     return jsonify(JOURNAL_CONFIGS)
 
-@app.route('/search', methods=['POST'])
+def _cache_bypass_requested(data=None):
+    """客户端可通过请求体 no_cache、查询参数 no_cache=1 或 Cache-Control: no-cache 跳过查询缓存。"""
+    if data and data.get('no_cache'):
+        return True
+    if request.args.get('no_cache') in ('1', 'true'):
+        return True
+    return 'no-cache' in request.headers.get('Cache-Control', '')
+
+def _cached_json(namespace, payload, compute):
+    bypass = _cache_bypass_requested(payload)
+    key = normalize_payload(payload, ignore_keys=('no_cache',))
+    result, cache_status = query_cache.get_or_compute(namespace, key, compute, bypass=bypass)
+    response = jsonify(result)
+    response.headers['X-Cache'] = cache_status
+    return response
+
+# GET /search 用查询参数传过滤条件，列表参数重复出现（?title_keywords=a&title_keywords=b），便于浏览器做条件请求
+_SEARCH_LIST_ARGS = ('title_keywords', 'author_keywords', 'abstract_keywords', 'journal_codes')
+
+def _search_args_from_query():
+    data = {key: request.args.getlist(key) for key in _SEARCH_LIST_ARGS if key in request.args}
+    data.update({key: value for key, value in request.args.items() if key not in _SEARCH_LIST_ARGS})
+    return data
+
+@app.route('/search', methods=['GET', 'POST'])
+@http_caching.conditional()
 def search():
-    data = request.json
-    
-    query = "SELECT j.journal_code, j.title, j.url, j.doi, j.date, j.authors, j.abstract, c.name as journal_name FROM journals j "
-    
-    # Dynamically generate a subquery for journal names to join
-    journal_names_subquery_parts = []
-    for code, config in JOURNAL_CONFIGS.items():
-        journal_names_subquery_parts.append(f"SELECT '{code}' as journal_code, '{config['name']}' as name")
-    
-    if journal_names_subquery_parts:
-        journal_names_subquery = " UNION ALL ".join(journal_names_subquery_parts)
-        query += f"LEFT JOIN ( {journal_names_subquery} ) c ON j.journal_code = c.journal_code"
-
-    conditions = []
-    params = []
-
-    # Date range
-    if data.get('date_from'):
-        conditions.append("j.date_iso >= ?")
-        params.append(data['date_from'])
-    if data.get('date_to'):
-        conditions.append("j.date_iso <= ?")
-        params.append(data['date_to'])
-
-    # Keywords
-    for field in ['title', 'author', 'abstract']:
-        keywords = data.get(f'{field}_keywords')
-        search_type = data.get(f'{field}_search_type', 'fuzzy')
-        if keywords:
-            field_conditions = []
-            for keyword in keywords:
-                if search_type == 'exact':
-                    field_conditions.append(f"j.{'authors' if field == 'author' else field} = ?")
-                    params.append(keyword)
-                else: # fuzzy
-                    field_conditions.append(f"j.{'authors' if field == 'author' else field} LIKE ?")
-                    params.append(f"%{keyword}%")
-            conditions.append(f"({' OR '.join(field_conditions)})")
-
-    # Journal codes
-    if data.get('journal_codes'):
-        placeholders = ','.join('?' for _ in data['journal_codes'])
-        conditions.append(f"j.journal_code IN ({placeholders})")
-        params.extend(data['journal_codes'])
-
+    data = (request.json or {}) if request.method == 'POST' else _search_args_from_query()
+    try:
+        facets.parse_request(data)
+        if data.get('sort') == 'relevance':
+            relevance_limit(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return _cached_json('search', data, lambda: run_search(data))
+
+def get_columnar_engine():
+    """返回列式搜索引擎；未启用或缺少 numpy 时返回 None。"""
+    global columnar_engine
+    if columnar_engine is None and COLUMNAR_SEARCH_ENABLED and columnar.available():
+        with columnar_engine_lock:
+            if columnar_engine is None:
+                engine = columnar.ColumnarSearchEngine(db)
+                engine.refresh(force=True)
+                columnar_engine = engine
+    return columnar_engine
+
+def get_relevance_index():
+    """返回 BM25 索引；未启用或缺少 numpy 时返回 None。"""
+    global relevance_index
+    if relevance_index is None and RELEVANCE_SEARCH_ENABLED and relevance.available():
+        with relevance_index_lock:
+            if relevance_index is None:
+                relevance_index = relevance.BM25Index(db, RELEVANCE_INDEX_DIR, delta_limit=RELEVANCE_DELTA_LIMIT)
+    return relevance_index
+
+def _scored_articles(scored):
+    """把 [(id, score)] 转为带 score 字段的文章列表；已删除的文章（后台重建完成前索引里还有）被跳过。"""
+    with db.read() as conn:
+        conn.execute("BEGIN")
+        ids = [row_id for row_id, _ in scored]
+        present = {row[0] for row in conn.execute(
+            f"SELECT id FROM journals WHERE id IN ({','.join('?' * len(ids))})", ids
+        )} if ids else set()
+        scored = [(row_id, score) for row_id, score in scored if row_id in present]
+        articles = fetch_articles(conn, [row_id for row_id, _ in scored])
+    for article, (_, score) in zip(articles, scored):
+        article['score'] = score
+    return articles
+
+def parse_limit(value, default):
+    """limit 类参数: 缺省时返回 default；不是正整数时抛出 ValueError（路由返回 400）。"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError("limit must be a positive integer") from None
+    if limit <= 0:
+        raise ValueError("limit must be a positive integer")
+    return limit
+
+def relevance_limit(data):
+    """sort=relevance 的 limit 参数，缺省为 RELEVANCE_DEFAULT_LIMIT。"""
+    return parse_limit(data.get('limit'), RELEVANCE_DEFAULT_LIMIT)
+
+def run_relevance_search(data):
+    """
+    sort=relevance: 按 BM25 分数排序。查询文本取 query 字段，缺省时用标题和摘要关键词拼接；
+    其余过滤条件照常生效，只返回有相关度分数的文章，最多 limit 篇。
+    没有可检索的词时返回 None，由调用方按日期排序。
+    """
+    query_text = data.get('query') or ' '.join((data.get('title_keywords') or []) + (data.get('abstract_keywords') or []))
+    if not relevance.tokenize(query_text):
+        return None
+    index = get_relevance_index()
+    if index is None:
+        return None
+    allowed_ids = None
+    conditions, params = build_search_conditions(data)
+    if conditions:
+        with db.read() as conn:
+            allowed_ids = [row[0] for row in conn.execute(
+                "SELECT j.id FROM journals j WHERE " + " AND ".join(conditions), params
+            )]
+    return _scored_articles(index.search(query_text, allowed_ids=allowed_ids, limit=relevance_limit(data)))
+
+def count_search_facets(data, fields, limit):
+    """只统计过滤条件下的分面（sort=relevance 时用）；有列式引擎时用它，否则由 SQLite 读一遍匹配行。"""
+    if data.get('engine', SEARCH_ENGINE_DEFAULT) == 'columnar':
+        engine = get_columnar_engine()
+        if engine is not None:
+            try:
+                return engine.facets(data, fields, limit)
+            except ValueError as e:
+                print(f"Columnar facet count failed, falling back to SQLite: {e}")
+    conditions, params = build_search_conditions(data)
+    with db.read() as conn:
+        return facets.count_sql(conn, conditions, params, fields, limit)
+
+def run_search(data):
+    """
+    按请求中的 engine（'sqlite' 或 'columnar'）执行搜索，两者返回相同的结果，便于对比。
+    请求了 facets 时返回 {"results": [...], "facets": {...}}，否则只返回文章列表。
+    """
+    facet_fields, facet_limit = facets.parse_request(data)
+    if data.get('sort') == 'relevance':
+        results = run_relevance_search(data)
+        if results is not None:
+            if facet_fields:
+                return {"results": results, "facets": count_search_facets(data, facet_fields, facet_limit)}
+            return results
+    if data.get('engine', SEARCH_ENGINE_DEFAULT) == 'columnar':
+        engine = get_columnar_engine()
+        if engine is not None:
+            try:
+                if facet_fields:
+                    ids, counts = engine.search_ids_with_facets(data, facet_fields, facet_limit)
+                    return {"results": engine.fetch_articles(ids.tolist()), "facets": counts}
+                return engine.search(data)
+            except ValueError as e:
+                # 例如无法解析的日期，交给 SQLite 处理
+                print(f"Columnar search failed, falling back to SQLite: {e}")
+    return run_sqlite_search(data, facet_fields, facet_limit)
+
+def run_sqlite_search(data, facet_fields=(), facet_limit=facets.DEFAULT_FACET_LIMIT):
+    """按 /search 的过滤条件查询数据库，返回文章字典列表；有 facet_fields 时在读取结果的同一遍中统计分面。"""
+    # 期刊名称来自启动时同步的 journal_meta，语句文本只随过滤条件的组合变化，可被语句缓存复用
+    query = (
+        "SELECT j.journal_code, j.title, j.url, j.doi, j.date, j.authors, j.abstract, m.name AS journal_name, "
+        "j.date_iso FROM journals j LEFT JOIN journal_meta m ON m.code = j.journal_code"
+    )
+
+    conditions, params = build_search_conditions(data)
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    query += " ORDER BY j.date_iso DESC, j.title ASC"
+    # id 作为最后的排序键，保证同日同名文章的顺序稳定（列式引擎的结果与之一致）
+    query += " ORDER BY j.date_iso DESC, j.title ASC, j.id ASC"
 
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute(query, params)
-    
-    filtered_journals = c.fetchall()
-    conn.close()
+    with db.read() as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        filtered_journals = c.fetchall()
 
+    counter = facets.FacetCounter(facet_fields, facet_limit) if facet_fields else None
     journal_list = []
     for journal in filtered_journals:
         journal_list.append({
@@ -233,24 +352,81 @@ def search():
             "doi": journal[3],
             "date": journal[4],
             "authors": journal[5],
-            "abstract": journal[6],
+            "abstract": decode_abstract(journal[6]),
             "journal_name": journal[7]
         })
-
-    return jsonify(journal_list)
-
+        if counter is not None:
+            counter.add(journal[0], journal[8], journal[5])
+    if counter is not None:
+        return {"results": journal_list, "facets": counter.result()}
+    return journal_list
+
+@app.route('/similar/<path:doi>', methods=['GET'])
+@http_caching.conditional()
+def similar_articles(doi):
+    """按 BM25 返回与给定 DOI 相似的文章。"""
+    doi = normalize_doi(doi) or doi
+    limit = request.args.get('limit', 10, type=int)
+    index = get_relevance_index()
+    if index is None:
+        return jsonify({"status": "error", "message": "Relevance index is not available (numpy required)."}), 503
+    with db.read() as conn:
+        row = conn.execute("SELECT id FROM journals WHERE doi = ?", (doi,)).fetchone()
+    if row is None:
+        return jsonify({"status": "error", "message": f"Unknown DOI: {doi}"}), 404
+    return _cached_json('similar', {"doi": doi, "limit": limit}, lambda: _scored_articles(index.more_like_this(row[0], limit=limit)))
+
+@app.route('/duplicates', methods=['GET'])
+def get_near_duplicates():
+    """返回最近一次 python -m utils.dedup scan 找到的近似重复簇。"""
+    limit = request.args.get('limit', 100, type=int)
+    with db.read() as conn:
+        return jsonify(read_clusters(conn, limit))
+
+@app.route('/saved_searches', methods=['GET'])
+def get_saved_searches():
+    with db.read() as conn:
+        return jsonify(alerts.list_saved_searches(conn))
+
+@app.route('/saved_searches', methods=['POST'])
+def create_saved_search():
+    """保存一个搜索: {"name": ..., "query": {与 /search 相同的过滤参数}}，之后每批入库的文章都会与之匹配。"""
+    data = request.json or {}
+    name = (data.get('name') or '').strip()
+    if not name:
+        return jsonify({"status": "error", "message": "Missing 'name'."}), 400
+    with db.write() as conn:
+        search_id = alerts.create_saved_search(conn, name, data.get('query') or {})
+    return jsonify({"status": "success", "id": search_id})
+
+@app.route('/saved_searches/<int:search_id>', methods=['DELETE'])
+def delete_saved_search(search_id):
+    with db.write() as conn:
+        deleted = alerts.delete_saved_search(conn, search_id)
+    if not deleted:
+        return jsonify({"status": "error", "message": f"Saved search {search_id} not found."}), 404
+    return jsonify({"status": "success"})
+
+@app.route('/feed', methods=['GET'])
+def get_feed():
+    """保存的搜索的新命中；客户端把返回的 last_id 作为下次的 since 参数。"""
+    since = request.args.get('since', 0, type=int)
+    search_id = request.args.get('search_id', type=int)
+    limit = request.args.get('limit', 100, type=int)
+    with db.read() as conn:
+        return jsonify(alerts.read_feed(conn, since=since, search_id=search_id, limit=limit))
 
 @app.route('/journals', methods=['GET'])
+@http_caching.conditional()
 def get_journals():
     journal_code = request.args.get('journal_code')
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    if journal_code:
-        c.execute("SELECT journal_code, title, url, doi, date, authors, abstract FROM journals WHERE journal_code = ? ORDER BY date DESC, title ASC", (journal_code,))
-    else:
-        c.execute("SELECT journal_code, title, url, doi, date, authors, abstract FROM journals ORDER BY date DESC, title ASC")
-    journals = c.fetchall()
-    conn.close()
+    with db.read() as conn:
+        c = conn.cursor()
+        if journal_code:
+            c.execute("SELECT journal_code, title, url, doi, date, authors, abstract FROM journals WHERE journal_code = ? ORDER BY date DESC, title ASC", (journal_code,))
+        else:
+            c.execute("SELECT journal_code, title, url, doi, date, authors, abstract FROM journals ORDER BY date DESC, title ASC")
+        journals = c.fetchall()
 
     journal_list = []
     for journal in journals:
@@ -261,33 +437,120 @@ def get_journals():
             "doi": journal[3],
             "date": journal[4],
             "authors": journal[5],
-            "abstract": journal[6]
+            "abstract": decode_abstract(journal[6])
         })
     return jsonify(journal_list)
 
 @app.route('/journal_stats', methods=['GET'])
+@http_caching.conditional()
 def get_journal_stats():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("SELECT journal_code, COUNT(*) FROM journals GROUP BY journal_code")
-    journal_counts = c.fetchall()
-    conn.close()
-
-    stats = []
-    for journal_code, count in journal_counts:
-        journal_name = JOURNAL_CONFIGS.get(journal_code, {}).get('name', 'Unknown')
-        stats.append({"journal_code": journal_code, "journal_name": journal_name, "count": count})
-    return jsonify(stats)
+    return _cached_json('journal_stats', {}, compute_journal_stats)
+
+def compute_journal_stats():
+    with db.read() as conn:
+        return read_journal_totals(conn)
+
+@app.route('/journal_meta', methods=['GET'])
+def get_journal_meta():
+    """数据库中登记的期刊（含已从配置中移除的，active 为 false）。"""
+    with db.read() as conn:
+        return jsonify(read_journal_meta(conn, include_inactive=True))
+
+@app.route('/journal_stats/periods', methods=['GET'])
+@http_caching.conditional()
+def get_journal_period_stats():
+    granularity = request.args.get('granularity', 'year')
+    journal_code = request.args.get('journal_code')
+    if granularity not in ('year', 'month'):
+        return jsonify({"status": "error", "message": "granularity must be 'year' or 'month'"}), 400
+
+    def compute():
+        with db.read() as conn:
+            return read_period_stats(conn, granularity, journal_code)
+    return _cached_json('journal_period_stats', {"granularity": granularity, "journal_code": journal_code}, compute)
 
 @app.route('/clear_db', methods=['POST'])
 def clear_db():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    c.execute("DELETE FROM journals")
-    conn.commit()
-    conn.close()
+    """删除全部文章及按文章 id 记录的状态；轮询指纹一并清空，下一次轮询会重新入库当前期和 ASAP。"""
+    with db.write() as conn:
+        conn.execute("DELETE FROM journals")
+        conn.execute("DELETE FROM search_feed")
+        conn.execute("DELETE FROM article_enrichment")
+        conn.execute("DELETE FROM near_duplicates")
+        conn.execute("UPDATE poll_state SET fingerprint = NULL, article_count = NULL")
     return jsonify({"status": "success", "message": "Database cleared successfully."})
 
+@app.route('/db_stats', methods=['GET'])
+def get_db_stats():
+    stats = db.stats()
+    if columnar_engine is not None:
+        stats["columnar"] = columnar_engine.stats()
+    if relevance_index is not None:
+        stats["relevance"] = relevance_index.stats()
+    return jsonify(stats)
+
+@app.route('/migrations/status', methods=['GET'])
+def get_migration_status():
+    with db.read() as conn:
+        version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+    return jsonify({
+        "schema_version": version,
+        "backfills": backfill_runner.progress if backfill_runner else {}
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 文本格式的爬取指标。"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    """已保存的剖析（最新的在前）。"""
+    return jsonify(profiler.list_profiles())
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    一份剖析中最热的函数。?limit= 返回条数；?sort= 对 cProfile 结果为 cumulative / tottime，
+    对采样结果为 inclusive / self。?download=1 下载原始文件（.prof 或 .folded）。
+    """
+    path = profiler.path_for(profile_id)
+    if path is None or not path.exists():
+        return jsonify({"status": "error", "message": "剖析不存在"}), 404
+    if request.args.get('download') == '1':
+        return send_file(path.resolve(), as_attachment=True, download_name=path.name)
+    try:
+        limit = min(parse_limit(request.args.get('limit'), 25), 500)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    sort = request.args.get('sort', 'cumulative')
+    return jsonify(profiler.top_functions(profile_id, limit=limit, sort=sort))
+
+@app.route('/cache_stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({**query_cache.stats(), "http": http_caching.stats()})
+
+@metrics.timed("store")
+def store_articles(journal_articles):
+    """
+    把解析出的文章写入数据库，在同一事务里用变化的行匹配保存的搜索。
+    列式引擎和 BM25 索引下次查询时按新的 id 和 row_version 自行同步。
+    """
+    with db.write() as conn:
+        counts = upsert_articles(conn, journal_articles)
+        counts['alerts'] = alerts.match_changed(conn, counts['changed_urls'])
+    return counts
+
+@metrics.timed("store")
+def store_enrichment(results):
+    """写入一批详情页补全结果；与 store_articles 一样匹配保存的搜索。补全状态单独提交，不使查询缓存失效。"""
+    with db.write() as conn:
+        counts = enrich.apply_details(conn, results)
+        counts['alerts'] = alerts.match_changed(conn, counts['changed_urls'])
+    with db.write(bump=False) as conn:
+        enrich.record_states(conn, counts.pop('states'))
+    return counts
+
 def validate_batch_params(data):
     """验证批量爬取参数"""
     try:
@@ -330,101 +593,148 @@ def generate_batch_urls(params):
             urls.append(url)
     return urls
 
-def run_crawl_task(task_id, urls, journal_code):
-    """在后台线程中运行的爬取任务"""
+def run_crawl_task(task_id, urls, journal_code, profile_mode=None, headed_fallback=True):
+    """
+    在后台线程中运行的爬取任务；本线程记录的爬取指标同时汇总到任务进度的 stage_summary 中。
+    profile_mode 为 'cprofile' 或 'sample' 时剖析整个任务，保存为任务的 profile_id。
+    """
     task = batch_tasks[task_id]
-    
-    config = JOURNAL_CONFIGS.get(journal_code)
-    
-    clash_manager = None
+    summary = metrics.StageSummary()
+    with metrics.collect(summary):
+        profiler.run(profile_mode, f"batch_crawl {journal_code} {task_id}",
+                     _crawl_urls, task, urls, journal_code, summary, headed_fallback, profile_id=task.get('profile_id'))
+
+def create_clash_manager(task):
+    """按 CLASH_API_CONFIG 创建节点切换器；未配置或初始化失败时返回 None（失败记入任务错误）。"""
     try:
         if CLASH_API_CONFIG and CLASH_API_CONFIG.get("api_base_url"):
-            clash_manager = ClashManager(
+            from utils.clash_manager import ClashManager  # 依赖 requests，只在批量爬取时导入
+            return ClashManager(
                 api_base_url=CLASH_API_CONFIG["api_base_url"],
                 secret=CLASH_API_CONFIG.get("secret")
             )
     except (ValueError, ConnectionError) as e:
         print(f"Failed to initialize Clash Manager: {e}. Proxy switching will be disabled.")
-        task['errors'].append({"url": "Clash Manager 初始化失败", "error": str(e)})
+        task.add_error("Clash Manager 初始化失败", str(e), "clash_init")
+    return None
+
+def _crawl_urls(task, urls, journal_code, summary, headed_fallback=True):
+    clash_manager = create_clash_manager(task)
+    try:
+        crawler_instance: BaseJournalCrawler = plugins.crawler(journal_code)
+        parser_instance: BaseJournalParser = plugins.parser(journal_code)
+    except Exception as e:
+        task.add_error("任务初始化失败", str(e), "init")
+        task.update(status='failed')
+        return
+
+    for url in urls:
+        if task['status'] == 'stopped':
+            break
+        crawl_url(task, url, journal_code, crawler_instance, parser_instance, summary, clash_manager, headed_fallback)
+
+    if task['status'] != 'stopped':
+        task.update(status='completed')
+
+def crawl_url(task, url, journal_code, crawler_instance, parser_instance, summary,
+              clash_manager=None, headed_fallback=True):
+    """
+    批量任务中的一个 URL: 切换节点 → 抓取 → 解析 → 入库，更新 task 的计数和进度，返回本页结果。
+    headed_fallback=False 时爬虫在无头模式失败后不再切换到有头模式（没有图形界面时）。可以在多个线程中并发调用。
+    """
+    page_start = time.perf_counter()
+    result = {"url": url, "ok": False, "stage": None, "error": None,
+              "articles": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+
+    # Switch proxy before crawling each URL
+    if clash_manager:
+        try:
+            with metrics.time_stage("proxy_switch"):
+                new_node = clash_manager.switch_to_random_proxy(
+                    CLASH_API_CONFIG["proxy_group"],
+                    exclude_keywords=CLASH_EXCLUDE_KEYWORDS
+                )
+            if new_node:
+                metrics.PROXY_SWITCHES.inc(result="ok")
+                task.update(current_proxy_node=new_node)
+            else:
+                metrics.PROXY_SWITCHES.inc(result="failed")
+                task.add_error(url, "Failed to switch to a new proxy node.", "proxy_switch")
+        except Exception as e:
+            print(f"Error switching proxy node: {e}")
+            metrics.PROXY_SWITCHES.inc(result="error")
+            task.add_error(url, f"Error switching proxy node: {e}", "proxy_switch")
+
+    task.update(current_url=url)
 
+    stage = "crawl"
     try:
-        crawler_module = importlib.import_module("crawlers.acs_crawler")
-        CrawlerClass = getattr(crawler_module, config["crawler_class"])
-        crawler_instance: BaseJournalCrawler = CrawlerClass(config)
+        html_content, _, error = crawler_instance.crawl_page(url, cookie_dir=COOKIE_DIR, headed_fallback=headed_fallback)
 
-        parser_module = importlib.import_module(config['parser_module'])
-        ParserClass = getattr(parser_module, "AcsJournalParser")
-        parser_instance: BaseJournalParser = ParserClass(config)
+        if error:
+            # 如果 crawl_page 内部的重试逻辑都失败了，才抛出异常
+            raise Exception(str(error))
 
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
+        if not html_content:
+            raise Exception("未获取到HTML内容")
 
-        for url in urls:
-            if task['status'] == 'stopped':
-                break
-            
-            # Switch proxy before crawling each URL
-            if clash_manager:
-                try:
-                    new_node = clash_manager.switch_to_random_proxy(
-                        CLASH_API_CONFIG["proxy_group"],
-                        exclude_keywords=CLASH_EXCLUDE_KEYWORDS
-                    )
-                    if new_node:
-                        task['current_proxy_node'] = new_node
-                    else:
-                        task['errors'].append({"url": url, "error": "Failed to switch to a new proxy node."})
-                except Exception as e:
-                    print(f"Error switching proxy node: {e}")
-                    task['errors'].append({"url": url, "error": f"Error switching proxy node: {e}"})
-
-            task['current_url'] = url
-            
-            try:
-                # 传入 headless=False 允许爬虫在无头模式失败时自动切换到交互模式
-                html_content, _, error = crawler_instance.crawl_page(url, cookie_dir=COOKIE_DIR, headless=False)
-                
-                if error:
-                    # 如果 crawl_page 内部的重试逻辑都失败了，才抛出异常
-                    raise Exception(str(error))
-
-                if not html_content:
-                    raise Exception("未获取到HTML内容")
-
-                journal_articles = parser_instance.parse_html(html_content)
-
-                for article in journal_articles:
-                    from datetime import datetime
-                    date_iso = None
-                    try:
-                        date_iso = datetime.strptime(article['date'], '%B %d, %Y').strftime('%Y-%m-%d')
-                    except (ValueError, TypeError):
-                        pass
-                    c.execute(
-                        "INSERT OR REPLACE INTO journals (journal_code, title, url, doi, date, authors, abstract, date_iso) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                        (article['journal_code'], article['title'], article['url'], article['doi'], article['date'], article['authors'], article['abstract'], date_iso)
-                    )
-                
-                conn.commit()
-                task['successful'] += 1
-            
-            except Exception as e:
-                task['failed'] += 1
-                task['errors'].append({"url": url, "error": str(e)})
-            
-            finally:
-                task['processed'] += 1
-                task['progress_percentage'] = round((task['processed'] / task['total_urls']) * 100, 1)
-        
-        conn.close()
+        stage = "parse"
+        journal_articles = parser_instance.parse_html(html_content)
+
+        stage = "store"
+        counts = store_articles(journal_articles)
+        task.increment(
+            inserted=counts['inserted'],
+            updated=counts['updated'],
+            unchanged=counts['unchanged'],
+            alert_matches=sum(counts['alerts'].values()),
+            successful=1,
+        )
+        result.update(ok=True, articles=len(journal_articles), inserted=counts['inserted'],
+                      updated=counts['updated'], unchanged=counts['unchanged'])
 
     except Exception as e:
-        task['status'] = 'failed'
-        task['errors'].append({"url": "任务初始化失败", "error": str(e)})
-        return
+        task.increment(failed=1)
+        task.add_error(url, str(e), stage)
+        result.update(stage=stage, error=str(e))
+
+    finally:
+        outcome = "success" if result["ok"] else "failure"
+        seconds = time.perf_counter() - page_start
+        metrics.observe_stage("page_total", seconds)
+        metrics.PAGES.inc(journal=journal_code, result=outcome)
+        metrics.PROXY_NODE_PAGES.inc(node=task['current_proxy_node'], result=outcome)
+        task.increment(processed=1)
+        task.update(
+            progress_percentage=round((task['processed'] / task['total_urls']) * 100, 1),
+            stage_summary=summary.as_dict(),
+        )
+        result["seconds"] = round(seconds, 3)
+    return result
 
-    if task['status'] != 'stopped':
-        task['status'] = 'completed'
+def create_batch_task(total_urls, profile_mode=None, **fields):
+    """登记一个批量任务的初始进度，返回 task_id；之后由 run_crawl_task / run_enrich_task 执行。"""
+    task_id = str(uuid.uuid4())
+    batch_tasks[task_id] = BatchTask(
+        error_history=BATCH_ERROR_HISTORY,
+        status="running",
+        total_urls=total_urls,
+        processed=0,
+        successful=0,
+        failed=0,
+        inserted=0,
+        updated=0,
+        unchanged=0,
+        alert_matches=0,
+        current_url="",
+        current_proxy_node="N/A",
+        progress_percentage=0,
+        start_time=time.time(),
+        stage_summary={"stages": {}, "counts": {}},
+        profile_id=new_profile_id() if profile_mode else None,
+        **fields,
+    )
+    return task_id
 
 @app.route('/batch_crawl', methods=['POST'])
 def batch_crawl():
@@ -438,50 +748,115 @@ def batch_crawl():
     if not urls:
         return jsonify({"status": "error", "message": "根据所给范围未生成任何URL。"}), 400
 
-    task_id = str(uuid.uuid4())
-    batch_tasks[task_id] = {
-        "status": "running",
-        "total_urls": len(urls),
-        "processed": 0,
-        "successful": 0,
-        "failed": 0,
-        "current_url": "",
-        "current_proxy_node": "N/A",
-        "progress_percentage": 0,
-        "start_time": time.time(),
-        "errors": []
-    }
-
-    thread = threading.Thread(target=run_crawl_task, args=(task_id, urls, data['journal_code']))
+    profile_mode = data.get('profile') if PROFILING_ENABLED else None
+    if profile_mode is True:
+        profile_mode = 'cprofile'
+    if profile_mode not in (None, False, 'cprofile', 'sample'):
+        return jsonify({"status": "error", "message": "profile 只能是 'cprofile' 或 'sample'。"}), 400
+
+    task_id = create_batch_task(len(urls), profile_mode)
+    thread = threading.Thread(target=run_crawl_task, args=(task_id, urls, data['journal_code'], profile_mode or None))
     thread.start()
 
     return jsonify({"status": "success", "task_id": task_id, "total_urls": len(urls)})
 
+def run_enrich_task(task_id, journal_code, limit, include_metadata, workers, rate_per_minute):
+    """在后台线程中补全缺失摘要/元数据的文章；进度与批量爬取共用 /batch_progress 和 /batch_stop。"""
+    task = batch_tasks[task_id]
+    summary = metrics.StageSummary()
+    try:
+        crawler_instance: BaseJournalCrawler = plugins.crawler(journal_code)
+        parser_instance: BaseJournalParser = plugins.detail_parser(journal_code)
+    except Exception as e:
+        task.add_error("任务初始化失败", str(e), "init")
+        task.update(status='failed')
+        return
+
+    def read_candidates(after_id, size):
+        with db.read() as conn:
+            return enrich.select_candidates(conn, journal_code, after_id, size,
+                                            ENRICH_MAX_ATTEMPTS, include_metadata)
+
+    def fetch(candidate):
+        return enrich.fetch_details(crawler_instance, parser_instance, candidate[1], COOKIE_DIR)
+
+    try:
+        enrich.run_enrichment(task, read_candidates, fetch, store_enrichment, summary, limit=limit,
+                              batch_size=ENRICH_BATCH_SIZE, workers=workers, rate_per_minute=rate_per_minute)
+    except Exception as e:
+        task.add_error("补全任务中断", str(e), "enrich")
+        task.update(status='failed')
+
+@app.route('/enrich', methods=['POST'])
+def start_enrichment():
+    """
+    启动详情页补全任务。参数: journal_code（必填）、limit（最多处理的文章数）、include_metadata
+    （同时补全缺单位/关键词的文章）、workers、rate_per_minute。
+    """
+    data = request.get_json(silent=True) or {}
+    journal_code = data.get('journal_code')
+    if journal_code not in JOURNAL_CONFIGS:
+        return jsonify({"status": "error", "message": f"未知的期刊代码: {journal_code}"}), 400
+    if not JOURNAL_CONFIGS[journal_code].get('detail_parser_module'):
+        return jsonify({"status": "error", "message": f"期刊 {journal_code} 没有配置 detail_parser_module。"}), 400
+    try:
+        limit = int(data['limit']) if data.get('limit') else None
+        workers = int(data.get('workers', ENRICH_WORKERS))
+        rate_per_minute = float(data.get('rate_per_minute', ENRICH_RATE_PER_MINUTE))
+    except (ValueError, TypeError):
+        return jsonify({"status": "error", "message": "limit、workers、rate_per_minute 必须是数字"}), 400
+    if (limit is not None and limit <= 0) or workers <= 0 or rate_per_minute < 0:
+        return jsonify({"status": "error", "message": "limit、workers 必须为正数，rate_per_minute 不能为负数"}), 400
+    include_metadata = bool(data.get('include_metadata'))
+
+    with db.read() as conn:
+        pending = enrich.count_candidates(conn, journal_code, ENRICH_MAX_ATTEMPTS, include_metadata)
+    total = min(pending, limit) if limit else pending
+    task_id = create_batch_task(total, empty=0)
+    thread = threading.Thread(target=run_enrich_task,
+                              args=(task_id, journal_code, limit, include_metadata, workers, rate_per_minute))
+    thread.start()
+    return jsonify({"status": "success", "task_id": task_id, "total_urls": total})
+
+@app.route('/enrich/status', methods=['GET'])
+def get_enrichment_status():
+    journal_code = request.args.get('journal_code') or None
+    with db.read() as conn:
+        return jsonify(enrich.enrichment_status(conn, journal_code, ENRICH_MAX_ATTEMPTS))
+
+@app.route('/poll/status', methods=['GET'])
+def get_poll_status():
+    return jsonify({"enabled": POLL_ENABLED, "running": poll_scheduler.running, "pages": poll_scheduler.status()})
+
+@app.route('/poll/run', methods=['POST'])
+def run_poll():
+    """让某个期刊（不传 journal_code 时为全部）的轮询页面立即到期；调度线程未运行时在后台检查一次。"""
+    journal_code = (request.get_json(silent=True) or {}).get('journal_code')
+    if journal_code and journal_code not in JOURNAL_CONFIGS:
+        return jsonify({"status": "error", "message": f"未知的期刊代码: {journal_code}"}), 400
+    pages = poll_scheduler.trigger(journal_code)
+    if not poll_scheduler.running:
+        threading.Thread(target=poll_scheduler.run_due, name="poll-once", daemon=True).start()
+    return jsonify({"status": "success", "pages": pages})
+
 @app.route('/batch_progress/<task_id>')
 def batch_progress(task_id):
-    def generate():
-        task = batch_tasks.get(task_id)
-        if not task:
-            yield f"data: {json.dumps({'status': 'not_found'})}\n\n"
-            return
-        
-        while task['status'] in ['running', 'stopped']:
-            yield f"data: {json.dumps(task)}\n\n"
-            time.sleep(1)
-            if task['status'] == 'stopped':
-                break
-        
-        # Send final status
-        yield f"data: {json.dumps(task)}\n\n"
+    """SSE: 先发完整快照，之后由爬取线程的状态变化驱动，只推送变化的字段；空闲时发保活注释。"""
+    task = batch_tasks.get(task_id)
+    if not task:
+        def not_found():
+            yield f"event: snapshot\ndata: {json.dumps({'status': 'not_found'})}\n\n"
+        return Response(not_found(), mimetype='text/event-stream')
 
-    return Response(generate(), mimetype='text/event-stream')
+    stream = task.stream(request.headers.get('Last-Event-ID'), keepalive_seconds=BATCH_PROGRESS_KEEPALIVE_SECONDS)
+    return Response(stream, mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
 
 
 @app.route('/batch_stop/<task_id>', methods=['POST'])
 def batch_stop(task_id):
     task = batch_tasks.get(task_id)
     if task:
-        task['status'] = 'stopped'
+        task.update(status='stopped')
         return jsonify({"status": "success", "message": "任务已标记为停止。"})
     return jsonify({"status": "error", "message": "未找到任务。"}), 404
 
@@ -530,4 +905,10 @@ def batch_stop(task_id):
 
 if __name__ == '__main__':
     init_db()
+    # debug 模式下 reloader 的父进程只负责监控文件，回填只在实际服务的子进程里运行
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_backfills()
+        threading.Thread(target=get_relevance_index, name="bm25-load", daemon=True).start()
+        if POLL_ENABLED:
+            poll_scheduler.start()
     app.run(debug=True, threaded=True)
\ No newline at end of file
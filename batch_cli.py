@@ -0,0 +1,199 @@
+"""
+命令行批量爬取，不启动 Flask 服务: 适合在 cron / systemd 下无人值守地跑大批量回填。
+
+与 /batch_crawl 共用参数校验、URL 生成、爬虫/解析器注册表和入库逻辑（app.crawl_url），区别在于:
+- 进度以 JSON Lines 写到标准输出或 --progress 文件，每个 URL 一行（event=page），开始和结束各一行；
+  爬虫自身的日志改写到标准错误，不会混进进度输出
+- --concurrency 个线程并发爬取（Clash 节点切换是全局的，多线程时建议 --no-proxy-switch）
+- --resume 读取之前写入同一 --progress 文件的进度，跳过已经成功的 URL
+- --no-headed-fallback 无头模式失败时不再打开有头浏览器（没有图形界面的服务器）
+- SIGINT / SIGTERM 时不再开始新的 URL，等进行中的页面完成后退出
+
+可以在 Web 服务运行时使用: 服务通过 PRAGMA data_version 和 journals.row_version 发现其他进程的写入，
+查询缓存、ETag、列式引擎和 BM25 索引会在下一次请求时更新，不需要重启服务。
+
+退出码: 0 全部成功；1 有 URL 失败；2 参数错误；3 初始化失败（爬虫/解析器无法加载）；130 被信号中断。
+
+用法:
+    python -m batch_cli --journal jmcmar --volume-start 60 --volume-end 66 --issue-start 1 --issue-end 24 \\
+        --concurrency 2 --no-headed-fallback --progress logs/jmcmar.jsonl --resume
+    python -m batch_cli --journal jacsat --url https://pubs.acs.org/toc/jacsat/146/1
+"""
+import argparse
+import contextlib
+import json
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+import config
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_INIT = 3
+EXIT_INTERRUPTED = 130
+
+
+class ProgressWriter:
+    """线程安全地逐行写出 JSON 事件，每行写完立即 flush（tail -f、日志采集可以实时看到）。"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields: Any) -> None:
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def completed_urls(path: str) -> Set[str]:
+    """之前写入 path 的进度中已经成功的 URL；文件不存在或有截断的行时忽略。"""
+    done: Set[str] = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get("event") == "page" and event.get("ok"):
+                    done.add(event["url"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _read_urls(args) -> List[str]:
+    urls = list(args.url or [])
+    if args.urls_file:
+        with open(args.urls_file, encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return list(dict.fromkeys(urls))
+
+
+def run(args, progress: ProgressWriter) -> int:
+    # app 在导入时按 config 打开数据库，--db 必须在导入前生效
+    if args.db:
+        config.DATABASE_PATH = args.db
+    import app
+    from utils import metrics
+
+    if args.url or args.urls_file:
+        urls = _read_urls(args)
+    else:
+        validation = app.validate_batch_params({
+            "journal_code": args.journal,
+            "volume_start": args.volume_start, "volume_end": args.volume_end,
+            "issue_start": args.issue_start, "issue_end": args.issue_end,
+        })
+        if not validation["valid"]:
+            progress.emit("error", stage="params", error=validation["message"])
+            return EXIT_USAGE
+        urls = app.generate_batch_urls(validation["params"])
+
+    skipped = 0
+    if args.resume:
+        done = completed_urls(args.progress)
+        skipped = sum(1 for url in urls if url in done)
+        urls = [url for url in urls if url not in done]
+
+    app.COOKIE_DIR = args.cookie_dir
+    app.init_db()
+    task = app.batch_tasks[app.create_batch_task(len(urls))]
+    summary = metrics.StageSummary()
+    headed_fallback = not args.no_headed_fallback
+
+    try:
+        crawler_instance = app.plugins.crawler(args.journal)
+        parser_instance = app.plugins.parser(args.journal)
+    except Exception as e:
+        progress.emit("error", stage="init", error=str(e))
+        return EXIT_INIT
+    clash_manager = None if args.no_proxy_switch else app.create_clash_manager(task)
+
+    def stop(signum, frame):
+        if task["status"] != "stopped":
+            task.update(status="stopped")
+            progress.emit("stopping", signal=signal.Signals(signum).name)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    progress.emit("start", journal=args.journal, total=len(urls), skipped=skipped,
+                  concurrency=args.concurrency, headed_fallback=headed_fallback,
+                  proxy_switch=clash_manager is not None)
+    start = time.perf_counter()
+
+    def work(url: str) -> None:
+        if task["status"] == "stopped":
+            return
+        with metrics.collect(summary):
+            result = app.crawl_url(task, url, args.journal, crawler_instance, parser_instance, summary,
+                                   clash_manager, headed_fallback)
+        progress.emit("page", processed=task["processed"], total=len(urls), **result)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="crawl") as pool:
+        # 主线程只等待，信号处理函数在主线程运行，不会被爬取阻塞
+        futures = [pool.submit(work, url) for url in urls]
+        for future in futures:
+            while not future.done():
+                time.sleep(0.2)
+            future.result()
+
+    stopped = task["status"] == "stopped"
+    if not stopped:
+        task.update(status="completed")
+    snapshot = task.snapshot()
+    progress.emit(
+        "done", status=snapshot["status"], elapsed_seconds=round(time.perf_counter() - start, 2),
+        **{key: snapshot[key] for key in ("total_urls", "processed", "successful", "failed", "inserted",
+                                          "updated", "unchanged", "alert_matches", "error_totals")},
+        skipped=skipped, stage_summary=snapshot["stage_summary"],
+    )
+    if stopped:
+        return EXIT_INTERRUPTED
+    return EXIT_FAILURES if snapshot["failed"] else EXIT_OK
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a batch crawl from the command line without the web server. "
+                                     "A running server picks up the new rows on its next request; no restart is needed.")
+    parser.add_argument("--journal", required=True, choices=sorted(config.JOURNAL_CONFIGS), help="journal code")
+    parser.add_argument("--volume-start", type=int, default=0)
+    parser.add_argument("--volume-end", type=int, default=0)
+    parser.add_argument("--issue-start", type=int, default=0)
+    parser.add_argument("--issue-end", type=int, default=0)
+    parser.add_argument("--url", action="append", help="crawl this TOC URL instead of a volume/issue range (repeatable)")
+    parser.add_argument("--urls-file", help="file with one TOC URL per line")
+    parser.add_argument("--concurrency", type=int, default=1, help="pages crawled in parallel")
+    parser.add_argument("--progress", default="-", help="JSON-lines progress file, appended to ('-' for stdout)")
+    parser.add_argument("--resume", action="store_true", help="skip URLs that already succeeded in the --progress file")
+    parser.add_argument("--no-headed-fallback", action="store_true",
+                        help="never open a visible browser when headless crawling fails")
+    parser.add_argument("--no-proxy-switch", action="store_true", help="do not switch Clash nodes between pages")
+    parser.add_argument("--db", help="SQLite database path (default: DATABASE_PATH from config.py)")
+    parser.add_argument("--cookie-dir", default="cookies")
+    args = parser.parse_args(argv)
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.resume and args.progress == "-":
+        parser.error("--resume needs a --progress file")
+
+    if args.progress == "-":
+        # 进度独占标准输出，爬虫和 app 的 print 改到标准错误
+        progress = ProgressWriter(sys.stdout)
+        with contextlib.redirect_stdout(sys.stderr):
+            return run(args, progress)
+    with open(args.progress, "a", encoding="utf-8") as stream:
+        return run(args, ProgressWriter(stream))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
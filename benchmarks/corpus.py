@@ -0,0 +1,229 @@
+"""
+合成文献库生成器: 按指定规模往 journals 表写入逼真的虚构文章，用于在百万级数据上检验搜索性能。
+
+- 词表: 领域词加上由音节拼出的伪词，词频服从 Zipf 分布（少数词极常见，长尾很长），标题和摘要都从中抽取；
+  load_test 用同样的 (seed, vocabulary_size) 生成查询词，命中率与真实查询相近。
+- 期刊: 配置中的期刊加上 synNN 形式的合成期刊，各期刊的文章数同样服从 Zipf 分布；
+  合成期刊登记到 journal_meta（active = 0，与从配置中移除的期刊相同），搜索结果里有期刊名称。
+- 作者: 每个期刊一个作者池，另有一个跨期刊的共享池；作者的发文量服从 Zipf 分布，每篇 1 到 30 位作者。
+- 日期: 年发文量按每年约 4% 增长，少量文章没有日期（与解析器的 "No date found" 一致）。
+
+写入走 utils.ingest.upsert_articles，与爬虫入库的路径相同（DOI 规范化、date_iso、content_hash、统计表触发器）。
+目标库已有文章时需要 --append，避免误写入真实数据库。
+
+用法:
+    python -m benchmarks.corpus --articles 1000000 --journals 12 --db databases/journals.db
+"""
+import argparse
+import bisect
+import itertools
+import json
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from benchmarks.fixtures import MONTHS, WORDS
+
+DEFAULT_VOCABULARY_SIZE = 20000
+DEFAULT_SEED = 1
+SYLLABLES = [
+    "al", "an", "ar", "ben", "car", "cy", "di", "do", "en", "eth", "fen", "fluo", "gly", "hex", "hy", "in",
+    "ir", "ka", "lo", "lu", "ma", "met", "mi", "na", "ni", "no", "ol", "or", "ox", "pa", "phe", "pi", "pro",
+    "py", "qui", "ra", "ri", "ro", "sa", "si", "sul", "ta", "te", "thi", "to", "tri", "ul", "va", "xy", "zo",
+]
+
+
+def zipf_cum_weights(n: int, exponent: float = 1.0) -> List[float]:
+    """rank 1..n 的 Zipf 分布累计权重，供 random.choices(cum_weights=...) 使用。"""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def build_vocabulary(size: int = DEFAULT_VOCABULARY_SIZE, seed: int = DEFAULT_SEED) -> List[str]:
+    """按词频从高到低排列的词表；同样的参数总是得到同样的词表。"""
+    rng = random.Random(f"vocabulary:{seed}")
+    vocabulary = list(dict.fromkeys(word.lower() for word in WORDS))
+    seen = set(vocabulary)
+    while len(vocabulary) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    head, tail = vocabulary[:len(WORDS)], vocabulary[len(WORDS):size]
+    # 领域词分散到词频较高的前几百名中，而不是全部排在最前
+    for word in head:
+        tail.insert(rng.randint(0, min(len(tail), 500)), word)
+    return tail[:size]
+
+
+def _person_names(rng: random.Random, count: int) -> List[str]:
+    names = []
+    for _ in range(count):
+        given = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 2))).capitalize()
+        surname = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        names.append(f"{given} {surname}")
+    return names
+
+
+class CorpusGenerator:
+    def __init__(
+        self,
+        journal_codes: Sequence[str],
+        vocabulary_size: int = DEFAULT_VOCABULARY_SIZE,
+        authors_per_journal: int = 5000,
+        first_year: int = 1995,
+        last_year: int = 2025,
+        abstract_words: Sequence[int] = (80, 220),
+        missing_abstract_rate: float = 0.03,
+        missing_date_rate: float = 0.005,
+        seed: int = DEFAULT_SEED,
+        first_serial: int = 1,
+    ):
+        # 追加写入时从 first_serial 继续编号（DOI 不与已有文章重复），词表仍只由 seed 决定
+        self.rng = random.Random(f"{seed}:{first_serial}")
+        self.journal_codes = list(journal_codes)
+        self.journal_cum = zipf_cum_weights(len(self.journal_codes), 0.8)
+        self.vocabulary = build_vocabulary(vocabulary_size, seed)
+        self.vocabulary_cum = zipf_cum_weights(len(self.vocabulary), 1.07)
+        shared = _person_names(self.rng, authors_per_journal // 2)
+        self.author_pools = {
+            code: _person_names(self.rng, authors_per_journal) + shared for code in self.journal_codes
+        }
+        self.author_cum = zipf_cum_weights(authors_per_journal + len(shared), 0.9)
+        self.years = list(range(first_year, last_year + 1))
+        self.year_cum = list(itertools.accumulate(1.04 ** i for i in range(len(self.years))))
+        self.abstract_words = abstract_words
+        self.missing_abstract_rate = missing_abstract_rate
+        self.missing_date_rate = missing_date_rate
+        self._serial = itertools.count(first_serial)
+
+    def _words(self, count: int) -> str:
+        return " ".join(self.rng.choices(self.vocabulary, cum_weights=self.vocabulary_cum, k=count))
+
+    def article(self) -> Dict[str, Any]:
+        rng = self.rng
+        code = self.journal_codes[bisect.bisect(self.journal_cum, rng.random() * self.journal_cum[-1])]
+        year = self.years[bisect.bisect(self.year_cum, rng.random() * self.year_cum[-1])]
+        serial = next(self._serial)
+        doi = f"10.1021/acs.{code}.{year}b{serial:07d}"
+        author_count = min(30, 1 + int(rng.expovariate(1 / 4)))
+        authors = ", ".join(dict.fromkeys(
+            rng.choices(self.author_pools[code], cum_weights=self.author_cum, k=author_count)
+        ))
+        if rng.random() < self.missing_date_rate:
+            date = "No date found"
+        else:
+            date = f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {year}"
+        if rng.random() < self.missing_abstract_rate:
+            abstract = "No abstract found"
+        else:
+            abstract = self._words(rng.randint(*self.abstract_words)).capitalize() + "."
+        return {
+            "journal_code": code,
+            "title": self._words(rng.randint(6, 16)).capitalize(),
+            "url": f"https://pubs.acs.org/doi/{doi}",
+            "doi": doi,
+            "date": date,
+            "authors": authors,
+            "abstract": abstract,
+        }
+
+    def articles(self, count: int) -> Iterator[Dict[str, Any]]:
+        for _ in range(count):
+            yield self.article()
+
+
+def journal_codes_for(count: int, configured: Sequence[str]) -> List[str]:
+    """配置中的期刊在前，不足的部分用 syn03、syn04 ... 补齐。"""
+    codes = list(configured)[:count]
+    codes += [f"syn{i:02d}" for i in range(len(codes) + 1, count + 1)]
+    return codes
+
+
+def register_synthetic_journals(conn: sqlite3.Connection, codes: Sequence[str], configured: Sequence[str]) -> None:
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    rows = []
+    for code in codes:
+        if code in configured:
+            continue
+        config = {"name": f"Synthetic Journal {code[3:]}", "journal_code": code, "publisher": "Synthetic"}
+        rows.append((code, config["name"], None, "Synthetic", json.dumps(config, sort_keys=True), now))
+    conn.executemany(
+        "INSERT OR IGNORE INTO journal_meta (code, name, base_url, publisher, config, active, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, 0, ?)", rows
+    )
+
+
+def generate(
+    conn: sqlite3.Connection,
+    count: int,
+    generator: CorpusGenerator,
+    batch_size: int = 20000,
+) -> Dict[str, Any]:
+    from utils.ingest import upsert_articles
+
+    start = time.perf_counter()
+    inserted = 0
+    batch: List[Dict[str, Any]] = []
+    for article in generator.articles(count):
+        batch.append(article)
+        if len(batch) >= batch_size:
+            inserted += upsert_articles(conn, batch)["inserted"]
+            conn.commit()
+            batch = []
+            elapsed = time.perf_counter() - start
+            print(f"  {inserted}/{count} articles ({inserted / elapsed:.0f}/s)")
+    if batch:
+        inserted += upsert_articles(conn, batch)["inserted"]
+        conn.commit()
+    return {"inserted": inserted, "seconds": round(time.perf_counter() - start, 1)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import DATABASE_PATH, JOURNAL_CONFIGS
+    from utils.migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Fill a journals database with a synthetic corpus.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database path")
+    parser.add_argument("--articles", type=int, default=100000)
+    parser.add_argument("--journals", type=int, default=12, help="number of journal codes (configured ones first)")
+    parser.add_argument("--vocabulary-size", type=int, default=DEFAULT_VOCABULARY_SIZE)
+    parser.add_argument("--authors-per-journal", type=int, default=5000)
+    parser.add_argument("--first-year", type=int, default=1995)
+    parser.add_argument("--last-year", type=int, default=2025)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--append", action="store_true", help="allow writing into a database that already has articles")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        run_migrations(conn)
+        existing = conn.execute("SELECT COUNT(*) FROM journals").fetchone()[0]
+        if existing and not args.append:
+            print(f"{args.db} already holds {existing} articles; pass --append to add a synthetic corpus anyway.")
+            return 1
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+        configured = list(JOURNAL_CONFIGS)
+        codes = journal_codes_for(args.journals, configured)
+        register_synthetic_journals(conn, codes, configured)
+        conn.commit()
+        generator = CorpusGenerator(
+            codes, vocabulary_size=args.vocabulary_size, authors_per_journal=args.authors_per_journal,
+            first_year=args.first_year, last_year=args.last_year,
+            seed=args.seed, first_serial=existing + 1,
+        )
+        print(f"Generating {args.articles} articles across {len(codes)} journals into {args.db}...")
+        result = generate(conn, args.articles, generator, batch_size=args.batch_size)
+        print(f"Inserted {result['inserted']} articles in {result['seconds']}s")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+端到端爬取吞吐基准，完全离线: 本地替身出版社 + 模拟 Clash，驱动真实的 AcsJournalCrawler（Playwright + Chromium）。
+
+两种模式:
+    crawler   只测爬虫: 对每个 URL 调用 AcsJournalCrawler.crawl_page() 并解析
+    task      测整个批量任务: app.run_crawl_task()（切换节点 → 抓取 → 解析 → 入库），数据库写在临时目录
+
+报告: 页数/分钟（另给出扣除爬虫内置随机等待后的值）、各阶段 p50/p95/最大耗时、挑战率、抓取字节数、
+替身服务的请求统计，以及峰值 RSS（本进程，以及本进程加所有子进程即 Playwright 驱动和 Chromium 的合计）。
+
+运行前需要 `pip install playwright && playwright install chromium`；RSS 统计读取 /proc，只支持 Linux。
+
+用法:
+    python -m benchmarks.crawl_bench --pages 20 --challenge-rate 0.3 --latency-ms 300
+    python -m benchmarks.crawl_bench --mode crawler --pages 10 --padding-kb 400 --json bench.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import config
+from benchmarks.fixtures import FakeClashController, FixturePublisher
+from utils import metrics
+
+
+def _process_tree_rss_kb(root_pid: int) -> int:
+    """root_pid 及其所有后代进程当前 RSS 之和（KB）。"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm 字段可能含空格，从最后一个 ')' 之后开始取
+        ppid = int(stat[stat.rindex(b")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler:
+    """后台线程定期统计进程树的 RSS，记录峰值。"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        pid = os.getpid()
+        while True:
+            self.peak_kb = max(self.peak_kb, _process_tree_rss_kb(pid))
+            if self._stop.wait(self.interval):
+                return
+
+
+def configure(workdir: Path, journal_code: str, publisher_url: str, clash_url: str, clash_secret: str) -> Dict[str, Any]:
+    """
+    把 config 指向替身服务和临时目录。必须在导入 app / crawlers.acs_crawler 之前调用，
+    它们在导入时用 from config import ... 取值。
+    """
+    if "app" in sys.modules or "crawlers.acs_crawler" in sys.modules:
+        raise RuntimeError("configure() must run before app or crawlers.acs_crawler is imported")
+    config.PROXY_SETTINGS = None
+    config.DATABASE_PATH = str(workdir / "journals.db")
+    config.RELEVANCE_INDEX_DIR = str(workdir / "bm25")
+    config.PROFILE_DIR = str(workdir / "profiles")
+    config.CLASH_API_CONFIG = (
+        {"api_base_url": clash_url, "secret": clash_secret, "proxy_group": "GLOBAL"} if clash_url else None
+    )
+    journal_config = dict(config.JOURNAL_CONFIGS[journal_code])
+    journal_config.update(base_url=publisher_url, cookie_file=str(workdir / "cookies" / "cookies.json"))
+    config.JOURNAL_CONFIGS[journal_code] = journal_config
+    return journal_config
+
+
+def run_crawler_mode(journal_config: Dict[str, Any], urls: List[str], cookie_dir: str) -> Dict[str, int]:
+    from crawlers.acs_crawler import AcsJournalCrawler
+    from parsers.acs_parser import AcsJournalParser
+
+    crawler = AcsJournalCrawler(journal_config)
+    parser = AcsJournalParser(journal_config)
+    result = {"successful": 0, "failed": 0, "articles": 0}
+    for url in urls:
+        with metrics.time_stage("page_total"):
+            html, _, error = crawler.crawl_page(url, cookie_dir=cookie_dir, headed_fallback=False)
+            if html and not error:
+                result["articles"] += len(parser.parse_html(html))
+                result["successful"] += 1
+            else:
+                result["failed"] += 1
+    return result
+
+
+def run_task_mode(journal_code: str, urls: List[str], cookie_dir: str) -> Dict[str, Any]:
+    import app
+
+    app.COOKIE_DIR = cookie_dir
+    app.init_db()
+    task_id = app.create_batch_task(len(urls))
+    app.run_crawl_task(task_id, urls, journal_code)
+    snapshot = app.batch_tasks[task_id].snapshot()
+    return {key: snapshot[key] for key in ("status", "successful", "failed", "inserted", "updated", "unchanged",
+                                           "error_count", "error_totals")}
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"mode={report['mode']}  pages={report['pages']}  wall={report['wall_seconds']}s  "
+        f"pages/min={report['pages_per_minute']}  (excluding crawler delay: {report['pages_per_minute_ex_delay']})",
+        "result: " + ", ".join(f"{k}={v}" for k, v in report["result"].items()),
+        "",
+        f"{'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total s':>10}",
+    ]
+    for stage, s in sorted(report["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(f"{stage:<16}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['max_ms']:>10}"
+                     f"{s['total_ms'] / 1000:>10.2f}")
+    lines.append("")
+    lines.append("counts: " + ", ".join(f"{k}={v}" for k, v in report["counts"].items()))
+    lines.append("publisher: " + ", ".join(f"{k}={v}" for k, v in report["publisher"].items()))
+    if report["clash"] is not None:
+        lines.append("clash: " + ", ".join(f"{k}={v}" for k, v in report["clash"].items()))
+    rss = report["rss_mb"]
+    lines.append(f"peak RSS: python {rss['python']} MB, largest child {rss['largest_child']} MB, "
+                 f"process tree {rss['process_tree']} MB")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline crawl throughput benchmark against local fixture servers.")
+    parser.add_argument("--mode", choices=["task", "crawler"], default="task")
+    parser.add_argument("--journal", default="jmcmar")
+    parser.add_argument("--pages", type=int, default=10, help="number of TOC pages (issues) to crawl")
+    parser.add_argument("--volume", type=int, default=66)
+    parser.add_argument("--articles", type=int, default=30, help="articles per TOC page")
+    parser.add_argument("--abstract-words", type=int, default=120)
+    parser.add_argument("--padding-kb", type=int, default=0, help="extra script bytes per page, in KB")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--challenge-rate", type=float, default=0.2, help="share of first visits served a CF interstitial")
+    parser.add_argument("--challenge-delay-ms", type=int, default=1500)
+    parser.add_argument("--no-clash", action="store_true", help="task mode without the fake Clash controller")
+    parser.add_argument("--clash-nodes", type=int, default=8)
+    parser.add_argument("--clash-latency-ms", type=float, default=20)
+    parser.add_argument("--clash-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.journal not in config.JOURNAL_CONFIGS:
+        parser.error(f"unknown journal code: {args.journal}")
+
+    publisher = FixturePublisher(
+        articles_per_page=args.articles, abstract_words=args.abstract_words, padding_kb=args.padding_kb,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, challenge_rate=args.challenge_rate,
+        challenge_delay_ms=args.challenge_delay_ms, seed=args.seed,
+    )
+    clash = None
+    if args.mode == "task" and not args.no_clash:
+        clash = FakeClashController(nodes=args.clash_nodes, secret="bench", latency_ms=args.clash_latency_ms,
+                                    failure_rate=args.clash_failure_rate)
+
+    with tempfile.TemporaryDirectory(prefix="journal-scout-bench-") as tmp:
+        workdir = Path(tmp)
+        publisher_url = publisher.start()
+        clash_url = clash.start() if clash else None
+        try:
+            journal_config = configure(workdir, args.journal, publisher_url, clash_url, "bench")
+            urls = [f"{publisher_url}/toc/{args.journal}/{args.volume}/{issue}" for issue in range(1, args.pages + 1)]
+            cookie_dir = str(workdir / "cookies")
+            print(f"Publisher fixture at {publisher_url}" + (f", Clash fixture at {clash_url}" if clash else ""))
+
+            summary = metrics.StageSummary(keep_samples=True)
+            start = time.perf_counter()
+            with RssSampler() as rss, metrics.collect(summary):
+                if args.mode == "crawler":
+                    result = run_crawler_mode(journal_config, urls, cookie_dir)
+                else:
+                    result = run_task_mode(args.journal, urls, cookie_dir)
+            wall = time.perf_counter() - start
+        finally:
+            publisher.stop()
+            if clash:
+                clash.stop()
+
+    stats = summary.as_dict()
+    delay_seconds = stats["stages"].get("delay", {}).get("total_ms", 0) / 1000
+    report = {
+        "mode": args.mode,
+        "pages": args.pages,
+        "wall_seconds": round(wall, 2),
+        "pages_per_minute": round(args.pages * 60 / wall, 2),
+        "pages_per_minute_ex_delay": round(args.pages * 60 / max(wall - delay_seconds, 1e-9), 2),
+        "result": result,
+        "stages": stats["stages"],
+        "counts": stats["counts"],
+        "publisher": dict(publisher.stats),
+        "clash": dict(clash.stats) if clash else None,
+        "rss_mb": {
+            "python": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "largest_child": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+            "process_tree": round(rss.peak_kb / 1024, 1),
+        },
+        "settings": vars(args),
+    }
+    print()
+    print(format_report(report))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+离线基准测试用的本地替身服务: 模拟 ACS 目录页的出版社服务器和模拟 Clash external-controller。
+
+出版社 (FixturePublisher):
+    GET /toc/<journal>/<volume>/<issue>   与 pubs.acs.org 结构相同的目录页（AcsJournalParser 可解析），
+                                          内容由 (seed, 路径) 决定，同样的参数每次生成同样的页面
+    没有 cf_clearance cookie 的请求按 challenge_rate 的比例返回 Cloudflare 风格的 "Just a moment..." 挑战页，
+    页面脚本等待 challenge_delay_ms 后写入 cf_clearance 并刷新；其余请求直接返回目录页并用 Set-Cookie 下发 cf_clearance
+    （爬虫只有在拿到 cf_clearance 后才认为页面可用）。
+    每个请求先等待 latency_ms ± jitter_ms；padding_kb 在页面末尾填充脚本，模拟真实页面体积。
+
+Clash (FakeClashController):
+    GET /version, GET /proxies, PUT /proxies/<group>，与 utils/clash_manager.py 用到的接口一致；
+    设置了 secret 时校验 Authorization: Bearer <secret>。
+
+两者都是 ThreadingHTTPServer，在后台线程中运行，start() 返回根地址，stop() 关闭。
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+WORDS = [
+    "kinase", "inhibitor", "selective", "synthesis", "discovery", "receptor", "agonist", "antagonist",
+    "structure", "activity", "relationship", "novel", "potent", "covalent", "allosteric", "degrader",
+    "PROTAC", "fragment", "optimization", "binding", "catalytic", "asymmetric", "photoredox", "ligand",
+    "macrocyclic", "peptide", "scaffold", "bioavailable", "metabolic", "stability", "crystal", "enantioselective",
+]
+SURNAMES = ["Smith", "Wang", "Li", "Zhang", "Müller", "Garcia", "Tanaka", "Kim", "Rossi", "Novak", "Chen", "Ó Brien"]
+GIVEN_NAMES = ["Alice", "Bo", "Carlos", "Dana", "Eun-ji", "Felix", "Hana", "Ivan", "Jun", "Lena", "Mei", "Omar"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+          "November", "December"]
+
+
+def make_article(rng: random.Random, journal_code: str, volume: int, index: int, abstract_words: int = 120) -> Dict[str, Any]:
+    """生成一篇虚构文章（字段与解析器输出一致，url 为相对路径）。"""
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize()
+    authors = ", ".join(f"{rng.choice(GIVEN_NAMES)} {rng.choice(SURNAMES)}" for _ in range(rng.randint(1, 8)))
+    year = 1957 + volume if volume < 80 else rng.randint(2000, 2025)
+    date = f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {year}"
+    abstract = " ".join(rng.choice(WORDS) for _ in range(abstract_words)).capitalize() + "."
+    doi = f"10.1021/acs.{journal_code}.{volume}b{index:05d}"
+    return {"title": title, "doi": doi, "url": f"/doi/{doi}", "date": date, "authors": authors,
+            "abstract": abstract, "journal_code": journal_code}
+
+
+def render_toc_html(articles: List[Dict[str, Any]], padding_kb: int = 0) -> str:
+    """按 ACS 目录页的结构渲染文章列表。"""
+    items = []
+    for article in articles:
+        authors = "".join(
+            f'<li><span class="hlFld-ContribAuthor">{name}</span></li>' for name in article["authors"].split(", ")
+        )
+        items.append(
+            '<div class="issue-item">'
+            f'<h3 class="issue-item_title"><a href="{article["url"]}">{article["title"]}</a></h3>'
+            f'<ul class="issue-item_loa">{authors}</ul>'
+            f'<span class="pub-date-value">{article["date"]}</span>'
+            '<div class="accordion__content toc-item__abstract">'
+            f'<span class="hlFld-Abstract">{article["abstract"]}</span></div>'
+            '</div>'
+        )
+    padding = ""
+    if padding_kb:
+        padding = "<script>/*" + ("x" * 1023 + "\n") * padding_kb + "*/</script>"
+    return (
+        "<!DOCTYPE html><html><head><title>Table of Contents</title></head><body>"
+        f'<div class="toc">{"".join(items)}</div>{padding}</body></html>'
+    )
+
+
+def render_challenge_html(token: str, delay_ms: int) -> str:
+    return (
+        "<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>"
+        "<h1>Checking your browser before accessing the site.</h1>"
+        "<script>window.__cf_chl_opt = {cType: 'managed'};</script>"
+        '<script src="/cdn-cgi/challenge-platform/h/g/orchestrate/chl_page/v1"></script>'
+        f"<script>setTimeout(function () {{ document.cookie = 'cf_clearance={token}; path=/'; "
+        f"location.reload(); }}, {int(delay_ms)});</script>"
+        "</body></html>"
+    )
+
+
+class _BackgroundServer:
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> str:
+        handler = type("Handler", (self.handler_class,), {"fixture": self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # 不在基准测试输出中打印访问日志
+        pass
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8",
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+
+class _PublisherHandler(_QuietHandler):
+    fixture: "FixturePublisher"
+
+    def do_GET(self):
+        fixture = self.fixture
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/cdn-cgi/"):
+            self._send(200, b"", "application/javascript")
+            return
+        parts = path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] != "toc" or not (parts[2].isdigit() and parts[3].isdigit()):
+            fixture.count("not_found")
+            self._send(404, b"<html><body>Not found</body></html>")
+            return
+
+        fixture.sleep()
+        has_clearance = "cf_clearance=" in (self.headers.get("Cookie") or "")
+        if not has_clearance and random.Random(f"{fixture.seed}:{path}").random() < fixture.challenge_rate:
+            fixture.count("challenges")
+            token = f"bench-{random.getrandbits(32):08x}"
+            self._send(403, render_challenge_html(token, fixture.challenge_delay_ms).encode("utf-8"))
+            return
+
+        fixture.count("pages")
+        body = fixture.page(parts[1], int(parts[2]), int(parts[3]))
+        headers = {}
+        if not has_clearance:
+            headers["Set-Cookie"] = f"cf_clearance=bench-{random.getrandbits(32):08x}; Path=/"
+        self._send(200, body, headers=headers)
+
+
+class FixturePublisher(_BackgroundServer):
+    handler_class = _PublisherHandler
+
+    def __init__(
+        self,
+        articles_per_page: int = 30,
+        abstract_words: int = 120,
+        padding_kb: int = 0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        challenge_rate: float = 0.0,
+        challenge_delay_ms: int = 1500,
+        seed: int = 1,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.articles_per_page = articles_per_page
+        self.abstract_words = abstract_words
+        self.padding_kb = padding_kb
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.challenge_rate = challenge_rate
+        self.challenge_delay_ms = challenge_delay_ms
+        self.seed = seed
+
+    def sleep(self) -> None:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def page(self, journal_code: str, volume: int, issue: int) -> bytes:
+        rng = random.Random(f"{self.seed}:{journal_code}:{volume}:{issue}")
+        articles = [
+            make_article(rng, journal_code, volume, issue * 1000 + i, self.abstract_words)
+            for i in range(self.articles_per_page)
+        ]
+        return render_toc_html(articles, self.padding_kb).encode("utf-8")
+
+
+class _ClashHandler(_QuietHandler):
+    fixture: "FakeClashController"
+
+    def _authorized(self) -> bool:
+        secret = self.fixture.secret
+        if secret and self.headers.get("Authorization") != f"Bearer {secret}":
+            self._send(401, b'{"message":"Unauthorized"}', "application/json")
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/version":
+            self._send(200, json.dumps({"version": "fixture", "meta": True}).encode(), "application/json")
+        elif self.path == "/proxies":
+            self._send(200, json.dumps(self.fixture.proxies()).encode(), "application/json")
+        else:
+            self._send(404, b'{"message":"Resource not found"}', "application/json")
+
+    def do_PUT(self):
+        if not self._authorized():
+            return
+        fixture = self.fixture
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        group = self.path[len("/proxies/"):] if self.path.startswith("/proxies/") else None
+        name = json.loads(body or b"{}").get("name")
+        if group != fixture.group or name not in fixture.nodes:
+            self._send(400, b'{"message":"Body invalid"}', "application/json")
+            return
+        if fixture.latency_ms:
+            time.sleep(fixture.latency_ms / 1000)
+        if random.random() < fixture.failure_rate:
+            fixture.count("failed_switches")
+            self._send(503, b'{"message":"Service unavailable"}', "application/json")
+            return
+        fixture.now = name
+        fixture.count("switches")
+        self._send(204)
+
+
+class FakeClashController(_BackgroundServer):
+    handler_class = _ClashHandler
+
+    def __init__(
+        self,
+        group: str = "GLOBAL",
+        nodes: int = 8,
+        secret: Optional[str] = None,
+        latency_ms: float = 0,
+        failure_rate: float = 0.0,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.group = group
+        self.nodes = [f"bench-node-{i:02d}" for i in range(nodes)]
+        self.secret = secret
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.now = self.nodes[0] if self.nodes else "DIRECT"
+
+    def proxies(self) -> Dict[str, Any]:
+        proxies: Dict[str, Any] = {
+            self.group: {"name": self.group, "type": "Selector", "now": self.now, "all": ["DIRECT", *self.nodes]},
+            "DIRECT": {"name": "DIRECT", "type": "Direct"},
+        }
+        for node in self.nodes:
+            proxies[node] = {"name": node, "type": "Shadowsocks"}
+        return {"proxies": proxies}
@@ -0,0 +1,254 @@
+"""
+搜索接口压测: 多个线程在给定时长内并发请求正在运行的 Flask 应用，报告吞吐量和延迟百分位数。
+
+请求组合（--mix，按权重随机选择）:
+    search          POST /search，标题/摘要/作者关键词（从 benchmarks.corpus 的 Zipf 词表抽取）、期刊、日期范围随机组合
+    search_relevance POST /search，"sort": "relevance" 的 BM25 排序
+    journals        GET /journals?journal_code=<随机期刊>
+    journal_stats   GET /journal_stats
+
+默认每个请求都跳过查询缓存（--cached 关闭），测的是数据库和索引本身；不发送 If-None-Match，不会命中 304。
+--json 保存报告，--compare 与之前保存的报告逐项对比（例如修改索引或表结构前后各跑一次）。
+
+用法:
+    python app.py                                    # 另一个终端
+    python -m benchmarks.load_test --duration 30 --concurrency 8 --json after.json --compare before.json
+"""
+import argparse
+import bisect
+import itertools
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from benchmarks.corpus import DEFAULT_SEED, DEFAULT_VOCABULARY_SIZE, SYLLABLES, build_vocabulary, zipf_cum_weights
+from utils.metrics import percentile
+
+DEFAULT_MIX = "search=6,search_relevance=1,journals=2,journal_stats=1"
+
+
+class RequestFactory:
+    """按 --mix 的权重生成请求 (名称, 方法, 路径, 参数)。"""
+
+    def __init__(self, mix: Dict[str, float], journal_codes: List[str], vocabulary: List[str],
+                 engine: Optional[str], cached: bool, limit: Optional[int]):
+        self.names = list(mix)
+        self.cum = list(itertools.accumulate(mix.values()))
+        self.journal_codes = journal_codes
+        self.vocabulary = vocabulary
+        # 查询词偏向常见词但不取最常见的几十个（真实用户很少只搜 "of" 这样的词）
+        self.vocabulary_cum = zipf_cum_weights(len(vocabulary), 0.8)
+        self.engine = engine
+        self.cached = cached
+        self.limit = limit
+
+    def _keywords(self, rng: random.Random, count: int) -> List[str]:
+        words = []
+        while len(words) < count:
+            index = bisect.bisect(self.vocabulary_cum, rng.random() * self.vocabulary_cum[-1])
+            if index >= 30:
+                words.append(self.vocabulary[index])
+        return words
+
+    def _search_payload(self, rng: random.Random) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {}
+        field = rng.choices(["title", "abstract", "author"], weights=[6, 3, 1])[0]
+        if field == "author":
+            # 合成作者名由音节拼成，用两个音节作关键词
+            payload["author_keywords"] = ["".join(rng.choices(SYLLABLES, k=2)).capitalize()]
+        else:
+            payload[f"{field}_keywords"] = self._keywords(rng, rng.randint(1, 2))
+        if self.journal_codes and rng.random() < 0.5:
+            payload["journal_codes"] = rng.sample(self.journal_codes, min(len(self.journal_codes), rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            year = rng.randint(2000, 2024)
+            payload["date_from"] = f"{year}-01-01"
+            payload["date_to"] = f"{year + rng.randint(0, 5)}-12-31"
+        if self.engine:
+            payload["engine"] = self.engine
+        if not self.cached:
+            payload["no_cache"] = True
+        return payload
+
+    def make(self, rng: random.Random) -> Tuple[str, str, str, Dict[str, Any]]:
+        name = self.names[bisect.bisect(self.cum, rng.random() * self.cum[-1])]
+        if name == "search":
+            return name, "POST", "/search", {"json": self._search_payload(rng)}
+        if name == "search_relevance":
+            payload = self._search_payload(rng)
+            payload["sort"] = "relevance"
+            if self.limit:
+                payload["limit"] = self.limit
+            return name, "POST", "/search", {"json": payload}
+        headers = {} if self.cached else {"Cache-Control": "no-cache"}
+        if name == "journals":
+            code = rng.choice(self.journal_codes) if self.journal_codes else ""
+            return name, "GET", "/journals", {"params": {"journal_code": code}, "headers": headers}
+        if name == "journal_stats":
+            return name, "GET", "/journal_stats", {"headers": headers}
+        raise ValueError(f"unknown request type in --mix: {name}")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+class LoadTest:
+    def __init__(self, base_url: str, factory: RequestFactory, concurrency: int, duration: float,
+                 warmup: float, timeout: float, seed: int):
+        self.base_url = base_url.rstrip("/")
+        self.factory = factory
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.timeout = timeout
+        self.seed = seed
+        # 名称 -> [(延迟秒, 状态码, 响应字节数)]
+        self.samples: Dict[str, List[Tuple[float, int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _worker(self, index: int, measure_from: float, deadline: float) -> None:
+        rng = random.Random(f"{self.seed}:{index}")
+        session = requests.Session()
+        local: Dict[str, List[Tuple[float, int, int]]] = {}
+        while True:
+            name, method, path, kwargs = self.factory.make(rng)
+            start = time.perf_counter()
+            if start >= deadline:
+                break
+            try:
+                response = session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+                status, size = response.status_code, len(response.content)
+            except requests.RequestException:
+                status, size = 0, 0
+            if start >= measure_from:
+                local.setdefault(name, []).append((time.perf_counter() - start, status, size))
+        with self._lock:
+            for name, samples in local.items():
+                self.samples.setdefault(name, []).extend(samples)
+
+    def run(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        measure_from = now + self.warmup
+        deadline = measure_from + self.duration
+        threads = [
+            threading.Thread(target=self._worker, args=(i, measure_from, deadline), daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 最后一批请求可能在截止时间之后才返回，按实际结束时间计算吞吐
+        elapsed = max(self.duration, time.perf_counter() - measure_from)
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        all_samples = []
+        for name, samples in sorted(self.samples.items()):
+            all_samples.extend(samples)
+            endpoints[name] = _summarize(samples, elapsed)
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "concurrency": self.concurrency,
+            "total": _summarize(all_samples, elapsed),
+            "endpoints": endpoints,
+        }
+
+
+def _summarize(samples: List[Tuple[float, int, int]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, status, _ in samples if not 200 <= status < 400)
+    summary: Dict[str, Any] = {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 2),
+    }
+    if latencies:
+        summary.update({
+            f"p{pct}_ms": round(percentile(latencies, pct) * 1000, 1) for pct in (50, 90, 95, 99)
+        })
+        summary["mean_ms"] = round(sum(latencies) * 1000 / len(latencies), 1)
+        summary["max_ms"] = round(latencies[-1] * 1000, 1)
+        summary["avg_kb"] = round(sum(size for _, _, size in samples) / len(samples) / 1024, 1)
+    return summary
+
+
+def format_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    columns = ("requests", "errors", "rps", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms", "avg_kb")
+    lines = [f"{'endpoint':<18}" + "".join(f"{column:>10}" for column in columns)]
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, summary in rows:
+        lines.append(f"{name:<18}" + "".join(f"{summary.get(column, '-'):>10}" for column in columns))
+        if baseline:
+            before = baseline["total"] if name == "TOTAL" else baseline["endpoints"].get(name)
+            if before:
+                lines.append(f"{'  vs baseline':<18}" + "".join(
+                    f"{_change(summary.get(column), before.get(column)):>10}" for column in columns
+                ))
+    return "\n".join(lines)
+
+
+def _change(after: Any, before: Any) -> str:
+    if not isinstance(after, (int, float)) or not isinstance(before, (int, float)) or not before:
+        return "-"
+    return f"{(after - before) * 100 / before:+.0f}%"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load test for /search, /journals and /journal_stats.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="base URL of the running app")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured requests first")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="request weights, e.g. search=6,journals=2")
+    parser.add_argument("--engine", choices=["sqlite", "columnar"], help="search engine (server default if omitted)")
+    parser.add_argument("--limit", type=int, help="result limit for relevance searches")
+    parser.add_argument("--cached", action="store_true", help="allow the server's query cache to answer")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--vocabulary-size", type=int, default=DEFAULT_VOCABULARY_SIZE,
+                        help="must match the corpus generator to get realistic hit rates")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--json", help="write the report as JSON to this path")
+    parser.add_argument("--compare", help="baseline report (from --json) to compare against")
+    args = parser.parse_args(argv)
+
+    base_url = args.url.rstrip("/")
+    try:
+        totals = requests.get(f"{base_url}/journal_stats", timeout=args.timeout).json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"Cannot reach the app at {base_url}: {e}")
+        return 1
+    journal_codes = [row["journal_code"] for row in totals]
+    article_count = sum(row["count"] for row in totals)
+    print(f"Target {base_url}: {article_count} articles in {len(journal_codes)} journals; "
+          f"{args.concurrency} workers for {args.duration}s after {args.warmup}s warm-up")
+
+    factory = RequestFactory(parse_mix(args.mix), journal_codes, build_vocabulary(args.vocabulary_size, args.seed),
+                             args.engine, args.cached, args.limit)
+    report = LoadTest(base_url, factory, args.concurrency, args.duration, args.warmup, args.timeout, args.seed).run()
+    report["articles"] = article_count
+    report["settings"] = vars(args)
+
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    print()
+    print(format_report(report, baseline))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
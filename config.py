@@ -3,30 +3,39 @@
 JOURNAL_CONFIGS = {
     "jmcmar": {
         "name": "Journal of Medicinal Chemistry",
+        "publisher": "ACS",
         "base_url": "https://pubs.acs.org",
         "toc_path_template": "/toc/jmcmar/0/0",
+        "poll_paths": ["/toc/jmcmar/current", "/toc/jmcmar/0/0"],  # 定时轮询的当前期和 ASAP 页面
         "cookie_file": "cookies/cookies.json",
         "parser_module": "parsers.acs_parser",
+        "detail_parser_module": "parsers.acs_detail_parser",
         "crawler_class": "AcsJournalCrawler",
         "journal_code": "jmcmar"
     },
     "jacsat": {
         "name": "Journal of the American Chemical Society",
+        "publisher": "ACS",
         "base_url": "https://pubs.acs.org",
         "toc_path_template": "/toc/jacsat/0/0",
+        "poll_paths": ["/toc/jacsat/current", "/toc/jacsat/0/0"],  # 定时轮询的当前期和 ASAP 页面
         "cookie_file": "cookies/cookies.json",
         "parser_module": "parsers.acs_parser",
+        "detail_parser_module": "parsers.acs_detail_parser",
         "crawler_class": "AcsJournalCrawler",
         "journal_code": "jacsat"
     },
-    # 可以添加其他期刊的配置
+    # 可以添加其他期刊的配置。crawler_class / parser_module 可写成 "模块:类名"，
+    # 或已安装包在 journal_scout.crawlers / journal_scout.parsers 入口点组中注册的名称（见 utils/plugins.py）
     # "another_journal": {
     #     "name": "Another Journal",
     #     "base_url": "https://another.pub.com",
     #     "toc_path_template": "/toc/{journal_code}/current",
+    #     "poll_paths": ["/toc/{journal_code}/current"],  # 可选，默认轮询 toc_path_template
     #     "cookie_file": "data/cookies_another.json",
     #     "parser_module": "another_parser",
-    #     "crawler_class": "AnotherJournalCrawler",
+    #     "parser_class": "AnotherJournalParser",  # 可选，模块中只有一个解析器类时可省略
+    #     "crawler_class": "another_crawler:AnotherJournalCrawler",
     #     "journal_code": "another_journal"
     # }
 }
@@ -85,6 +94,99 @@ USER_AGENT_LIST = [
 MAX_REQUEST_TIMEOUT = 15
 MAX_PLAYWRIGHT_WAIT_MS = 60000
 
+# --- 数据库设置 ---
+DATABASE_PATH = 'databases/journals.db'
+DB_READ_POOL_SIZE = 8                 # 只读连接池上限
+DB_MMAP_SIZE = 256 * 1024 * 1024      # PRAGMA mmap_size (字节)
+DB_CACHE_SIZE_KB = 64 * 1024          # PRAGMA cache_size (KiB)
+
+# --- 查询缓存 (/search, /journal_stats) ---
+QUERY_CACHE_MAX_ENTRIES = 256
+QUERY_CACHE_TTL_SECONDS = 300
+
+# --- 搜索引擎 ---
+# /search 请求可通过 "engine": "sqlite" | "columnar" 选择引擎，未指定时使用 SEARCH_ENGINE_DEFAULT。
+# columnar 引擎需要 numpy，把过滤/排序用到的列常驻内存。
+COLUMNAR_SEARCH_ENABLED = True
+SEARCH_ENGINE_DEFAULT = 'sqlite'
+# /search 请求中 "sort": "relevance" 时按 BM25 相关度排序，/similar/<doi> 返回相似文章。需要 numpy。
+RELEVANCE_SEARCH_ENABLED = True
+RELEVANCE_INDEX_DIR = 'databases/bm25'
+RELEVANCE_DEFAULT_LIMIT = 100
+# 增量段超过该文档数时合并进磁盘上的主索引
+RELEVANCE_DELTA_LIMIT = 5000
+
+# --- 批量爬取进度 ---
+# 每个任务只保留最近的这么多条错误（另按类型累计总数）
+BATCH_ERROR_HISTORY = 50
+# /batch_progress 没有新事件时发送保活注释的间隔
+BATCH_PROGRESS_KEEPALIVE_SECONDS = 15
+
+# --- 详情补全 (/enrich) ---
+# 每批抓取的详情页数（每批一个写事务）、并发线程数、所有线程合计每分钟最多抓取的页数（0 为不限速）
+ENRICH_BATCH_SIZE = 20
+ENRICH_WORKERS = 2
+ENRICH_RATE_PER_MINUTE = 20
+# 抓取失败的文章最多重试的次数（跨多次运行累计）
+ENRICH_MAX_ATTEMPTS = 3
+
+# --- 定时轮询 (当前期与 ASAP) ---
+# 为 True 时 app.py 启动后台线程，按各期刊的 poll_paths 定时抓取，文章列表指纹变化时才解析入库
+POLL_ENABLED = False
+# 新页面的初始间隔，以及自适应调整的上下限（秒）
+POLL_INITIAL_INTERVAL_SECONDS = 3600
+POLL_MIN_INTERVAL_SECONDS = 900
+POLL_MAX_INTERVAL_SECONDS = 86400
+
+# --- 摘要压缩 ---
+# 为 True 时新写入的摘要用 zstd 字典压缩存储（需要 zstandard）。已有数据用
+# python -m utils.compression convert 训练字典并转换，report 查看体积与解压耗时
+ABSTRACT_COMPRESSION = False
+ABSTRACT_ZSTD_LEVEL = 9
+# 字典大小（字节）和训练时抽样的摘要数
+ABSTRACT_DICT_SIZE = 112 * 1024
+ABSTRACT_DICT_SAMPLES = 20000
+# 短于该字节数的摘要不压缩（帧头开销大于收益）
+ABSTRACT_MIN_BYTES = 64
+
+# --- 性能剖析 ---
+# 默认关闭（任何客户端都能通过请求头触发剖析）；为 False 时忽略 X-Profile 请求头、?profile=1 参数和批量任务的 profile 选项
+PROFILING_ENABLED = False
+PROFILE_DIR = 'databases/profiles'
+# 只保留最近的这么多份剖析结果
+PROFILE_MAX_FILES = 50
+# 批量任务 profile="sample" 时的采样间隔（秒）
+PROFILE_SAMPLE_INTERVAL = 0.01
+
+# --- HTTP 缓存与压缩 ---
+# 小于该字节数的响应不压缩
+HTTP_COMPRESS_MIN_BYTES = 1024
+HTTP_GZIP_LEVEL = 6
+# 安装了 brotli 时优先使用
+HTTP_BROTLI_QUALITY = 5
+# 按 endpoint 设置 Cache-Control。数据接口用 no-cache：浏览器可以缓存，但每次都用 ETag 验证，
+# 数据没变时服务器返回 304；期刊配置只随重启变化，允许短时间内不验证直接使用。
+HTTP_CACHE_CONTROL = {
+    'index': 'no-cache',
+    'search_page': 'no-cache',
+    'batch_crawl_page': 'no-cache',
+    'get_journal_configs': 'public, max-age=300',
+    'search': 'private, no-cache',
+    'similar_articles': 'private, no-cache',
+    'get_journals': 'private, no-cache',
+    'get_journal_stats': 'private, no-cache',
+    'get_journal_period_stats': 'private, no-cache',
+    'get_db_stats': 'no-store',
+    'get_cache_stats': 'no-store',
+    'get_migration_status': 'no-store',
+    'get_feed': 'no-store',
+    'get_metrics': 'no-store',
+    'list_profiles': 'no-store',
+    'get_profile': 'no-store',
+    'get_enrichment_status': 'no-store',
+    'get_poll_status': 'no-store',
+}
+
 # --- 代理设置 ---
 # 如果您需要使用代理，请在此处填写您的代理服务器信息。
 # 如果 PROXY_SETTINGS 为 None 或 server 为空，则不使用代理。
@@ -12,6 +12,7 @@ from typing import List, Dict, Any, Tuple, Optional
 
 from .base_crawler import BaseJournalCrawler
 from config import MAX_REQUEST_TIMEOUT, MAX_PLAYWRIGHT_WAIT_MS, PROXY_SETTINGS
+from utils import metrics
 
 # --- Helper Function: is_cf_challenge ---
 def is_cf_challenge(html_content: str | None) -> bool:
@@ -69,6 +70,8 @@ class AcsJournalCrawler(BaseJournalCrawler):
         final_html = None
         final_cookies = None
         error_obj = None
+        mode = "headless" if headless else "headed"
+        challenge_seen = False
 
         print(f"Playwright: Attempting to access {url} with headless={headless}")
 
@@ -92,14 +95,15 @@ class AcsJournalCrawler(BaseJournalCrawler):
                     print(f"Playwright: Using proxy server {PROXY_SETTINGS['server']}")
                     launch_options["proxy"] = PROXY_SETTINGS
                 
-                browser = p.chromium.launch(**launch_options)
-                
-                context = browser.new_context(
-                            user_agent=self.user_agent,
-                            locale="en-US",
-                            timezone_id="America/Los_Angeles",
-                            java_script_enabled=True,
-                        )
+                with metrics.time_stage("browser_launch"):
+                    browser = p.chromium.launch(**launch_options)
+                    
+                    context = browser.new_context(
+                                user_agent=self.user_agent,
+                                locale="en-US",
+                                timezone_id="America/Los_Angeles",
+                                java_script_enabled=True,
+                            )
                 
                 if initial_cookies:
                     print(f"Playwright: Loading {len(initial_cookies)} cookies into context.")
@@ -113,36 +117,43 @@ class AcsJournalCrawler(BaseJournalCrawler):
                 print(f"Playwright: Navigating to {url}...")
                 
                 # 增加随机延迟，模拟人类操作
-                time.sleep(random.uniform(1, 3))
+                with metrics.time_stage("delay"):
+                    time.sleep(random.uniform(1, 3))
                 
-                page.goto(url, wait_until="domcontentloaded", timeout=self.max_playwright_wait_ms)
+                with metrics.time_stage("goto"):
+                    page.goto(url, wait_until="domcontentloaded", timeout=self.max_playwright_wait_ms)
                 print("Playwright: Initial navigation complete. Checking for challenge...")
 
                 start_time = time.time()
                 solved = False
 
-                while (time.time() - start_time) * 1000 < self.max_playwright_wait_ms:
-                    # Wait for network to be idle or specific selector to appear before getting content
-                    try:
-                        page.wait_for_load_state('networkidle', timeout=5000) # Wait up to 5 seconds for network idle
-                    except PlaywrightTimeoutError:
-                        pass # Continue if network is not idle, page might still be usable
+                with metrics.time_stage("challenge_wait"):
+                    while (time.time() - start_time) * 1000 < self.max_playwright_wait_ms:
+                        # Wait for network to be idle or specific selector to appear before getting content
+                        try:
+                            page.wait_for_load_state('networkidle', timeout=5000) # Wait up to 5 seconds for network idle
+                        except PlaywrightTimeoutError:
+                            pass # Continue if network is not idle, page might still be usable
 
-                    current_html = page.content()
-                    current_title = page.title()
-                    cf_clearance_cookie = next ( (c for c in context.cookies() if c["name"] == "cf_clearance"), None)
+                        with metrics.time_stage("page_content"):
+                            current_html = page.content()
+                        current_title = page.title()
+                        cf_clearance_cookie = next ( (c for c in context.cookies() if c["name"] == "cf_clearance"), None)
 
-                    if not is_cf_challenge(current_html) and "Just a moment" not in current_title and cf_clearance_cookie:
-                        print("Playwright: Cloudflare challenge solved successfully!")
-                        final_html = current_html
-                        final_cookies = context.cookies()
-                        solved = True
-                        break
+                        if is_cf_challenge(current_html) or "Just a moment" in current_title:
+                            challenge_seen = True
 
-                    if (time.time() - start_time) * 1000 >= self.max_playwright_wait_ms:
-                        break
+                        if not is_cf_challenge(current_html) and "Just a moment" not in current_title and cf_clearance_cookie:
+                            print("Playwright: Cloudflare challenge solved successfully!")
+                            final_html = current_html
+                            final_cookies = context.cookies()
+                            solved = True
+                            break
 
-                    page.wait_for_timeout(300)
+                        if (time.time() - start_time) * 1000 >= self.max_playwright_wait_ms:
+                            break
+
+                        page.wait_for_timeout(300)
 
                 if not solved:
                     raise PlaywrightTimeoutError(f"Cloudflare challenge resolution timed out after {self.max_playwright_wait_ms}ms.")
@@ -154,10 +165,17 @@ class AcsJournalCrawler(BaseJournalCrawler):
             print(f"Playwright General Error: {e}")
             traceback.print_exc()
             error_obj = e
+
+        metrics.FETCH_ATTEMPTS.inc(mode=mode, result="ok" if final_html else "error")
+        if challenge_seen:
+            metrics.CF_CHALLENGES.inc(mode=mode, outcome="solved" if final_html else "unsolved")
+        if final_html:
+            metrics.BYTES_FETCHED.inc(len(final_html.encode("utf-8")))
         
         return final_html, final_cookies, error_obj
 
-    def crawl_page(self, url: str, cookie_dir: str = 'cookies', headless: bool = True) -> Tuple[Optional[str], Optional[List[Dict]], Optional[Exception]]:
+    def crawl_page(self, url: str, cookie_dir: str = 'cookies', headless: bool = True,
+                   headed_fallback: bool = True) -> Tuple[Optional[str], Optional[List[Dict]], Optional[Exception]]:
         # saved_cookies = self._load_cookies(cookie_dir=cookie_dir) # 注释掉加载cookie的步骤
         saved_cookies = [] # 确保始终以无cookie状态启动
         
@@ -172,8 +190,10 @@ class AcsJournalCrawler(BaseJournalCrawler):
             self._save_cookies(playwright_cookies, cookie_dir=cookie_dir)
             return playwright_html, playwright_cookies, None
 
-        # 2. 如果无头模式失败，则切换到有头模式重试
+        # 2. 如果无头模式失败，则切换到有头模式重试（headed_fallback=False 时不切换，如没有图形界面的服务器）
         print(f"Playwright failed in headless mode. Error: {playwright_error}")
+        if not headed_fallback:
+            return None, None, playwright_error
         print("Retrying with non-headless Playwright for manual interaction...")
         
         playwright_html_interactive, playwright_cookies_interactive, playwright_error_interactive = self._fetch_page_with_playwright(
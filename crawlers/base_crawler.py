@@ -40,9 +40,11 @@ class BaseJournalCrawler(ABC):
             print(f"Saved {len(cookies)} cookies to {cookie_file}")
 
     @abstractmethod
-    def crawl_page(self, url: str, cookie_dir: str = 'cookies', headless: bool = True) -> Tuple[Optional[str], Optional[List[Dict]], Optional[Exception]]:
+    def crawl_page(self, url: str, cookie_dir: str = 'cookies', headless: bool = True,
+                   headed_fallback: bool = True) -> Tuple[Optional[str], Optional[List[Dict]], Optional[Exception]]:
         """
         抽象方法：爬取指定 URL 的页面内容和 cookies。
+        headed_fallback=False 表示无头模式失败时不再打开有头浏览器重试（没有图形界面的环境）。
         返回 (html_content, cookies, error_obj)
         """
         pass
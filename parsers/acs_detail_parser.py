@@ -0,0 +1,68 @@
+# acs_detail_parser.py
+from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional
+
+from .base_parser import BaseJournalParser
+from utils import metrics
+
+
+def _unique(values: List[str]) -> List[str]:
+    return list(dict.fromkeys(v for v in values if v))
+
+
+class AcsArticleDetailParser(BaseJournalParser):
+    """
+    解析 ACS 文章详情页（/doi/...），用于补全目录页缺失的摘要、作者，以及目录页没有的单位和关键词。
+    先读页面正文，取不到时退回 <meta name="dc.*"> 标签。
+    返回只含一篇文章的列表（与 BaseJournalParser 接口一致），取不到的字段为 None。
+    """
+
+    @metrics.timed("detail_parse")
+    def parse_html(self, html_content: str) -> List[Dict[str, Any]]:
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        def meta_values(name: str) -> List[str]:
+            return [tag.get('content', '').strip() for tag in soup.find_all('meta', attrs={'name': name})]
+
+        # 标题
+        title_tag = soup.select_one('h1.article_header-title') or soup.select_one('span.hlFld-Title')
+        title = title_tag.get_text(' ', strip=True) if title_tag else (meta_values('dc.Title') or [None])[0]
+
+        # 摘要: 正文中的摘要段落可能有多段
+        abstract: Optional[str] = None
+        paragraphs = soup.select('p.articleBody_abstractText') or soup.select('div.article_abstract-content p')
+        if paragraphs:
+            abstract = '\n'.join(p.get_text(' ', strip=True) for p in paragraphs).strip() or None
+        if not abstract:
+            abstract = (meta_values('dc.Description') or [None])[0] or None
+
+        # 作者
+        author_tags = soup.select('ul.loa span.hlFld-ContribAuthor') or soup.select('span.hlFld-ContribAuthor')
+        authors_list = _unique([tag.get_text(' ', strip=True) for tag in author_tags]) or _unique(meta_values('dc.Creator'))
+        authors = ', '.join(authors_list) if authors_list else None
+
+        # 单位
+        affiliation_tags = soup.select('div.loa-info-affiliations-info') or soup.select('span.aff-text')
+        affiliations_list = _unique([tag.get_text(' ', strip=True) for tag in affiliation_tags])
+        affiliations = '; '.join(affiliations_list) if affiliations_list else None
+
+        # 关键词
+        keyword_tags = soup.select('div.article_keywords a') or soup.select('ul.rlist--inline.keywords a')
+        keywords_list = _unique([tag.get_text(' ', strip=True) for tag in keyword_tags]) or _unique(meta_values('dc.Subject'))
+        keywords = '; '.join(keywords_list) if keywords_list else None
+
+        date_tag = soup.select_one('span.pub-date-value')
+        date = date_tag.get_text(strip=True) if date_tag else (meta_values('dc.Date') or [None])[0]
+
+        doi = (meta_values('dc.Identifier') or [None])[0]
+
+        return [{
+            "title": title,
+            "doi": doi,
+            "date": date,
+            "authors": authors,
+            "abstract": abstract,
+            "affiliations": affiliations,
+            "keywords": keywords,
+            "journal_code": self.journal_code,
+        }]
@@ -3,11 +3,13 @@ from bs4 import BeautifulSoup
 from typing import List, Dict, Any
 
 from .base_parser import BaseJournalParser
+from utils import metrics
 
 class AcsJournalParser(BaseJournalParser):
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
 
+    @metrics.timed("parse")
     def parse_html(self, html_content: str) -> List[Dict[str, Any]]:
         """
         解析 HTML 内容，提取期刊文章信息。
@@ -52,4 +54,5 @@ class AcsJournalParser(BaseJournalParser):
                 "abstract": abstract,
                 "journal_code": self.journal_code # 添加期刊代码
             })
+        metrics.ARTICLES_PER_PAGE.observe(len(articles_data))
         return articles_data
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+保存的搜索（订阅）与增量匹配。
+
+saved_searches 保存 /search 的过滤条件。每批文章入库时（与入库在同一个写事务里），
+只把这批新增或内容变化的行放进临时表，再对每个保存的搜索执行一次限定在这些行上的查询
+（percolator 式：用文章去匹配查询，而不是每次用查询扫全表），命中写入 search_feed。
+同一篇文章对同一个搜索只记录一次。UI 带上 since=<上次看到的最大 feed id> 轮询，只读新增的几行，
+告警的开销随新数据量增长，与库的总大小无关。
+"""
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.articles import build_search_conditions
+
+# 保存时只保留与过滤有关的 /search 参数
+QUERY_KEYS = (
+    "date_from", "date_to", "journal_codes",
+    "title_keywords", "title_search_type",
+    "author_keywords", "author_search_type",
+    "abstract_keywords", "abstract_search_type",
+)
+
+# 这些键是列表；单个字符串按只含一项的列表处理，避免逐字符匹配
+_LIST_KEYS = ("journal_codes", "title_keywords", "author_keywords", "abstract_keywords")
+
+_CHUNK = 500
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def clean_query(query: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """去掉与过滤无关的键和空值，关键词去首尾空白。"""
+    cleaned = {}
+    for key in QUERY_KEYS:
+        value = (query or {}).get(key)
+        if key in _LIST_KEYS and isinstance(value, str):
+            value = [value]
+        if isinstance(value, list):
+            value = [v.strip() for v in value if isinstance(v, str) and v.strip()]
+        elif isinstance(value, str):
+            value = value.strip()
+        if value:
+            cleaned[key] = value
+    return cleaned
+
+
+def create_saved_search(conn: sqlite3.Connection, name: str, query: Dict[str, Any]) -> int:
+    return conn.execute(
+        "INSERT INTO saved_searches (name, query, created_at) VALUES (?, ?, ?)",
+        (name, json.dumps(clean_query(query), sort_keys=True, ensure_ascii=False), _utc_now())
+    ).lastrowid
+
+
+def delete_saved_search(conn: sqlite3.Connection, search_id: int) -> bool:
+    conn.execute("DELETE FROM search_feed WHERE search_id = ?", (search_id,))
+    return conn.execute("DELETE FROM saved_searches WHERE id = ?", (search_id,)).rowcount > 0
+
+
+def list_saved_searches(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    rows = conn.execute("""
+        SELECT s.id, s.name, s.query, s.created_at, s.last_matched_at,
+               (SELECT COUNT(*) FROM search_feed f WHERE f.search_id = s.id),
+               (SELECT COALESCE(MAX(f.id), 0) FROM search_feed f WHERE f.search_id = s.id)
+        FROM saved_searches s ORDER BY s.id
+    """).fetchall()
+    return [
+        {"id": search_id, "name": name, "query": json.loads(query), "created_at": created_at,
+         "last_matched_at": last_matched_at, "match_count": match_count, "last_feed_id": last_feed_id}
+        for search_id, name, query, created_at, last_matched_at, match_count, last_feed_id in rows
+    ]
+
+
+def match_changed(conn: sqlite3.Connection, urls: Iterable[str], matched_at: Optional[str] = None) -> Dict[int, int]:
+    """
+    用本批新增/变化的行（按 url）匹配所有保存的搜索，命中写入 search_feed（不提交事务）。
+    返回 {search_id: 新增命中数}，只包含有新命中的搜索。
+    """
+    urls = list(urls)
+    if not urls:
+        return {}
+    searches = conn.execute("SELECT id, query FROM saved_searches").fetchall()
+    if not searches:
+        return {}
+
+    matched_at = matched_at or _utc_now()
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS alert_batch (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.alert_batch")
+    for i in range(0, len(urls), _CHUNK):
+        chunk = urls[i:i + _CHUNK]
+        conn.execute(
+            f"INSERT OR IGNORE INTO temp.alert_batch SELECT id FROM journals WHERE url IN ({','.join('?' for _ in chunk)})",
+            chunk
+        )
+
+    new_matches = {}
+    for search_id, query in searches:
+        # 旧版本可能把字符串形式的关键词原样存下，匹配前再规范化一次
+        conditions, params = build_search_conditions(clean_query(json.loads(query)))
+        where = " AND ".join(conditions) if conditions else "1"
+        count = conn.execute(
+            "INSERT OR IGNORE INTO search_feed (search_id, article_id, matched_at) "
+            f"SELECT ?, j.id, ? FROM temp.alert_batch b JOIN journals j ON j.id = b.id WHERE {where}",
+            [search_id, matched_at, *params]
+        ).rowcount
+        if count:
+            new_matches[search_id] = count
+    if new_matches:
+        conn.executemany(
+            "UPDATE saved_searches SET last_matched_at = ? WHERE id = ?",
+            [(matched_at, search_id) for search_id in new_matches]
+        )
+    conn.execute("DELETE FROM temp.alert_batch")
+    return new_matches
+
+
+def read_feed(
+    conn: sqlite3.Connection,
+    since: int = 0,
+    search_id: Optional[int] = None,
+    limit: int = 100,
+) -> Dict[str, Any]:
+    """返回 feed id 大于 since 的命中（按 feed id 升序），以及下次轮询用的 last_id。"""
+    query = """
+        SELECT f.id, f.search_id, s.name, f.matched_at, j.journal_code, j.title, j.url, j.doi, j.date, j.authors
+        FROM search_feed f
+        JOIN saved_searches s ON s.id = f.search_id
+        JOIN journals j ON j.id = f.article_id
+        WHERE f.id > ?
+    """
+    params: List[Any] = [since]
+    if search_id is not None:
+        query += " AND f.search_id = ?"
+        params.append(search_id)
+    query += " ORDER BY f.id LIMIT ?"
+    params.append(limit)
+    items = [
+        {"feed_id": feed_id, "search_id": sid, "search_name": name, "matched_at": matched_at,
+         "journal_code": journal_code, "title": title, "url": url, "doi": doi, "date": date, "authors": authors}
+        for feed_id, sid, name, matched_at, journal_code, title, url, doi, date, authors in conn.execute(query, params)
+    ]
+    return {"items": items, "last_id": items[-1]["feed_id"] if items else since}
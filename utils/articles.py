@@ -0,0 +1,87 @@
+"""
+/search 各条查询路径共用的部分:
+- build_search_conditions: 把 /search 的过滤参数转为 SQL 条件（SQLite 搜索、相关度排序、保存的搜索共用）
+- fetch_articles: 按 id 批量读取文章，供列式引擎、相关度排序等先算出 id 顺序、再取整行的查询路径使用
+"""
+import sqlite3
+from typing import Any, Dict, List, Sequence, Tuple
+
+from utils.compression import abstract_expr, decode_abstract
+
+_RESULT_COLUMNS = "j.id, j.journal_code, j.title, j.url, j.doi, j.date, j.authors, j.abstract, m.name"
+_CHUNK = 500
+
+
+def like_pattern(keyword: str) -> str:
+    """模糊搜索的 LIKE 参数（配合 ESCAPE '\\'）: 关键词中的 % 和 _ 按字面匹配，与列式引擎的子串匹配一致。"""
+    escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_search_conditions(data: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    """把 /search 的过滤参数转为针对别名 j 的 WHERE 条件列表和参数列表。"""
+    conditions = []
+    params = []
+
+    # Date range
+    if data.get('date_from'):
+        conditions.append("j.date_iso >= ?")
+        params.append(data['date_from'])
+    if data.get('date_to'):
+        conditions.append("j.date_iso <= ?")
+        params.append(data['date_to'])
+
+    # Keywords
+    for field in ['title', 'author', 'abstract']:
+        keywords = data.get(f'{field}_keywords')
+        search_type = data.get(f'{field}_search_type', 'fuzzy')
+        if keywords:
+            # 摘要可能压缩存储，过滤时先解压
+            column = abstract_expr("j.abstract") if field == 'abstract' else f"j.{'authors' if field == 'author' else field}"
+            field_conditions = []
+            for keyword in keywords:
+                if search_type == 'exact':
+                    field_conditions.append(f"{column} = ?")
+                    params.append(keyword)
+                else: # fuzzy
+                    field_conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+                    params.append(like_pattern(keyword))
+            conditions.append(f"({' OR '.join(field_conditions)})")
+
+    # Journal codes
+    if data.get('journal_codes'):
+        placeholders = ','.join('?' for _ in data['journal_codes'])
+        conditions.append(f"j.journal_code IN ({placeholders})")
+        params.extend(data['journal_codes'])
+
+    return conditions, params
+
+
+def fetch_articles(conn: sqlite3.Connection, ids: Sequence[int]) -> List[Dict[str, Any]]:
+    """按 ids 的顺序返回文章字典（字段与 /search 的结果一致），不存在的 id 被跳过。"""
+    ids = [int(i) for i in ids]
+    rows_by_id = {}
+    for i in range(0, len(ids), _CHUNK):
+        chunk = ids[i:i + _CHUNK]
+        for row in conn.execute(
+            f"SELECT {_RESULT_COLUMNS} FROM journals j LEFT JOIN journal_meta m ON m.code = j.journal_code "
+            f"WHERE j.id IN ({','.join('?' for _ in chunk)})", chunk
+        ):
+            rows_by_id[row[0]] = row
+
+    articles = []
+    for row_id in ids:
+        row = rows_by_id.get(row_id)
+        if row is None:
+            continue
+        articles.append({
+            "journal_code": row[1],
+            "title": row[2],
+            "url": row[3],
+            "doi": row[4],
+            "date": row[5],
+            "authors": row[6],
+            "abstract": decode_abstract(row[7]),
+            "journal_name": row[8],
+        })
+    return articles
@@ -0,0 +1,134 @@
+"""
+进程内查询结果缓存。
+
+LRU + TTL 双重上限，键为 (命名空间, 规范化后的请求参数)。缓存绑定一个数据版本号
+(Database.generation)，版本号变化时整体失效，因此爬取入库或清库后不会返回旧结果；
+generation 也会随其他进程的提交递增（PRAGMA data_version），batch_cli 等命令行工具写库后同样失效。
+结果行数超过 max_result_rows 的不缓存: 列表按长度计，字典（如带 facets 的 /search）按其中各列表的长度之和计。
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+HIT = "HIT"
+MISS = "MISS"
+BYPASS = "BYPASS"
+
+
+def result_rows(value: Any) -> int:
+    """结果的大致行数，用于 max_result_rows 判断。"""
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(result_rows(v) for v in value.values())
+    return 0
+
+
+def normalize_payload(payload: Optional[Dict[str, Any]], ignore_keys: Tuple[str, ...] = ()) -> str:
+    """
+    把请求参数规范化为稳定的字符串键：去掉空值和 ignore_keys，字符串去首尾空白，
+    列表去重排序（关键词之间是 OR 关系、期刊代码是集合，顺序不影响结果）。
+    """
+    def _norm(value):
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, (list, tuple)):
+            items = {json.dumps(_norm(v), sort_keys=True, ensure_ascii=False) for v in value if v not in (None, "")}
+            return sorted(items)
+        if isinstance(value, dict):
+            return {k: _norm(v) for k, v in value.items() if v not in (None, "", [], {})}
+        return value
+
+    cleaned = {
+        k: _norm(v) for k, v in (payload or {}).items()
+        if k not in ignore_keys and v not in (None, "", [], {})
+    }
+    return json.dumps(cleaned, sort_keys=True, ensure_ascii=False)
+
+
+class QueryCache:
+    def __init__(
+        self,
+        generation_fn: Callable[[], int],
+        max_entries: int = 256,
+        ttl_seconds: float = 300,
+        max_result_rows: int = 5000,
+    ):
+        self.generation_fn = generation_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_result_rows = max_result_rows
+
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._generation = generation_fn()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "bypasses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _check_generation(self) -> None:
+        generation = self.generation_fn()
+        if generation != self._generation:
+            if self._entries:
+                self._metrics["invalidations"] += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Any],
+        bypass: bool = False,
+    ) -> Tuple[Any, str]:
+        """返回 (结果, 'HIT' | 'MISS' | 'BYPASS')。bypass=True 时既不读也不写缓存。"""
+        if bypass:
+            with self._lock:
+                self._metrics["bypasses"] += 1
+            return compute(), BYPASS
+
+        cache_key = (namespace, key)
+        with self._lock:
+            self._check_generation()
+            generation = self._generation
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(cache_key)
+                    self._metrics["hits"] += 1
+                    return value, HIT
+                del self._entries[cache_key]
+                self._metrics["expirations"] += 1
+            self._metrics["misses"] += 1
+
+        # 在锁外执行查询，避免慢查询阻塞其他命中缓存的请求
+        value = compute()
+
+        if result_rows(value) > self.max_result_rows:
+            return value, MISS
+        with self._lock:
+            # 查询期间若有写入，结果可能已过时，不再写入缓存
+            if self.generation_fn() == generation == self._generation:
+                self._entries[cache_key] = (time.monotonic(), value)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._metrics["evictions"] += 1
+        return value, MISS
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                **self._metrics,
+                "hit_rate": round(self._metrics["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "generation": self._generation,
+            }
@@ -0,0 +1,383 @@
+"""
+可选的内存列式搜索引擎（需要 numpy）。
+
+把 journals 表中用于过滤和排序的列加载为紧凑的 NumPy 列:
+    ids          int64   行 id（升序）
+    date_days    int32   date_iso 距 1970-01-01 的天数，缺失或无法解析为 _NO_DATE
+    journal_idx  int16   journal_code 的分类编码，categories 保存编码到代码的映射
+    title_rank   int32   标题的全局排序名次，用于 ORDER BY title
+    years        int16   date_iso 前四位的年份，缺失或不是数字为 0（年份分面）
+标题和作者另有按 token 建立的倒排表（token 字符串经 sys.intern 去重），关键词先通过倒排表取候选行，
+再对候选行做子串/相等校验，因此结果与 /search 的 LIKE / = 语义一致。摘要不进内存，摘要关键词条件
+仍由 SQLite 求出 id 集合后再与其他条件的掩码合并。
+
+分面统计（/search 的 facets 参数）在过滤得到行位置后一次算完: 期刊和年份对编码列做 bincount，
+作者用按行分组的作者编号（_AuthorGroups，扁平数组 + 每行作者数）展开掩码后 bincount，不再回到 SQLite。
+
+数据变化（Database.generation 变化，包括其他进程的提交）后 refresh() 在一个读事务里增量同步:
+id 大于已加载最大 id 的行追加，row_version 大于上次水位的行（原地更新，见迁移 014）重新加载；
+库中行数与内存中的行数加新行数不一致说明有行被删除，整体重建。
+"""
+import re
+import sys
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.articles import fetch_articles, like_pattern
+from utils.compression import abstract_expr
+from utils.facets import DEFAULT_FACET_LIMIT, format_counts, split_authors
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅列式引擎需要
+    np = None
+
+_NO_DATE = np.iinfo(np.int32).min if np is not None else None
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# SQLite 的 LIKE 只对 ASCII 字母不区分大小写，这里保持一致
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+_LOAD_COLUMNS = "id, journal_code, title, authors, date_iso"
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _ascii_lower(text: Optional[str]) -> str:
+    return (text or "").translate(_ASCII_LOWER)
+
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(_ascii_lower(text))
+
+
+class _TextField:
+    """一列短文本（标题或作者）：原文 + token 倒排表（token -> 行位置数组）。"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.postings: Dict[str, array] = {}
+
+    def _index(self, pos: int, text: Optional[str]) -> None:
+        for token in set(_tokens(text)):
+            token = sys.intern(token)
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array("i")
+            posting.append(pos)
+
+    def append(self, text: Optional[str]) -> None:
+        self.values.append(text or "")
+        self._index(len(self.values) - 1, text)
+
+    def replace(self, pos: int, text: Optional[str]) -> None:
+        # 旧 token 的倒排项保留不删：倒排表只用于取候选，最终都会按原文校验
+        self.values[pos] = text or ""
+        self._index(pos, text)
+
+    def candidates(self, keyword: str) -> Optional["np.ndarray"]:
+        """可能包含 keyword 的行位置；keyword 没有可索引的 token 时返回 None（需全量校验）。"""
+        keyword_tokens = _tokens(keyword)
+        if not keyword_tokens:
+            return None
+        result = None
+        for kt in keyword_tokens:
+            # 关键词的 token 可能只是某个词的一部分（LIKE '%kina%'），因此匹配所有包含它的词
+            matched = [np.frombuffer(p, dtype=np.int32) for t, p in self.postings.items() if kt in t]
+            positions = np.unique(np.concatenate(matched)) if matched else np.empty(0, dtype=np.int32)
+            result = positions if result is None else np.intersect1d(result, positions, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+    def match(self, keywords: Sequence[str], exact: bool, n_rows: int) -> "np.ndarray":
+        mask = np.zeros(n_rows, dtype=bool)
+        for keyword in keywords:
+            candidates = self.candidates(keyword)
+            positions = range(n_rows) if candidates is None else candidates.tolist()
+            if exact:
+                hits = [p for p in positions if self.values[p] == keyword]
+            else:
+                needle = _ascii_lower(keyword)
+                hits = [p for p in positions if needle in _ascii_lower(self.values[p])]
+            if hits:
+                mask[np.asarray(hits, dtype=np.int64)] = True
+        return mask
+
+
+class _AuthorGroups:
+    """每行的作者编号（作者名字典 + 按行的编号数组），分面统计时展开为扁平数组，数据变化后按需重建。"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.rows: List[array] = []
+        self._flat: Optional["np.ndarray"] = None
+        self._lengths: Optional["np.ndarray"] = None
+
+    def _encode(self, authors: Optional[str]) -> array:
+        ids = array("i")
+        for name in split_authors(authors):
+            idx = self._index.get(name)
+            if idx is None:
+                idx = self._index[name] = len(self.names)
+                self.names.append(name)
+            ids.append(idx)
+        return ids
+
+    def append(self, authors: Optional[str]) -> None:
+        self.rows.append(self._encode(authors))
+        self._flat = None
+
+    def replace(self, pos: int, authors: Optional[str]) -> None:
+        # 不再出现的作者名留在字典中，计数为 0，统计时被丢弃
+        self.rows[pos] = self._encode(authors)
+        self._flat = None
+
+    def counts(self, mask: "np.ndarray") -> "np.ndarray":
+        """mask 选中的行中每个作者出现的文章数（按作者编号）。"""
+        if self._flat is None:
+            self._lengths = np.fromiter((len(r) for r in self.rows), dtype=np.int64, count=len(self.rows))
+            self._flat = np.frombuffer(b"".join(r.tobytes() for r in self.rows), dtype=np.int32)
+        return np.bincount(self._flat[np.repeat(mask, self._lengths)], minlength=len(self.names))
+
+
+def _parse_day(value: str) -> "np.datetime64":
+    """把单个 date_iso 转为按天的 datetime64，无法解析时返回 NaT（即无日期）。"""
+    try:
+        return np.datetime64(value, "D")
+    except ValueError:
+        return np.datetime64("NaT", "D")
+
+
+def _top(counts: "np.ndarray", limit: int) -> "np.ndarray":
+    """计数最多的前 limit 个编号（含与第 limit 名同数的，由 format_counts 按名称截断）。"""
+    nonzero = np.flatnonzero(counts)
+    if len(nonzero) > limit:
+        threshold = np.partition(counts[nonzero], -limit)[-limit]
+        nonzero = nonzero[counts[nonzero] >= threshold]
+    return nonzero
+
+
+class ColumnarSearchEngine:
+    def __init__(self, db):
+        if np is None:
+            raise RuntimeError("numpy is required for the columnar search engine. Install it with: pip install numpy")
+        self.db = db
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids = np.empty(0, dtype=np.int64)
+        self.date_days = np.empty(0, dtype=np.int32)
+        self.journal_idx = np.empty(0, dtype=np.int16)
+        self.title_rank = np.empty(0, dtype=np.int32)
+        self.years = np.empty(0, dtype=np.int16)
+        self.categories: List[str] = []
+        self._category_index: Dict[str, int] = {}
+        self.titles = _TextField()
+        self.authors = _TextField()
+        self.author_groups = _AuthorGroups()
+        self._max_id = 0
+        self._max_version = 0
+
+    # --- 加载与增量刷新 ---
+
+    def _category(self, journal_code: str) -> int:
+        idx = self._category_index.get(journal_code)
+        if idx is None:
+            idx = self._category_index[journal_code] = len(self.categories)
+            self.categories.append(journal_code)
+        return idx
+
+    @staticmethod
+    def _to_days(date_isos: Sequence[Optional[str]]) -> "np.ndarray":
+        values = [d if d else "NaT" for d in date_isos]
+        try:
+            days = np.array(values, dtype="datetime64[D]").astype(np.int64)
+        except ValueError:
+            # 个别行的 date_iso 无法解析时逐个转换，解析失败的按无日期处理，不让整次刷新失败
+            days = np.array([_parse_day(v) for v in values], dtype="datetime64[D]").astype(np.int64)
+        days[days == np.iinfo(np.int64).min] = _NO_DATE
+        return days.astype(np.int32)
+
+    @staticmethod
+    def _to_years(date_isos: Sequence[Optional[str]]) -> "np.ndarray":
+        # 与 SQLite 的 CAST(substr(date_iso, 1, 4) AS INTEGER) 一致，按前四位取年份，不是数字的记为 0
+        return np.fromiter((int(d[:4]) if d and d[:4].isdigit() else 0 for d in date_isos),
+                           dtype=np.int16, count=len(date_isos))
+
+    def _append_rows(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        for _, _, title, authors, _ in rows:
+            self.titles.append(title)
+            self.authors.append(authors)
+            self.author_groups.append(authors)
+        self.ids = np.concatenate([self.ids, np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))])
+        self.journal_idx = np.concatenate([
+            self.journal_idx,
+            np.fromiter((self._category(r[1]) for r in rows), dtype=np.int16, count=len(rows)),
+        ])
+        date_isos = [r[4] for r in rows]
+        self.date_days = np.concatenate([self.date_days, self._to_days(date_isos)])
+        self.years = np.concatenate([self.years, self._to_years(date_isos)])
+        self._max_id = int(self.ids[-1])
+
+    def _replace_rows(self, rows: List[tuple]) -> None:
+        for row_id, journal_code, title, authors, date_iso in rows:
+            pos = int(np.searchsorted(self.ids, row_id))
+            if pos >= len(self.ids) or self.ids[pos] != row_id:
+                continue
+            self.titles.replace(pos, title)
+            self.authors.replace(pos, authors)
+            self.author_groups.replace(pos, authors)
+            self.journal_idx[pos] = self._category(journal_code)
+            self.date_days[pos] = self._to_days([date_iso])[0]
+            self.years[pos] = self._to_years([date_iso])[0]
+
+    def _rank_titles(self) -> None:
+        order = sorted(range(len(self.titles.values)), key=self.titles.values.__getitem__)
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[np.asarray(order, dtype=np.int64)] = np.arange(len(order), dtype=np.int32)
+        self.title_rank = rank
+
+    def refresh(self, force: bool = False) -> None:
+        generation = self.db.generation
+        with self._lock:
+            if not force and generation == self._generation:
+                return
+            with self.db.read() as conn:
+                # 行数、新行和更新的行取自同一个快照，之间提交的写入不会被算错
+                conn.execute("BEGIN")
+                total = conn.execute("SELECT COUNT(*) FROM journals").fetchone()[0]
+                max_version = conn.execute("SELECT COALESCE(MAX(row_version), 0) FROM journals").fetchone()[0]
+                new_rows = conn.execute(
+                    f"SELECT {_LOAD_COLUMNS} FROM journals WHERE id > ? ORDER BY id", (self._max_id,)
+                ).fetchall()
+                changed_rows = []
+                if force or len(self.ids) + len(new_rows) != total:
+                    # 有行被删除（清库、其他进程删除），无法增量处理，整体重建
+                    self._reset()
+                    new_rows = conn.execute(f"SELECT {_LOAD_COLUMNS} FROM journals ORDER BY id").fetchall()
+                elif max_version > self._max_version:
+                    changed_rows = conn.execute(
+                        f"SELECT {_LOAD_COLUMNS} FROM journals WHERE row_version > ? AND id <= ?",
+                        (self._max_version, self._max_id)
+                    ).fetchall()
+            self._append_rows(new_rows)
+            self._replace_rows(changed_rows)
+            if new_rows or changed_rows or force:
+                self._rank_titles()
+            self._max_version = max_version
+            self._generation = generation
+
+    # --- 查询 ---
+
+    def _abstract_mask(self, keywords: Sequence[str], exact: bool) -> "np.ndarray":
+        op = f"{abstract_expr()} = ?" if exact else f"{abstract_expr()} LIKE ? ESCAPE '\\'"
+        params = list(keywords) if exact else [like_pattern(k) for k in keywords]
+        with self.db.read() as conn:
+            matched = np.fromiter(
+                (row[0] for row in conn.execute(f"SELECT id FROM journals WHERE {' OR '.join(op for _ in keywords)}", params)),
+                dtype=np.int64,
+            )
+        return np.isin(self.ids, matched)
+
+    def _match_positions(self, data: Dict[str, Any]) -> "np.ndarray":
+        """满足 /search 过滤条件的行位置（升序）；调用方持有 self._lock。"""
+        n_rows = len(self.ids)
+        mask = np.ones(n_rows, dtype=bool)
+
+        # 有日期条件时，缺失日期的行被排除（与 SQL 中 NULL 比较的结果一致）
+        if data.get('date_from') or data.get('date_to'):
+            mask &= self.date_days != _NO_DATE
+        if data.get('date_from'):
+            mask &= self.date_days >= np.datetime64(data['date_from'], 'D').astype(np.int64)
+        if data.get('date_to'):
+            mask &= self.date_days <= np.datetime64(data['date_to'], 'D').astype(np.int64)
+
+        if data.get('journal_codes'):
+            wanted = [self._category_index[c] for c in data['journal_codes'] if c in self._category_index]
+            mask &= np.isin(self.journal_idx, np.asarray(wanted, dtype=np.int16))
+
+        for field, text_field in (('title', self.titles), ('author', self.authors)):
+            keywords = data.get(f'{field}_keywords')
+            if keywords and mask.any():
+                exact = data.get(f'{field}_search_type', 'fuzzy') == 'exact'
+                mask &= text_field.match(keywords, exact, n_rows)
+
+        abstract_keywords = data.get('abstract_keywords')
+        if abstract_keywords and mask.any():
+            mask &= self._abstract_mask(abstract_keywords, data.get('abstract_search_type', 'fuzzy') == 'exact')
+
+        return np.flatnonzero(mask)
+
+    def _sorted_ids(self, positions: "np.ndarray") -> "np.ndarray":
+        # 日期倒序、缺失日期排最后（与 SQLite 的 ORDER BY date_iso DESC 一致），同日按标题升序
+        date_key = -self.date_days[positions].astype(np.int64)
+        order = np.lexsort((self.title_rank[positions], date_key))
+        return self.ids[positions[order]]
+
+    def _facet_counts(self, positions: "np.ndarray", fields: Sequence[str], limit: int) -> Dict[str, List[Dict[str, Any]]]:
+        """positions 中各分面的计数，格式与 utils.facets.FacetCounter.result() 相同。"""
+        result = {}
+        for field in fields:
+            if field == "journal_code":
+                counts = np.bincount(self.journal_idx[positions], minlength=len(self.categories))
+                pairs = zip(self.categories, counts.tolist())
+            elif field == "year":
+                years = self.years[positions]
+                years = years[years > 0].astype(np.int64)
+                base = int(years.min()) if len(years) else 0
+                pairs = ((base + offset, count) for offset, count in enumerate(np.bincount(years - base).tolist()))
+            else:
+                mask = np.zeros(len(self.ids), dtype=bool)
+                mask[positions] = True
+                counts = self.author_groups.counts(mask)
+                pairs = ((self.author_groups.names[i], int(counts[i])) for i in _top(counts, limit).tolist())
+            result[field] = format_counts(field, pairs, limit)
+        return result
+
+    def search_ids(self, data: Dict[str, Any]) -> "np.ndarray":
+        """按 /search 的过滤条件返回排好序（date_iso DESC, title ASC）的行 id。"""
+        self.refresh()
+        with self._lock:
+            return self._sorted_ids(self._match_positions(data))
+
+    def search_ids_with_facets(self, data: Dict[str, Any], fields: Sequence[str],
+                               limit: int = DEFAULT_FACET_LIMIT) -> Tuple["np.ndarray", Dict[str, Any]]:
+        """search_ids() 加上同一组匹配行的分面计数，过滤只做一次。"""
+        self.refresh()
+        with self._lock:
+            positions = self._match_positions(data)
+            return self._sorted_ids(positions), self._facet_counts(positions, fields, limit)
+
+    def facets(self, data: Dict[str, Any], fields: Sequence[str], limit: int = DEFAULT_FACET_LIMIT) -> Dict[str, Any]:
+        """只统计分面，不排序（sort=relevance 时结果由 BM25 排序）。"""
+        self.refresh()
+        with self._lock:
+            return self._facet_counts(self._match_positions(data), fields, limit)
+
+    def search(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.fetch_articles(self.search_ids(data).tolist())
+
+    def fetch_articles(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """按给定顺序从 SQLite 取出完整文章（含摘要），只读取真正返回的行。"""
+        with self.db.read() as conn:
+            return fetch_articles(conn, ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rows": int(len(self.ids)),
+                "journals": len(self.categories),
+                "title_tokens": len(self.titles.postings),
+                "author_tokens": len(self.authors.postings),
+                "facet_authors": len(self.author_groups.names),
+                "row_version": self._max_version,
+                "generation": self._generation,
+            }
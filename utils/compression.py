@@ -0,0 +1,428 @@
+"""
+摘要的 zstd 字典压缩（可选，需要 zstandard）。
+
+- 存储: 压缩后的摘要仍放在 journals.abstract 中，类型为 BLOB（zstd 帧，帧头带字典 id）；未压缩的行、
+  占位符和很短的摘要保持 TEXT。两种行可以混存，读取时按类型区分，所以转换可以分批进行、随时中断。
+  统计表触发器、占位符判断（abstract = 'No abstract found'）和 content_hash 都不受影响。
+- 字典: 从库中抽样训练，保存在 abstract_dictionaries 表（字典 id 即 zstd 帧中的 dict_id）；
+  换字典后旧帧仍能用旧字典解压。decompress 只把字典标记为停用（retired_at），不删除，
+  所以新字典的 id 总是大于用过的所有 id，同一个 id 不会对应两份字典。
+- 读取: 只有真正返回的行才解压（decode_abstract）；按摘要过滤时 SQL 改用注册在每个连接上的
+  abstract_text() 函数逐行解压后再 LIKE（见 abstract_expr），这是压缩换来的额外开销，report 会给出。
+- 写入: configure(write=True) 后 upsert_articles / 详情补全写入的新摘要直接压缩。
+- 同步: 已载入的字典随库中的 abstract_dictionaries 更新（新连接、Database 发现其他进程的提交、
+  解压时遇到未载入的字典 id），所以在应用运行时转换或还原不需要重启。
+
+用法:
+    python -m utils.compression convert           # 没有字典时先训练，再分批压缩已有摘要
+    python -m utils.compression report            # 体积、压缩率、解压延迟和摘要过滤耗时
+    python -m utils.compression decompress        # 全部还原为 TEXT（关闭压缩前）
+"""
+import argparse
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PLACEHOLDER_ABSTRACT = "No abstract found"
+# 私有字典的 id 从 32768 开始（更小的值由 zstd 格式保留）
+_DICT_ID_BASE = 32768
+
+
+def available() -> bool:
+    return zstandard is not None
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class AbstractCodec:
+    """进程内共享的编解码器；zstandard 的压缩/解压对象不是线程安全的，每个线程各建一份。"""
+
+    def __init__(self):
+        self.level = 9
+        self.min_bytes = 64
+        self.write = False
+        self._dictionaries: Dict[int, Any] = {}
+        # 每个字典的 created_at，load() 据此发现字典的增减
+        self._stamps: Dict[int, Optional[str]] = {}
+        # 最新的未停用字典，新摘要用它压缩；为 None 时不压缩
+        self._latest_id: Optional[int] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 库文件路径（attach 时记下），解压遇到未载入的字典 id 时从这里重新读取
+        self.path: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        """库中有未停用的字典，可能存在压缩的行。"""
+        return self._latest_id is not None
+
+    def _build(self, data: bytes):
+        dictionary = zstandard.ZstdCompressionDict(data)
+        dictionary.precompute_compress(level=self.level)
+        return dictionary
+
+    def add_dictionary(self, dict_id: int, data: bytes, created_at: Optional[str] = None) -> None:
+        with self._lock:
+            if dict_id not in self._dictionaries:
+                self._dictionaries[dict_id] = self._build(data)
+                self._stamps[dict_id] = created_at
+            if self._latest_id is None or dict_id > self._latest_id:
+                self._latest_id = dict_id
+
+    def load(self, conn: sqlite3.Connection) -> None:
+        """
+        按库中的 abstract_dictionaries 更新已载入的字典。停用的字典仍然载入（解压旧帧用），但不再用于压缩。
+        字典有增减时丢弃各线程缓存的压缩/解压对象，它们按字典 id 缓存。
+        """
+        if zstandard is None:
+            return
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(abstract_dictionaries)")}
+        retired = "retired_at IS NOT NULL" if "retired_at" in columns else "0"
+        rows = conn.execute(f"SELECT id, created_at, {retired} FROM abstract_dictionaries").fetchall() if columns else []
+        stamps = {dict_id: created_at for dict_id, created_at, _ in rows}
+        latest = max((dict_id for dict_id, _, is_retired in rows if not is_retired), default=None)
+        if stamps == self._stamps and latest == self._latest_id:
+            return
+        changed = [dict_id for dict_id, stamp in stamps.items()
+                   if dict_id not in self._dictionaries or self._stamps.get(dict_id) != stamp]
+        data = conn.execute(
+            f"SELECT id, dict FROM abstract_dictionaries WHERE id IN ({','.join('?' * len(changed))})", changed
+        ).fetchall() if changed else []
+        with self._lock:
+            dictionaries = {dict_id: d for dict_id, d in self._dictionaries.items()
+                            if dict_id in stamps and dict_id not in changed}
+            for dict_id, blob in data:
+                dictionaries[dict_id] = self._build(blob)
+            if stamps != self._stamps:
+                self._local = threading.local()
+            self._dictionaries = dictionaries
+            self._stamps = stamps
+            self._latest_id = latest
+
+    def reload(self) -> None:
+        """从 attach 时记下的库文件重新读取字典。"""
+        if self.path is None:
+            return
+        conn = sqlite3.connect(self.path)
+        try:
+            self.load(conn)
+        finally:
+            conn.close()
+
+    def _compressor(self):
+        cache = getattr(self._local, "compressors", None)
+        if cache is None:
+            cache = self._local.compressors = {}
+        compressor = cache.get(self._latest_id)
+        if compressor is None:
+            compressor = cache[self._latest_id] = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._dictionaries[self._latest_id], write_checksum=False,
+            )
+        return compressor
+
+    def _decompressor(self, dict_id: int):
+        cache = getattr(self._local, "decompressors", None)
+        if cache is None:
+            cache = self._local.decompressors = {}
+        decompressor = cache.get(dict_id)
+        if decompressor is None:
+            dictionary = self._dictionaries.get(dict_id)
+            if dictionary is None and dict_id:
+                # 其他进程刚训练的字典: 重新读取一次
+                self.reload()
+                dictionary = self._dictionaries.get(dict_id)
+                if dictionary is None:
+                    raise LookupError(f"abstract dictionary {dict_id} is not in abstract_dictionaries")
+            decompressor = cache[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressor
+
+    def compress(self, text: str) -> bytes:
+        return self._compressor().compress(text.encode("utf-8"))
+
+    def encode(self, text: Optional[str]) -> Union[str, bytes, None]:
+        """写入前调用: 开启压缩且摘要足够长时返回 zstd 帧，否则原样返回。"""
+        if not self.write or not self.active or not text or text == PLACEHOLDER_ABSTRACT:
+            return text
+        raw = text.encode("utf-8")
+        if len(raw) < self.min_bytes:
+            return text
+        return self._compressor().compress(raw)
+
+    def decode(self, value: Union[str, bytes, None]) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        if zstandard is None:
+            raise RuntimeError("this abstract is stored compressed; install zstandard to read it: pip install zstandard")
+        dict_id = zstandard.get_frame_parameters(value).dict_id
+        return self._decompressor(dict_id).decompress(value).decode("utf-8")
+
+
+codec = AbstractCodec()
+
+
+def configure(write: bool = False, level: int = 9, min_bytes: int = 64) -> None:
+    if write and zstandard is None:
+        raise RuntimeError("abstract compression needs the zstandard package")
+    codec.write = write
+    codec.level = level
+    codec.min_bytes = min_bytes
+
+
+def encode_abstract(text: Optional[str]) -> Union[str, bytes, None]:
+    return codec.encode(text)
+
+
+def decode_abstract(value: Union[str, bytes, None]) -> Optional[str]:
+    return codec.decode(value)
+
+
+def abstract_expr(column: str = "abstract") -> str:
+    """
+    按摘要内容过滤时使用的 SQL 表达式: 库中有字典（可能有压缩行）时先用 abstract_text() 解压，
+    与 config.ABSTRACT_COMPRESSION 无关（它只决定新写入的摘要是否压缩）。
+    """
+    return f"abstract_text({column})" if codec.active else column
+
+
+def attach(conn: sqlite3.Connection) -> None:
+    """在连接上注册 abstract_text()，并载入库中的字典（Database 为每个新连接调用）。"""
+    conn.create_function("abstract_text", 1, codec.decode, deterministic=True)
+    path = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), None)
+    if path:
+        codec.path = path
+    codec.load(conn)
+
+
+def source_codec(conn: sqlite3.Connection, schema: str) -> Optional[AbstractCodec]:
+    """
+    ATTACH 为 schema 的另一个库的解码器；那个库没有压缩行时返回 None。
+    字典 id 在每个库里各自从 32769 编号，同一个 id 在两个库中是不同的字典，所以不能载入全局 codec。
+    """
+    has_compressed = conn.execute(
+        f"SELECT 1 FROM {schema}.journals WHERE typeof(abstract) = 'blob' LIMIT 1"
+    ).fetchone()
+    if not has_compressed:
+        return None
+    if zstandard is None:
+        raise RuntimeError("the source database stores compressed abstracts; install zstandard to import it")
+    source = AbstractCodec()
+    has_table = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'abstract_dictionaries'"
+    ).fetchone()
+    if has_table:
+        for dict_id, data in conn.execute(f"SELECT id, dict FROM {schema}.abstract_dictionaries"):
+            source.add_dictionary(dict_id, data)
+    return source
+
+
+# --- 字典训练与转换 ---
+
+def sample_abstracts(conn: sqlite3.Connection, count: int, min_bytes: int, seed: int = 0) -> List[bytes]:
+    """随机抽取 count 篇摘要（解压后的原文）。"""
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM journals WHERE abstract IS NOT NULL AND abstract != ?", (PLACEHOLDER_ABSTRACT,)
+    )]
+    chosen = random.Random(seed).sample(ids, min(count, len(ids)))
+    samples = []
+    for i in range(0, len(chosen), 500):
+        chunk = chosen[i:i + 500]
+        for (value,) in conn.execute(f"SELECT abstract FROM journals WHERE id IN ({','.join('?' * len(chunk))})", chunk):
+            raw = codec.decode(value).encode("utf-8")
+            if len(raw) >= min_bytes:
+                samples.append(raw)
+    return samples
+
+
+def train_dictionary(db, dict_size: int, sample_count: int) -> int:
+    """抽样训练新字典并保存，返回字典 id。"""
+    with db.read() as conn:
+        samples = sample_abstracts(conn, sample_count, codec.min_bytes)
+    if len(samples) < 100:
+        raise ValueError(f"only {len(samples)} abstracts to train on; need at least 100")
+    with db.write() as conn:
+        # 停用的字典也参与取最大值，id 从不复用
+        dict_id = conn.execute("SELECT COALESCE(MAX(id), ?) + 1 FROM abstract_dictionaries", (_DICT_ID_BASE,)).fetchone()[0]
+        dictionary = zstandard.train_dictionary(dict_size, samples, dict_id=dict_id, level=codec.level)
+        created_at = _utc_now()
+        conn.execute(
+            "INSERT INTO abstract_dictionaries (id, dict, sample_count, created_at) VALUES (?, ?, ?, ?)",
+            (dict_id, dictionary.as_bytes(), len(samples), created_at)
+        )
+    codec.add_dictionary(dict_id, dictionary.as_bytes(), created_at)
+    return dict_id
+
+
+def convert(db, compress: bool = True, chunk_size: int = 2000) -> int:
+    """分批压缩（或解压）摘要，每批一个事务；已转换的行被跳过，中断后重跑即可继续。返回转换的行数。"""
+    if compress:
+        select = ("SELECT id, abstract FROM journals WHERE id > ? AND typeof(abstract) = 'text' "
+                  "AND abstract != ? AND length(CAST(abstract AS BLOB)) >= ? ORDER BY id LIMIT ?")
+        params = (PLACEHOLDER_ABSTRACT, codec.min_bytes)
+        transform = codec.compress
+    else:
+        select = "SELECT id, abstract FROM journals WHERE id > ? AND typeof(abstract) = 'blob' ORDER BY id LIMIT ?"
+        params = ()
+        transform = codec.decode
+
+    cursor = 0
+    converted = 0
+    while True:
+        with db.write() as conn:
+            rows = conn.execute(select, (cursor, *params, chunk_size)).fetchall()
+            if not rows:
+                break
+            conn.executemany("UPDATE journals SET abstract = ? WHERE id = ?",
+                             [(transform(value), row_id) for row_id, value in rows])
+        cursor = rows[-1][0]
+        converted += len(rows)
+        print(f"  {converted} abstracts {'compressed' if compress else 'decompressed'} (id <= {cursor})")
+    return converted
+
+
+# --- 报告 ---
+
+def _percentile_us(values: List[float], pct: float) -> float:
+    from utils.metrics import percentile
+    return round(percentile(sorted(values), pct) * 1e6, 1)
+
+
+def report(db, sample_count: int = 2000, page_size: int = 50) -> Dict[str, Any]:
+    """库中摘要的存储情况，以及抽样得到的压缩率和解压延迟（有字典与无字典对比）。"""
+    with db.read() as conn:
+        rows = dict(conn.execute("SELECT typeof(abstract), COUNT(*) FROM journals GROUP BY 1").fetchall())
+        stored = dict(conn.execute(
+            "SELECT typeof(abstract), SUM(length(CAST(abstract AS BLOB))) FROM journals GROUP BY 1"
+        ).fetchall())
+        original = conn.execute(
+            "SELECT SUM(length(CAST(abstract_text(abstract) AS BLOB))) FROM journals"
+        ).fetchone()[0] or 0
+        page_bytes = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        samples = sample_abstracts(conn, sample_count, codec.min_bytes)
+
+        start = time.perf_counter()
+        conn.execute(f"SELECT COUNT(*) FROM journals WHERE {abstract_expr()} LIKE ?", ("%zzqx%",)).fetchone()
+        like_scan_ms = (time.perf_counter() - start) * 1000
+
+    stored_total = (stored.get("text") or 0) + (stored.get("blob") or 0)
+    result: Dict[str, Any] = {
+        "rows": {"text": rows.get("text", 0), "compressed": rows.get("blob", 0), "null": rows.get("null", 0)},
+        "abstract_bytes": {"original": original, "stored": stored_total,
+                           "ratio": round(original / stored_total, 2) if stored_total else None},
+        "database_bytes": {"file": page_bytes * page_count, "free": page_bytes * free_pages},
+        "abstract_like_scan_ms": round(like_scan_ms, 1),
+        "dictionaries": sorted(codec._dictionaries),
+    }
+    if not samples or zstandard is None:
+        return result
+
+    variants = {"zstd": zstandard.ZstdCompressor(level=codec.level, write_checksum=False)}
+    if codec.active:
+        variants["zstd+dict"] = codec._compressor()
+    raw_bytes = sum(len(s) for s in samples)
+    sample_report: Dict[str, Any] = {"samples": len(samples), "raw_bytes": raw_bytes}
+    for name, compressor in variants.items():
+        frames = [compressor.compress(s) for s in samples]
+        decompressor = (zstandard.ZstdDecompressor() if name == "zstd"
+                        else codec._decompressor(codec._latest_id))
+        timings = []
+        for frame in frames:
+            start = time.perf_counter()
+            decompressor.decompress(frame).decode("utf-8")
+            timings.append(time.perf_counter() - start)
+        compressed_bytes = sum(len(f) for f in frames)
+        sample_report[name] = {
+            "bytes": compressed_bytes,
+            "ratio": round(raw_bytes / compressed_bytes, 2),
+            "decode_p50_us": _percentile_us(timings, 50),
+            "decode_p95_us": _percentile_us(timings, 95),
+            f"decode_{page_size}_rows_ms": round(sum(timings) / len(timings) * page_size * 1000, 3),
+        }
+    result["sample"] = sample_report
+    return result
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    rows, sizes, database = result["rows"], result["abstract_bytes"], result["database_bytes"]
+    mb = 1024 * 1024
+    lines = [
+        f"abstract rows: {rows['compressed']} compressed, {rows['text']} text, {rows['null']} null",
+        f"abstract bytes: {sizes['original'] / mb:.1f} MB original, {sizes['stored'] / mb:.1f} MB stored"
+        + (f" (ratio {sizes['ratio']})" if sizes["ratio"] else ""),
+        f"database file: {database['file'] / mb:.1f} MB ({database['free'] / mb:.1f} MB free pages, reclaimed by VACUUM)",
+        f"full abstract LIKE scan: {result['abstract_like_scan_ms']} ms",
+    ]
+    sample = result.get("sample")
+    if sample:
+        lines.append(f"sample of {sample['samples']} abstracts ({sample['raw_bytes'] / 1024:.0f} KB):")
+        for name in ("zstd", "zstd+dict"):
+            if name in sample:
+                s = sample[name]
+                page_key = next(key for key in s if key.endswith("_rows_ms"))
+                lines.append(f"  {name:<10} ratio {s['ratio']:>5}  decode p50 {s['decode_p50_us']} us, "
+                             f"p95 {s['decode_p95_us']} us, {page_key[7:-8]} rows {s[page_key]} ms")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import (DATABASE_PATH, ABSTRACT_COMPRESSION, ABSTRACT_ZSTD_LEVEL, ABSTRACT_DICT_SIZE,
+                        ABSTRACT_DICT_SAMPLES, ABSTRACT_MIN_BYTES)
+    from utils.db import Database
+    from utils.migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Store abstracts zstd-compressed with a trained dictionary.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert_parser = sub.add_parser("convert", help="compress existing abstracts (trains a dictionary if none)")
+    convert_parser.add_argument("--retrain", action="store_true", help="train a new dictionary first")
+    convert_parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    sub.add_parser("decompress", help="store every abstract as plain text again")
+    report_parser = sub.add_parser("report", help="size and decode-latency report")
+    report_parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if zstandard is None:
+        print("zstandard is not installed: pip install zstandard")
+        return 1
+    configure(write=ABSTRACT_COMPRESSION, level=ABSTRACT_ZSTD_LEVEL, min_bytes=ABSTRACT_MIN_BYTES)
+    db = Database(args.db)
+    try:
+        with db.write() as conn:
+            run_migrations(conn)
+            attach(conn)
+        if args.command == "convert":
+            if args.retrain or not codec.active:
+                dict_id = train_dictionary(db, ABSTRACT_DICT_SIZE, ABSTRACT_DICT_SAMPLES)
+                print(f"Trained dictionary {dict_id}")
+            print(f"Compressed {convert(db, compress=True)} abstracts")
+            if not ABSTRACT_COMPRESSION:
+                print("Note: ABSTRACT_COMPRESSION is False, so newly crawled abstracts will still be stored as text.")
+        elif args.command == "decompress":
+            print(f"Decompressed {convert(db, compress=False)} abstracts")
+            # 没有压缩行之后停用字典，摘要过滤恢复为普通的 LIKE；字典行保留，之后训练的字典不会复用它们的 id
+            with db.write() as conn:
+                conn.execute("UPDATE abstract_dictionaries SET retired_at = ? WHERE retired_at IS NULL", (_utc_now(),))
+        if args.command in ("convert", "decompress") and getattr(args, "vacuum", False):
+            with db.write() as conn:
+                conn.execute("VACUUM")
+        if args.command == "report":
+            print(format_report(report(db, sample_count=args.samples)))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
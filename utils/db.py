@@ -0,0 +1,248 @@
+"""
+SQLite 连接管理。
+
+- 读连接: 一个有上限的只读连接池（query_only + mmap + 大页缓存），请求线程借出后独占使用，
+  用完归还，因此在 threaded=True 的开发服务器下也能复用连接和热页缓存。
+- 写连接: 全局唯一，由锁串行化，所有写入（爬取入库、清库、迁移）都经过它。
+- 统计: 记录等待连接/写锁的时间和查询耗时，通过 Database.stats() 暴露。
+- 数据版本: 每次有实际改动的写事务提交后 generation 加一，供查询缓存等判断数据是否变化；
+  last_modified 记录最近一次改动的时间（进程启动时取启动时间），供 HTTP Last-Modified 使用。
+  其他进程（batch_cli、snapshot import、stats rebuild、dedup scan、compression convert 等）的提交
+  由一个专用连接上的 PRAGMA data_version 发现: 读取 generation 时该值变了就同样加一，
+  last_modified 取发现变化的时间，同时重新读取摘要压缩字典（compression convert / decompress 之后）。
+  轮询、补全、回填进度这类内部状态用 write(bump=False) 写入，不递增 generation，
+  否则每次轮询都会让查询缓存、ETag 和内存索引失效。
+"""
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from utils import compression
+
+
+class _TimingStat:
+    """累计某一类操作的次数、总耗时和最大耗时（秒）。"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Database:
+    def __init__(
+        self,
+        path: str,
+        read_pool_size: int = 8,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kb: int = 64 * 1024,
+        busy_timeout_ms: int = 5000,
+    ):
+        self.path = path
+        self.read_pool_size = read_pool_size
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._read_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._read_opened = 0
+        self._pool_lock = threading.Lock()
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._generation = 0
+        self._last_modified = time.time()
+        # 只用于 PRAGMA data_version 的连接: 其他连接（包括本进程的写连接）提交后它的值会变
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._version_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "read_wait": _TimingStat(),
+            "read_query": _TimingStat(),
+            "write_wait": _TimingStat(),
+            "write_query": _TimingStat(),
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # 压缩存储的摘要: 注册 abstract_text() 并载入字典
+        compression.attach(conn)
+        return conn
+
+    def _open_reader(self) -> sqlite3.Connection:
+        conn = self._connect()
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            conn = self._connect()
+            # WAL 模式下读连接不会被写事务阻塞
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._writer = conn
+        return self._writer
+
+    def _observe(self, name: str, seconds: float) -> None:
+        with self._stats_lock:
+            self._stats[name].observe(seconds)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._read_pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._read_opened < self.read_pool_size:
+                self._read_opened += 1
+                try:
+                    return self._open_reader()
+                except Exception:
+                    self._read_opened -= 1
+                    raise
+        # 连接池已满，等待其他线程归还
+        return self._read_pool.get()
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """借出一个只读连接。"""
+        start = time.perf_counter()
+        conn = self._acquire_reader()
+        acquired = time.perf_counter()
+        self._observe("read_wait", acquired - start)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._observe("read_query", time.perf_counter() - acquired)
+            self._read_pool.put(conn)
+
+    @contextmanager
+    def write(self, bump: bool = True) -> Iterator[sqlite3.Connection]:
+        """
+        独占写连接，正常退出时提交，异常时回滚。
+        bump=False 用于只改内部状态的写入: 提交后不递增 generation，但这期间其他进程的提交仍会被计入。
+        """
+        start = time.perf_counter()
+        with self._write_lock:
+            acquired = time.perf_counter()
+            self._observe("write_wait", acquired - start)
+            conn = self._get_writer()
+            changes_before = conn.total_changes
+            seen = None if bump else self._begin_quiet_write(conn)
+            try:
+                yield conn
+                conn.commit()
+                if conn.total_changes != changes_before:
+                    if bump:
+                        self._note_commit()
+                    else:
+                        self._note_quiet_commit(conn, seen)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._observe("write_query", time.perf_counter() - acquired)
+
+    def _read_data_version(self) -> int:
+        if self._version_conn is None:
+            self._version_conn = sqlite3.connect(self.path, check_same_thread=False)
+        return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _note_commit(self) -> None:
+        with self._version_lock:
+            self._generation += 1
+            self._last_modified = time.time()
+            # 本进程的提交已经计入，同时被吸收的其他进程的提交也发生在这次递增之前
+            self._data_version = self._read_data_version()
+
+    def _absorb_external_writes(self) -> None:
+        # 调用方持有 _version_lock
+        version = self._read_data_version()
+        if self._data_version is not None and version != self._data_version:
+            self._generation += 1
+            self._last_modified = time.time()
+            compression.codec.load(self._version_conn)
+        self._data_version = version
+
+    def _check_external_writes(self) -> None:
+        with self._version_lock:
+            self._absorb_external_writes()
+
+    def _begin_quiet_write(self, conn: sqlite3.Connection) -> int:
+        # 写连接上的 data_version 只随其他连接的提交变化；先记下它，再计入此前其他进程的提交
+        with self._version_lock:
+            seen = conn.execute("PRAGMA data_version").fetchone()[0]
+            self._absorb_external_writes()
+        return seen
+
+    def _note_quiet_commit(self, conn: sqlite3.Connection, seen: int) -> None:
+        with self._version_lock:
+            if conn.execute("PRAGMA data_version").fetchone()[0] != seen:
+                # 写入期间其他进程也提交了
+                self._generation += 1
+                self._last_modified = time.time()
+            self._data_version = self._read_data_version()
+
+    @property
+    def generation(self) -> int:
+        """数据版本号: 本进程的写事务或其他进程对数据库的提交都会使其递增。"""
+        self._check_external_writes()
+        return self._generation
+
+    @property
+    def last_modified(self) -> float:
+        self._check_external_writes()
+        return self._last_modified
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            timings = {name: stat.as_dict() for name, stat in self._stats.items()}
+        return {
+            "generation": self._generation,
+            "read_pool_size": self.read_pool_size,
+            "read_connections_open": self._read_opened,
+            "read_connections_idle": self._read_pool.qsize(),
+            **timings,
+        }
+
+    def close(self) -> None:
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+        with self._pool_lock:
+            while True:
+                try:
+                    self._read_pool.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._read_opened = 0
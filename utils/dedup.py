@@ -0,0 +1,188 @@
+"""
+按标题的近似重复检测（MinHash + LSH，需要 numpy）。
+
+DOI 相同的重复在入库时已由 doi 唯一索引挡住；这里找的是 DOI 不同但标题几乎一样的文章
+（例如同一篇文章在不同期刊或以更正/撤稿形式再次出现）。流程:
+    1. 标题规范化后取字符 5-gram，每个 5-gram 用 crc32 哈希
+    2. 用 NUM_PERM 个随机线性哈希 (a*x + b) mod p 计算 MinHash 签名
+    3. 签名切成 BANDS 段，任一段完全相同的标题落入同一个桶，只在桶内比较
+    4. 桶内候选用真实的 5-gram Jaccard 相似度校验，达到阈值的用并查集合并成簇
+整体近似线性，不做两两比较。结果整体写入 near_duplicates 表:
+
+    python -m utils.dedup scan --threshold 0.8
+"""
+import argparse
+import re
+import sqlite3
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅近似重复检测需要
+    np = None
+
+NUM_PERM = 128
+BANDS = 16            # 每段 8 行，候选阈值约 (1/16)^(1/8) ≈ 0.71
+SHINGLE_SIZE = 5
+MIN_TITLE_LENGTH = 20  # 太短的标题（如 "Editorial"）不参与比较
+DEFAULT_THRESHOLD = 0.8
+_PRIME = 4294967311    # 大于 2^32 的最小素数；a < 2^31、x < 2^32 时 a*x + b 不会溢出 uint64
+_SEED = 1
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def normalize_title(title: Optional[str]) -> str:
+    return _NON_WORD_RE.sub(" ", (title or "").casefold()).strip()
+
+
+def shingle_hashes(title: Optional[str]) -> Optional["np.ndarray"]:
+    """标题的 5-gram 哈希（去重、升序），标题太短时返回 None。"""
+    text = normalize_title(title)
+    if len(text) < MIN_TITLE_LENGTH:
+        return None
+    grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams)))
+
+
+def jaccard(a: "np.ndarray", b: "np.ndarray") -> float:
+    common = len(np.intersect1d(a, b, assume_unique=True))
+    return common / (len(a) + len(b) - common)
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def find_near_duplicates(
+    rows: Iterable[Tuple[int, Optional[str]]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[List[Tuple[int, float]]]:
+    """
+    rows 为 (journals.id, title)。返回近似重复簇的列表，每个簇为 [(id, 与簇内最小 id 的相似度)]，
+    按 id 升序，第一项即代表行（相似度 1.0）。
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for near-duplicate detection. Install it with: pip install numpy")
+    rng = np.random.default_rng(_SEED)
+    a = rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)[:, None]
+    b = rng.integers(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)[:, None]
+    rows_per_band = NUM_PERM // BANDS
+
+    ids: List[int] = []
+    shingles: List["np.ndarray"] = []
+    buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(BANDS)]
+    for row_id, title in rows:
+        hashes = shingle_hashes(title)
+        if hashes is None:
+            continue
+        signature = ((a * hashes[None, :] + b) % _PRIME).min(axis=1)
+        pos = len(ids)
+        ids.append(row_id)
+        shingles.append(hashes)
+        for band in range(BANDS):
+            key = signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes()
+            buckets[band][key].append(pos)
+
+    uf = _UnionFind(len(ids))
+    for band_buckets in buckets:
+        for members in band_buckets.values():
+            # 桶内两两校验（桶通常只有几个成员）；已在同一簇的跳过
+            for i, first in enumerate(members):
+                for other in members[i + 1:]:
+                    if uf.find(first) != uf.find(other) and jaccard(shingles[first], shingles[other]) >= threshold:
+                        uf.union(first, other)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for pos in range(len(ids)):
+        groups[uf.find(pos)].append(pos)
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=ids.__getitem__)
+        root = members[0]
+        clusters.append([(ids[p], 1.0 if p == root else round(jaccard(shingles[root], shingles[p]), 4)) for p in members])
+    clusters.sort(key=lambda c: c[0][0])
+    return clusters
+
+
+def scan(conn: sqlite3.Connection, threshold: float = DEFAULT_THRESHOLD) -> Dict[str, Any]:
+    """对 journals 全表做一次近似重复检测，并整体替换 near_duplicates 表的内容。"""
+    start = time.perf_counter()
+    clusters = find_near_duplicates(conn.execute("SELECT id, title FROM journals ORDER BY id"), threshold)
+    detected_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    with conn:
+        conn.execute("DELETE FROM near_duplicates")
+        conn.executemany(
+            "INSERT INTO near_duplicates (article_id, cluster_id, similarity, detected_at) VALUES (?, ?, ?, ?)",
+            [(row_id, cluster[0][0], similarity, detected_at) for cluster in clusters for row_id, similarity in cluster]
+        )
+    return {
+        "clusters": len(clusters),
+        "articles": sum(len(c) for c in clusters),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def read_clusters(conn: sqlite3.Connection, limit: int = 100) -> List[Dict[str, Any]]:
+    """读取最近一次检测的结果，已被删除的文章不返回。"""
+    rows = conn.execute("""
+        SELECT d.cluster_id, d.similarity, j.id, j.journal_code, j.title, j.doi, j.date
+        FROM near_duplicates d JOIN journals j ON j.id = d.article_id
+        WHERE d.cluster_id IN (SELECT DISTINCT cluster_id FROM near_duplicates ORDER BY cluster_id LIMIT ?)
+        ORDER BY d.cluster_id, j.id
+    """, (limit,)).fetchall()
+    clusters: Dict[int, List[Dict[str, Any]]] = {}
+    for cluster_id, similarity, row_id, journal_code, title, doi, date in rows:
+        clusters.setdefault(cluster_id, []).append({
+            "id": row_id, "journal_code": journal_code, "title": title,
+            "doi": doi, "date": date, "similarity": similarity,
+        })
+    return [{"cluster_id": cid, "articles": articles} for cid, articles in clusters.items() if len(articles) > 1]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import DATABASE_PATH
+    from utils.migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Flag near-duplicate articles by title (MinHash/LSH).")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    scan_cmd = sub.add_parser("scan", help="recompute the near_duplicates table")
+    scan_cmd.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="minimum title Jaccard similarity")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        run_migrations(conn)
+        result = scan(conn, args.threshold)
+        print(f"Found {result['clusters']} near-duplicate clusters ({result['articles']} articles) in {result['seconds']}s")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
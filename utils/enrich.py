@@ -0,0 +1,269 @@
+"""
+详情页补全: 目录页缺少摘要/作者的文章，逐篇抓取 /doi/ 详情页，用详情页解析器补全摘要、作者、单位和关键词。
+
+- 候选行: 摘要或作者为空/占位符（include_metadata 时还包括没有单位信息的行），且 article_enrichment 中
+  没有 done/empty 记录；failed 的行在 attempts 达到上限前会被重新选中。按 id 游标分批读取。
+- 抓取: 每批在线程池中并发调用爬虫的 crawl_page()，所有线程共享一个按分钟计的限速器。
+- 写入: 每批一个事务，批量 UPDATE 并记录每篇文章的补全状态；中途停止或进程退出后再次运行，
+  已完成的行不会重复抓取。
+- 只在详情页的值更完整时覆盖: 占位符/空值一律替换，已有摘要只在详情页的更长时替换。
+  content_hash 不变，它描述的是目录页的内容，之后重新爬取目录页仍判为 unchanged，不会把补全的值改回占位符。
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils import metrics
+from utils.compression import decode_abstract, encode_abstract
+
+PLACEHOLDER_ABSTRACT = "No abstract found"
+PLACEHOLDER_AUTHORS = "No authors found"
+
+# (id, url, journal_code)
+Candidate = Tuple[int, str, str]
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _is_missing(value: Optional[str], placeholder: str) -> bool:
+    return not value or value == placeholder
+
+
+class RateLimiter:
+    """多线程共享的限速器: 每分钟最多放行 per_minute 次，均匀间隔；per_minute 为 0 时不限速。"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, stop: Optional[Callable[[], bool]] = None) -> bool:
+        """等到下一个名额；等待期间 stop() 为真时返回 False。"""
+        if not self.interval:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        while True:
+            remaining = slot - time.monotonic()
+            if remaining <= 0:
+                return True
+            if stop is not None and stop():
+                return False
+            time.sleep(min(remaining, 0.5))
+
+
+def _candidate_conditions(journal_code: Optional[str], max_attempts: int,
+                          include_metadata: bool) -> Tuple[List[str], List[Any]]:
+    missing = [
+        "j.abstract IS NULL", "j.abstract = ''", "j.abstract = ?",
+        "j.authors IS NULL", "j.authors = ''", "j.authors = ?",
+    ]
+    params: List[Any] = [PLACEHOLDER_ABSTRACT, PLACEHOLDER_AUTHORS]
+    if include_metadata:
+        missing.append("j.affiliations IS NULL")
+    conditions = [
+        f"({' OR '.join(missing)})",
+        "(e.article_id IS NULL OR (e.status = 'failed' AND e.attempts < ?))",
+    ]
+    params.append(max_attempts)
+    if journal_code:
+        conditions.append("j.journal_code = ?")
+        params.append(journal_code)
+    return conditions, params
+
+
+_CANDIDATE_FROM = "FROM journals j LEFT JOIN article_enrichment e ON e.article_id = j.id"
+
+
+def select_candidates(conn: sqlite3.Connection, journal_code: Optional[str] = None, after_id: int = 0,
+                      limit: int = 20, max_attempts: int = 3, include_metadata: bool = False) -> List[Candidate]:
+    """id 大于 after_id 的下一批待补全文章。"""
+    conditions, params = _candidate_conditions(journal_code, max_attempts, include_metadata)
+    sql = (f"SELECT j.id, j.url, j.journal_code {_CANDIDATE_FROM} "
+           f"WHERE j.id > ? AND {' AND '.join(conditions)} ORDER BY j.id LIMIT ?")
+    return [tuple(row) for row in conn.execute(sql, [after_id] + params + [limit]).fetchall()]
+
+
+def count_candidates(conn: sqlite3.Connection, journal_code: Optional[str] = None, max_attempts: int = 3,
+                     include_metadata: bool = False) -> int:
+    conditions, params = _candidate_conditions(journal_code, max_attempts, include_metadata)
+    sql = f"SELECT COUNT(*) {_CANDIDATE_FROM} WHERE {' AND '.join(conditions)}"
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def enrichment_status(conn: sqlite3.Connection, journal_code: Optional[str] = None, max_attempts: int = 3) -> Dict[str, Any]:
+    """待补全数量（只看摘要/作者，以及包括缺单位信息的）和各状态的文章数。"""
+    sql = "SELECT e.status, COUNT(*) FROM article_enrichment e"
+    params: List[Any] = []
+    if journal_code:
+        sql += " JOIN journals j ON j.id = e.article_id WHERE j.journal_code = ?"
+        params.append(journal_code)
+    states = dict(conn.execute(sql + " GROUP BY e.status", params).fetchall())
+    return {
+        "pending": count_candidates(conn, journal_code, max_attempts),
+        "pending_with_metadata": count_candidates(conn, journal_code, max_attempts, include_metadata=True),
+        "states": {status: states.get(status, 0) for status in ("done", "empty", "failed")},
+    }
+
+
+def apply_details(conn: sqlite3.Connection, results: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    把一批详情页结果写入 journals（不提交事务）。各文章的补全状态放在返回值的 states 中，
+    由调用方另用 record_states 写入 article_enrichment（内部状态，不使查询缓存失效）。
+    results 的每项: {"id", "url", "details": 解析结果或 None, "error": 错误信息或 None}。
+    返回 {"enriched", "empty", "failed", "changed_urls", "states"}。
+    """
+    results = list(results)
+    counts: Dict[str, Any] = {"enriched": 0, "empty": 0, "failed": 0, "changed_urls": [], "states": []}
+    if not results:
+        return counts
+
+    ids = [result["id"] for result in results]
+    placeholders = ",".join("?" * len(ids))
+    current = {
+        row[0]: row[1:] for row in conn.execute(
+            f"SELECT id, abstract, authors, affiliations, keywords FROM journals WHERE id IN ({placeholders})", ids
+        ).fetchall()
+    }
+
+    updates = []
+    states = counts["states"]
+    now = _utc_now()
+    for result in results:
+        article_id = result["id"]
+        details = result.get("details")
+        if article_id not in current:
+            continue
+        if details is None:
+            counts["failed"] += 1
+            states.append((article_id, "failed", result.get("error"), now))
+            continue
+
+        abstract, authors, affiliations, keywords = current[article_id]
+        abstract = decode_abstract(abstract)
+        new_abstract = details.get("abstract")
+        new_authors = details.get("authors")
+        fields = {}
+        if new_abstract and (_is_missing(abstract, PLACEHOLDER_ABSTRACT) or len(new_abstract) > len(abstract)):
+            fields["abstract"] = encode_abstract(new_abstract)
+        if new_authors and _is_missing(authors, PLACEHOLDER_AUTHORS):
+            fields["authors"] = new_authors
+        if details.get("affiliations") and details["affiliations"] != affiliations:
+            fields["affiliations"] = details["affiliations"]
+        if details.get("keywords") and details["keywords"] != keywords:
+            fields["keywords"] = details["keywords"]
+
+        if fields:
+            updates.append((fields, article_id))
+            counts["enriched"] += 1
+            counts["changed_urls"].append(result["url"])
+        # 详情页也没有摘要时记为 empty，不再重试
+        status = "done" if new_abstract or not _is_missing(abstract, PLACEHOLDER_ABSTRACT) else "empty"
+        if status == "empty":
+            counts["empty"] += 1
+        states.append((article_id, status, None, now))
+
+    for fields, article_id in updates:
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        conn.execute(f"UPDATE journals SET {assignments} WHERE id = ?", list(fields.values()) + [article_id])
+    return counts
+
+
+def record_states(conn: sqlite3.Connection, states: Iterable[tuple]) -> None:
+    """写入 apply_details 返回的补全状态 (article_id, status, last_error, updated_at)，失败次数加一（不提交事务）。"""
+    conn.executemany("""
+        INSERT INTO article_enrichment (article_id, status, attempts, last_error, updated_at)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT(article_id) DO UPDATE SET
+            status = excluded.status,
+            attempts = article_enrichment.attempts + 1,
+            last_error = excluded.last_error,
+            updated_at = excluded.updated_at
+    """, states)
+
+
+def fetch_details(crawler, parser, url: str, cookie_dir: str) -> Dict[str, Any]:
+    """抓取并解析一篇文章的详情页（只用无头模式，后台并发时不弹出浏览器窗口）；失败时抛出异常。"""
+    with metrics.time_stage("detail_page"):
+        html_content, _, error = crawler.crawl_page(url, cookie_dir=cookie_dir, headed_fallback=False)
+        if error:
+            raise Exception(str(error))
+        if not html_content:
+            raise Exception("未获取到HTML内容")
+        articles = parser.parse_html(html_content)
+    if not articles:
+        raise Exception("详情页解析结果为空")
+    return articles[0]
+
+
+def run_enrichment(
+    task,
+    read_candidates: Callable[[int, int], List[Candidate]],
+    fetch: Callable[[Candidate], Dict[str, Any]],
+    store: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+    summary: metrics.StageSummary,
+    limit: Optional[int] = None,
+    batch_size: int = 20,
+    workers: int = 2,
+    rate_per_minute: float = 20,
+) -> None:
+    """
+    按批执行补全，把进度写入 task（BatchTask）。
+    read_candidates(after_id, limit) 读下一批候选，fetch(candidate) 返回解析结果，store(results) 写入一批并返回计数。
+    task 的 status 被设为 stopped 时，当前批写入后停止。
+    """
+    limiter = RateLimiter(rate_per_minute)
+
+    def stopped() -> bool:
+        return task['status'] == 'stopped'
+
+    def work(candidate: Candidate) -> Dict[str, Any]:
+        article_id, url, _ = candidate
+        with metrics.collect(summary):
+            if not limiter.wait(stopped):
+                return {"id": article_id, "url": url, "details": None, "error": None, "skipped": True}
+            task.update(current_url=url)
+            try:
+                return {"id": article_id, "url": url, "details": fetch(candidate), "error": None}
+            except Exception as e:
+                task.add_error(url, str(e), "detail_page")
+                return {"id": article_id, "url": url, "details": None, "error": str(e)}
+
+    after_id = 0
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="enrich") as pool:
+        while not stopped() and (limit is None or done < limit):
+            size = batch_size if limit is None else min(batch_size, limit - done)
+            batch = read_candidates(after_id, size)
+            if not batch:
+                break
+            after_id = batch[-1][0]
+            results = [result for result in pool.map(work, batch) if not result.get("skipped")]
+            with metrics.collect(summary):
+                counts = store(results)
+            done += len(results)
+            total = max(task['total_urls'], done)
+            task.increment(
+                successful=len(results) - counts['failed'],
+                failed=counts['failed'],
+                updated=counts['enriched'],
+                unchanged=len(results) - counts['failed'] - counts['enriched'],
+                empty=counts['empty'],
+                alert_matches=sum(counts.get('alerts', {}).values()),
+            )
+            task.update(
+                processed=done,
+                total_urls=total,
+                progress_percentage=round(done * 100 / total, 1) if total else 100,
+                stage_summary=summary.as_dict(),
+            )
+
+    if task['status'] != 'stopped':
+        task.update(status='completed', progress_percentage=100)
@@ -0,0 +1,170 @@
+"""
+/search 的分面统计: 当前过滤条件下按期刊、年份、作者（前 N 位）的文章数。
+
+请求中 facets 为 true（或 "1"）时统计全部分面，也可以是分面名称的列表或逗号分隔的字符串；
+facet_limit 限制作者分面返回的条数（期刊和年份全部返回）。
+统计对象是满足过滤条件的全部行，与排序和 limit 无关（sort=relevance 时也是如此）。
+
+列式引擎用预先编码的列一次算完（见 ColumnarSearchEngine.search_ids_with_facets）；
+SQLite 路径在读取结果行的同一遍循环里用 FacetCounter 累加。
+
+核对列式引擎与 SQLite GROUP BY 的结果（不一致时退出码为 1）:
+    python -m utils.facets check
+"""
+import sqlite3
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.articles import build_search_conditions
+
+FACET_FIELDS = ("journal_code", "year", "authors")
+DEFAULT_FACET_LIMIT = 10
+PLACEHOLDER_AUTHORS = "No authors found"
+
+
+def parse_request(data: Dict[str, Any]) -> Tuple[List[str], int]:
+    """从 /search 参数中取出要统计的分面和作者条数；没有请求分面时返回空列表。"""
+    requested = data.get('facets')
+    if requested in (None, False, '', '0', 'false'):
+        return [], DEFAULT_FACET_LIMIT
+    if requested is True or requested in ('1', 'true'):
+        fields = list(FACET_FIELDS)
+    else:
+        if isinstance(requested, str):
+            requested = requested.split(',')
+        fields = [field.strip() for field in requested if field and field.strip()]
+        unknown = [field for field in fields if field not in FACET_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown facet(s): {', '.join(unknown)}; choose from {', '.join(FACET_FIELDS)}")
+    limit = int(data.get('facet_limit') or DEFAULT_FACET_LIMIT)
+    if limit <= 0:
+        raise ValueError("facet_limit must be positive")
+    return fields, limit
+
+
+def split_authors(authors: Optional[str]) -> List[str]:
+    """解析器以 ', ' 拼接作者；占位符和空值没有作者。"""
+    if not authors or authors == PLACEHOLDER_AUTHORS:
+        return []
+    return [name for name in dict.fromkeys(part.strip() for part in authors.split(',')) if name]
+
+
+def format_counts(field: str, counts: Iterable[Tuple[Any, int]], limit: int) -> List[Dict[str, Any]]:
+    """期刊按文章数降序，年份按年份降序，作者按文章数降序取前 limit 位（同数按名称）。"""
+    items = [(value, count) for value, count in counts if count]
+    if field == "year":
+        items.sort(key=lambda item: -item[0])
+    else:
+        items.sort(key=lambda item: (-item[1], item[0]))
+        if field == "authors":
+            items = items[:limit]
+    return [{"value": value, "count": count} for value, count in items]
+
+
+class FacetCounter:
+    """逐行累加分面计数，供 SQLite 路径在读取结果的同一遍循环里调用。"""
+
+    def __init__(self, fields: Sequence[str], limit: int = DEFAULT_FACET_LIMIT):
+        self.fields = list(fields)
+        self.limit = limit
+        self.counters: Dict[str, Counter] = {field: Counter() for field in self.fields}
+
+    def add(self, journal_code: str, date_iso: Optional[str], authors: Optional[str]) -> None:
+        counters = self.counters
+        if "journal_code" in counters:
+            counters["journal_code"][journal_code] += 1
+        if "year" in counters and date_iso:
+            year = date_iso[:4]
+            # 前四位不是数字的 date_iso 不计入年份分面（与列式引擎和 GROUP BY 对照实现一致）
+            if year.isdigit():
+                counters["year"][int(year)] += 1
+        if "authors" in counters:
+            counters["authors"].update(split_authors(authors))
+
+    def result(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {field: format_counts(field, self.counters[field].items(), self.limit) for field in self.fields}
+
+
+def count_sql(conn: sqlite3.Connection, conditions: List[str], params: List[Any],
+              fields: Sequence[str], limit: int = DEFAULT_FACET_LIMIT) -> Dict[str, List[Dict[str, Any]]]:
+    """只统计分面（不取结果行）: 对满足条件的行读一遍 journal_code、date_iso、authors。"""
+    counter = FacetCounter(fields, limit)
+    query = "SELECT j.journal_code, j.date_iso, j.authors FROM journals j"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    for journal_code, date_iso, authors in conn.execute(query, params):
+        counter.add(journal_code, date_iso, authors)
+    return counter.result()
+
+
+def group_by_sql(conn: sqlite3.Connection, conditions: List[str], params: List[Any],
+                 fields: Sequence[str], limit: int = DEFAULT_FACET_LIMIT) -> Dict[str, List[Dict[str, Any]]]:
+    """对照实现: 期刊和年份用 SQL GROUP BY 计算，作者（需要拆分字符串）逐行累加。"""
+    where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+    result = {}
+    for field in fields:
+        if field == "journal_code":
+            counts = conn.execute(f"SELECT j.journal_code, COUNT(*) FROM journals j{where} GROUP BY 1", params).fetchall()
+        elif field == "year":
+            year_where = where + (" AND " if where else " WHERE ") + "j.date_iso IS NOT NULL"
+            counts = conn.execute(
+                f"SELECT CAST(substr(j.date_iso, 1, 4) AS INTEGER) AS year, COUNT(*) FROM journals j{year_where} "
+                "GROUP BY 1 HAVING year > 0", params
+            ).fetchall()
+        else:
+            result[field] = count_sql(conn, conditions, params, [field], limit)[field]
+            continue
+        result[field] = format_counts(field, counts, limit)
+    return result
+
+
+def check(db, engine, queries: Iterable[Dict[str, Any]], limit: int = DEFAULT_FACET_LIMIT) -> List[Dict[str, Any]]:
+    """用 group_by_sql 核对列式引擎的分面，返回不一致的查询及两边的结果。"""
+    mismatches = []
+    for data in queries:
+        from_engine = engine.facets(data, FACET_FIELDS, limit)
+        conditions, params = build_search_conditions(data)
+        with db.read() as conn:
+            expected_sql = group_by_sql(conn, conditions, params, FACET_FIELDS, limit)
+        if from_engine != expected_sql:
+            mismatches.append({"query": data, "columnar": from_engine, "sql": expected_sql})
+    return mismatches
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import json
+
+    from config import DATABASE_PATH
+    from utils import columnar
+    from utils.db import Database
+
+    parser = argparse.ArgumentParser(description="Check columnar facet counts against SQLite GROUP BY.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database path")
+    parser.add_argument("--limit", type=int, default=DEFAULT_FACET_LIMIT, help="number of top authors compared")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check", help="compare facets for all rows and for each journal")
+    args = parser.parse_args(argv)
+
+    if not columnar.available():
+        print("numpy is not installed: pip install numpy")
+        return 1
+    db = Database(args.db)
+    try:
+        engine = columnar.ColumnarSearchEngine(db)
+        engine.refresh(force=True)
+        with db.read() as conn:
+            codes = [row[0] for row in conn.execute("SELECT DISTINCT journal_code FROM journals ORDER BY 1")]
+        queries = [{}] + [{"journal_codes": [code]} for code in codes]
+        mismatches = check(db, engine, queries, args.limit)
+    finally:
+        db.close()
+    for mismatch in mismatches:
+        print(json.dumps(mismatch, ensure_ascii=False))
+    print(f"{len(queries) - len(mismatches)}/{len(queries)} facet queries match")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
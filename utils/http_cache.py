@@ -0,0 +1,152 @@
+"""
+HTTP 层的缓存与压缩。
+
+- 条件请求: conditional() 装饰的 GET 接口用 (进程启动标识, 数据 generation, 请求路径和参数) 生成强 ETag，
+  用数据最近改动时间作为 Last-Modified。客户端带 If-None-Match / If-Modified-Since 且数据没变时
+  直接返回 304，视图函数不会执行。generation 只在本进程内递增，所以 ETag 里带上启动标识，重启后旧的 ETag 全部失效。
+  其他进程写库（batch_cli、snapshot import 等）同样会使 generation 递增（见 Database 的 PRAGMA data_version 检查）。
+- Cache-Control: 按 endpoint 名称从配置表里取，未配置的接口不加。
+- 压缩: JSON / HTML 等文本响应超过阈值时按 Accept-Encoding 用 brotli（已安装时）或 gzip 压缩。
+  压缩后的 ETag 加上 -br / -gzip 后缀（不同编码是不同的表示），比较 If-None-Match 时三种形式都认。
+  只有实际压缩的响应才加 Vary: Accept-Encoding；流式响应（如 /batch_progress 的 SSE）不压缩。
+"""
+import gzip
+import hashlib
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，没有时只用 gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "text/html", "text/css", "text/plain", "text/javascript", "application/javascript",
+}
+_ENCODING_SUFFIXES = ("", "-br", "-gzip")
+
+
+class HttpCaching:
+    def __init__(
+        self,
+        app: Flask,
+        generation_fn: Callable[[], int],
+        last_modified_fn: Callable[[], float],
+        cache_control: Optional[Dict[str, str]] = None,
+        compress_min_bytes: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ):
+        self.generation_fn = generation_fn
+        self.last_modified_fn = last_modified_fn
+        self.cache_control = cache_control or {}
+        self.compress_min_bytes = compress_min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.boot_time = time.time()
+        self.boot_id = format(int(self.boot_time * 1000), "x")
+        self._lock = threading.Lock()
+        self._metrics = {"not_modified": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0}
+        app.after_request(self._after_request)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._metrics)
+
+    # --- 条件请求 ---
+
+    def _etag(self, static: bool) -> str:
+        key = request.full_path
+        if request.method == "POST":
+            key += "\0" + request.get_data(as_text=True)
+        version = "static" if static else self.generation_fn()
+        digest = hashlib.sha1(f"{version}\0{key}".encode("utf-8")).hexdigest()[:20]
+        return f"{self.boot_id}-{digest}"
+
+    def _matched_etag(self, etag: str) -> Optional[str]:
+        for suffix in _ENCODING_SUFFIXES:
+            if request.if_none_match.contains(etag + suffix):
+                return etag + suffix
+        return None
+
+    def conditional(self, static: bool = False):
+        """
+        为 GET 接口加上 ETag / Last-Modified 并处理 304。
+        static=True 表示响应只随进程重启变化（例如来自 config.py 的期刊配置）。
+        POST 只设置 ETag，不做 304 判断（浏览器不缓存 POST 响应）。
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                etag = self._etag(static)
+                last_modified = int(self.boot_time if static else self.last_modified_fn())
+                if request.method in ("GET", "HEAD"):
+                    not_modified = False
+                    if request.if_none_match:
+                        matched = self._matched_etag(etag)
+                        not_modified = matched is not None
+                    elif request.if_modified_since:
+                        not_modified = last_modified <= request.if_modified_since.timestamp()
+                    if not_modified:
+                        with self._lock:
+                            self._metrics["not_modified"] += 1
+                        response = Response(status=304)
+                        response.set_etag(matched if request.if_none_match else etag)
+                        response.last_modified = last_modified
+                        return response
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                return response
+            return wrapper
+        return decorator
+
+    # --- Cache-Control 与压缩 ---
+
+    def _after_request(self, response: Response) -> Response:
+        policy = self.cache_control.get(request.endpoint or "")
+        if policy and "Cache-Control" not in response.headers:
+            response.headers["Cache-Control"] = policy
+        return self._compress(response)
+
+    def _compress(self, response: Response) -> Response:
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+        accept = request.accept_encodings
+        if brotli is not None and accept["br"]:
+            encoding = "br"
+        elif accept["gzip"]:
+            encoding = "gzip"
+        else:
+            return response
+        data = response.get_data()
+        if len(data) < self.compress_min_bytes:
+            return response
+
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.gzip_level)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        with self._lock:
+            self._metrics["compressed"] += 1
+            self._metrics["bytes_in"] += len(data)
+            self._metrics["bytes_out"] += len(compressed)
+        return response
@@ -0,0 +1,173 @@
+"""
+文章入库。
+
+用 INSERT ... ON CONFLICT(url) DO UPDATE 代替 INSERT OR REPLACE，并用内容哈希判断是否真的需要写入:
+- 新 url: 插入
+- 已存在且内容哈希变化: 原地更新（行 id 不变，索引不抖动）
+- 已存在且内容未变: 不改写整行，只在 last_seen 早于当天时刷新 last_seen，
+  因此同一天内重复爬取同一期几乎没有写 I/O
+
+DOI 入库前先规范化（normalize_doi），且 doi 上有唯一索引。文章先按 doi、再按 url 匹配已有行，
+同一篇文章换了 URL 形式（如 /doi/abs/...）时仍写回原来那一行，行的 url 保持首次入库时的值。
+"""
+import hashlib
+import re
+import sqlite3
+from urllib.parse import unquote
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.compression import decode_abstract, encode_abstract
+
+# 参与内容哈希的字段；url 是主键，date_iso 由 date 推导
+HASHED_FIELDS = ("journal_code", "title", "doi", "date", "authors", "abstract")
+
+_SELECT_EXISTING_CHUNK = 500
+
+# doi.org 链接、"doi:" 前缀以及 ACS 站内的 /doi/、/doi/abs/、/doi/full/ 等路径前缀（旧解析结果可能只剩 abs/...）
+_DOI_PREFIX_RE = re.compile(
+    r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*|(?:(?:https?://[^/]+)?/?doi/)?(?:(?:abs|full|pdf|epdf|suppl)/)?)",
+    re.IGNORECASE,
+)
+
+
+def normalize_date_iso(date_str: Optional[str]) -> Optional[str]:
+    """把 ACS 页面上的 'January 5, 2024' 格式日期转为 'YYYY-MM-DD'，无法解析时返回 None。"""
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, '%B %d, %Y').strftime('%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """
+    把各种形式的 DOI 规范为小写的 '10.xxxx/...'（DOI 本身不区分大小写），
+    去掉 URL 编码、doi.org / 站内路径前缀和末尾的查询串；不是 DOI 时返回 None。
+    """
+    if not doi:
+        return None
+    doi = unquote(str(doi).strip())
+    doi = _DOI_PREFIX_RE.sub("", doi, count=1)
+    doi = doi.split("?", 1)[0].split("#", 1)[0].strip().rstrip("/").lower()
+    return doi if doi.startswith("10.") and "/" in doi else None
+
+
+def article_content_hash(article: Dict[str, Any]) -> str:
+    payload = "\x1f".join("" if article.get(field) is None else str(article[field]) for field in HASHED_FIELDS)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _fetch_existing(
+    conn: sqlite3.Connection, column: str, values: List[str]
+) -> Dict[str, Tuple[str, Optional[str], str]]:
+    """
+    按 url 或 doi 查已有行，返回 {值: (库中的 url, 库中的 content_hash, 按库中字段计算的哈希)}；
+    最后一项只在历史数据没有哈希时计算。
+    """
+    existing: Dict[str, Tuple[str, Optional[str], str]] = {}
+    columns = ", ".join(HASHED_FIELDS)
+    for i in range(0, len(values), _SELECT_EXISTING_CHUNK):
+        chunk = values[i:i + _SELECT_EXISTING_CHUNK]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(
+            f"SELECT {column}, url, content_hash, {columns} FROM journals WHERE {column} IN ({placeholders})", chunk
+        ):
+            key, url, stored_hash = row[0], row[1], row[2]
+            if stored_hash:
+                current_hash = stored_hash
+            else:
+                fields = dict(zip(HASHED_FIELDS, row[3:]))
+                fields["abstract"] = decode_abstract(fields["abstract"])
+                current_hash = article_content_hash(fields)
+            existing[key] = (url, stored_hash, current_hash)
+    return existing
+
+
+_UPSERT_SQL = """
+    INSERT INTO journals (journal_code, title, url, doi, date, authors, abstract, date_iso, content_hash, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(url) DO UPDATE SET
+        journal_code = excluded.journal_code,
+        title = excluded.title,
+        doi = excluded.doi,
+        date = excluded.date,
+        authors = CASE WHEN excluded.authors = 'No authors found' AND journals.authors IS NOT NULL
+                       THEN journals.authors ELSE excluded.authors END,
+        abstract = CASE WHEN excluded.abstract = 'No abstract found' AND journals.abstract IS NOT NULL
+                        THEN journals.abstract ELSE excluded.abstract END,
+        date_iso = excluded.date_iso,
+        content_hash = excluded.content_hash,
+        last_seen = excluded.last_seen
+    WHERE journals.content_hash IS NOT excluded.content_hash
+"""
+
+
+def upsert_articles(
+    conn: sqlite3.Connection,
+    articles: Iterable[Dict[str, Any]],
+    seen_at: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    把解析出的文章写入 journals 表（不提交事务，由调用方的 db.write() 负责）。
+    返回 {"inserted", "updated", "unchanged", "changed_urls"}。
+    """
+    seen_at = seen_at or _utc_now()
+    today = seen_at[:10]
+
+    # 同一批次内同一 doi（没有 doi 时同一 url）重复时以最后一次为准
+    by_key: Dict[str, Dict[str, Any]] = {}
+    for article in articles:
+        article = dict(article, doi=normalize_doi(article.get('doi')))
+        by_key[article['doi'] or article['url']] = article
+    batch = list(by_key.values())
+    existing_by_doi = _fetch_existing(conn, "doi", [a['doi'] for a in batch if a['doi']])
+    existing_by_url = _fetch_existing(conn, "url", [a['url'] for a in batch])
+
+    writes = []
+    unchanged_urls = []
+    legacy_hash_urls = []
+    inserted = updated = 0
+    for article in batch:
+        content_hash = article_content_hash(article)
+        existing = existing_by_doi.get(article['doi']) or existing_by_url.get(article['url'])
+        # 已有行沿用库中的 url，ON CONFLICT(url) 因此总能命中同一行
+        url = existing[0] if existing else article['url']
+        if existing is None:
+            inserted += 1
+        elif existing[2] == content_hash:
+            if existing[1] is None:
+                legacy_hash_urls.append((content_hash, seen_at, url))
+            else:
+                unchanged_urls.append(url)
+            continue
+        else:
+            updated += 1
+        writes.append((
+            article['journal_code'], article['title'], url, article.get('doi'), article.get('date'),
+            article.get('authors'), encode_abstract(article.get('abstract')), normalize_date_iso(article.get('date')),
+            content_hash, seen_at,
+        ))
+
+    if writes:
+        conn.executemany(_UPSERT_SQL, writes)
+    if legacy_hash_urls:
+        conn.executemany("UPDATE journals SET content_hash = ?, last_seen = ? WHERE url = ?", legacy_hash_urls)
+    if unchanged_urls:
+        # last_seen 精确到天刷新，当天重复爬取不产生写入
+        conn.executemany(
+            "UPDATE journals SET last_seen = ? WHERE url = ? AND (last_seen IS NULL OR last_seen < ?)",
+            [(seen_at, url, today) for url in unchanged_urls]
+        )
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(unchanged_urls) + len(legacy_hash_urls),
+        "changed_urls": [w[2] for w in writes],
+    }
@@ -0,0 +1,66 @@
+"""
+journal_meta 表: config.py 中 JOURNAL_CONFIGS 在数据库里的副本。
+
+启动时 sync_journal_meta() 把配置同步进来（内容没变的行不改写），查询通过固定的
+LEFT JOIN journal_meta m ON m.code = j.journal_code 取期刊名称，不再每次拼接 UNION ALL 子查询。
+从配置中删除的期刊保留行并标记 active = 0，已入库文章的期刊名称仍然可用。
+config 列保存完整配置的 JSON，供需要按期刊读取设置的地方使用。
+"""
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal_meta (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    base_url TEXT,
+    publisher TEXT,
+    config TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO journal_meta (code, name, base_url, publisher, config, active, updated_at)
+    VALUES (?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT(code) DO UPDATE SET
+        name = excluded.name,
+        base_url = excluded.base_url,
+        publisher = excluded.publisher,
+        config = excluded.config,
+        active = 1,
+        updated_at = excluded.updated_at
+    WHERE journal_meta.config IS NOT excluded.config OR journal_meta.active = 0
+"""
+
+
+def sync_journal_meta(conn: sqlite3.Connection, configs: Dict[str, Dict[str, Any]]) -> int:
+    """把 JOURNAL_CONFIGS 同步到 journal_meta（不提交事务），返回新增或变化的期刊数。"""
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    changed = 0
+    for code, config in configs.items():
+        changed += conn.execute(_UPSERT_SQL, (
+            code, config.get("name", code), config.get("base_url"), config.get("publisher"),
+            json.dumps(config, sort_keys=True, ensure_ascii=False), now,
+        )).rowcount
+    placeholders = ",".join("?" for _ in configs)
+    changed += conn.execute(
+        f"UPDATE journal_meta SET active = 0, updated_at = ? WHERE active = 1 AND code NOT IN ({placeholders})",
+        [now, *configs]
+    ).rowcount
+    return changed
+
+
+def read_journal_meta(conn: sqlite3.Connection, include_inactive: bool = False) -> List[Dict[str, Any]]:
+    query = "SELECT code, name, base_url, publisher, config, active FROM journal_meta"
+    if not include_inactive:
+        query += " WHERE active = 1"
+    query += " ORDER BY code"
+    return [
+        {"code": code, "name": name, "base_url": base_url, "publisher": publisher,
+         "config": json.loads(config), "active": bool(active)}
+        for code, name, base_url, publisher, config, active in conn.execute(query)
+    ]
@@ -0,0 +1,266 @@
+"""
+爬取过程的指标: 分阶段耗时直方图和计数器，以 Prometheus 文本格式从 /metrics 导出。
+
+阶段（journal_scout_crawl_stage_seconds 的 stage 标签）:
+    browser_launch   启动 Chromium 并创建 context
+    delay            导航前的随机等待
+    goto             page.goto
+    challenge_wait   等待 Cloudflare 挑战通过的整个循环（包含其中的 page_content）
+    page_content     单次 page.content()
+    parse            parse_html
+    store            入库事务（含提交）
+    proxy_switch     通过 Clash API 切换节点
+    page_total       批量任务中一个 URL 的全部耗时
+    detail_page      补全任务中抓取并解析一篇文章详情页的全部耗时
+    detail_parse     详情页解析器的 parse_html
+
+批量任务在每个 URL 外面用 collect() 打开一个汇总作用域（线程内有效），同一线程里记录的阶段耗时和
+带 summary_key 的计数会同时累加到该任务的汇总中，放进批量进度的 stage_summary 字段。
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_local = threading.local()
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _active_summaries() -> List["StageSummary"]:
+    return getattr(_local, "summaries", [])
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), summary_key: Optional[str] = None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.summary_key = summary_key
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        if self.summary_key:
+            for summary in _active_summaries():
+                summary.add(self.summary_key, amount)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        summary_key: Optional[str] = None,
+    ):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.summary_key = summary_key
+        # labels -> [各桶计数..., +Inf 计数, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+        if self.summary_key:
+            for summary in _active_summaries():
+                summary.add(self.summary_key, value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                cumulative += state[len(self.buckets)]
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(round(state[-1], 6))}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法百分位数。"""
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class StageSummary:
+    """
+    一个批量任务的汇总: 每个阶段的次数/总耗时/最大耗时，以及若干计数。
+    keep_samples=True 时还保留每次的耗时，as_dict() 多给出 p50/p95（基准测试用）。
+    """
+
+    def __init__(self, keep_samples: bool = False):
+        self._stages: Dict[str, List[float]] = {}
+        self._counts: Dict[str, float] = {}
+        self._samples: Optional[Dict[str, List[float]]] = {} if keep_samples else None
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            state = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            state[0] += 1
+            state[1] += seconds
+            state[2] = max(state[2], seconds)
+            if self._samples is not None:
+                self._samples.setdefault(stage, []).append(seconds)
+
+    def add(self, key: str, amount: float) -> None:
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + amount
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": count,
+                    "total_ms": round(total * 1000, 1),
+                    "avg_ms": round(total * 1000 / count, 1),
+                    "max_ms": round(maximum * 1000, 1),
+                }
+                for stage, (count, total, maximum) in self._stages.items()
+            }
+            if self._samples is not None:
+                for stage, values in self._samples.items():
+                    values = sorted(values)
+                    stages[stage]["p50_ms"] = round(percentile(values, 50) * 1000, 1)
+                    stages[stage]["p95_ms"] = round(percentile(values, 95) * 1000, 1)
+            counts = {key: int(value) if float(value).is_integer() else round(value, 3) for key, value in self._counts.items()}
+        fetches = counts.get("fetch_attempts")
+        if fetches:
+            counts["challenge_rate"] = round(counts.get("cf_challenges", 0) / fetches, 3)
+        return {"stages": stages, "counts": counts}
+
+
+# --- 指标定义 ---
+
+STAGE_SECONDS = Histogram(
+    "journal_scout_crawl_stage_seconds", "Time spent in each crawl stage.", ["stage"],
+)
+FETCH_ATTEMPTS = Counter(
+    "journal_scout_fetch_attempts_total", "Playwright page fetch attempts by browser mode and result.",
+    ["mode", "result"], summary_key="fetch_attempts",
+)
+CF_CHALLENGES = Counter(
+    "journal_scout_cf_challenges_total", "Fetches that landed on a Cloudflare challenge page, by outcome.",
+    ["mode", "outcome"], summary_key="cf_challenges",
+)
+BYTES_FETCHED = Counter(
+    "journal_scout_fetched_bytes_total", "Bytes of HTML returned by successful fetches.", summary_key="bytes_fetched",
+)
+ARTICLES_PER_PAGE = Histogram(
+    "journal_scout_articles_per_page", "Articles parsed from one table-of-contents page.",
+    buckets=(0, 1, 5, 10, 20, 30, 50, 100, 200), summary_key="articles_parsed",
+)
+PAGES = Counter(
+    "journal_scout_pages_total", "Batch-crawled pages by journal and result.", ["journal", "result"],
+)
+PROXY_SWITCHES = Counter(
+    "journal_scout_proxy_switches_total", "Clash proxy node switches by result.", ["result"], summary_key="proxy_switches",
+)
+PROXY_NODE_PAGES = Counter(
+    "journal_scout_proxy_node_pages_total", "Batch-crawled pages by proxy node and result.", ["node", "result"],
+)
+POLL_CHECKS = Counter(
+    "journal_scout_poll_checks_total", "Scheduled TOC polls by journal and result (changed, unchanged, error).",
+    ["journal", "result"],
+)
+
+ALL_METRICS = [STAGE_SECONDS, FETCH_ATTEMPTS, CF_CHALLENGES, BYTES_FETCHED, ARTICLES_PER_PAGE, PAGES, PROXY_SWITCHES,
+               PROXY_NODE_PAGES, POLL_CHECKS]
+
+
+# --- 记录 ---
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    for summary in _active_summaries():
+        summary.observe_stage(stage, seconds)
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """记录一个阶段的耗时；阶段内抛出异常时同样记录。"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """把整个函数调用记为一个阶段的装饰器。"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with time_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect(summary: StageSummary) -> Iterator[StageSummary]:
+    """在当前线程内把指标同时累加到 summary（可嵌套）。"""
+    summaries = getattr(_local, "summaries", None)
+    if summaries is None:
+        summaries = _local.summaries = []
+    summaries.append(summary)
+    try:
+        yield summary
+    finally:
+        summaries.remove(summary)
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,376 @@
+"""
+数据库版本化迁移与后台回填。
+
+- 迁移: MIGRATIONS 中按编号顺序登记，已执行的版本记录在 schema_migrations 表中，启动时只执行未执行过的。
+  每个迁移本身也是幂等的（IF NOT EXISTS / 先检查列是否存在），对引入迁移框架之前建的旧库同样安全。
+  迁移只做结构变更，必须足够快，可以在启动时同步执行。
+- 回填: 耗时的数据修补（如 date_iso）登记在 BACKFILLS 中，由 BackfillRunner 在后台线程里按 id 分块执行，
+  每块一个短事务，尽量在 SQL 中完成计算；进度游标存在 backfill_state 表中，重启后从上次位置继续，
+  之后新增（例如快照导入的）行也会在下次启动时被处理。
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.ingest import normalize_doi
+from utils.journal_meta import META_SCHEMA
+from utils.stats import install_stats
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]) -> None:
+    existing = _columns(conn, table)
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+# --- 迁移 ---
+
+def _m001_journals(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS journals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        journal_code TEXT NOT NULL,
+        title TEXT NOT NULL,
+        url TEXT NOT NULL UNIQUE,
+        doi TEXT,
+        date TEXT,
+        authors TEXT,
+        abstract TEXT,
+        date_iso TEXT
+        )
+    ''')
+    _add_columns(conn, "journals", {"date_iso": "TEXT"})
+
+
+def _m002_doi_index(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journals_doi ON journals(doi)")
+
+
+def _m003_journal_stats(conn: sqlite3.Connection) -> None:
+    install_stats(conn)
+
+
+def _m004_content_hash(conn: sqlite3.Connection) -> None:
+    _add_columns(conn, "journals", {"content_hash": "TEXT", "last_seen": "TEXT"})
+
+
+def _m005_date_iso_index(conn: sqlite3.Connection) -> None:
+    # /search 默认按 date_iso 过滤和排序
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journals_date_iso ON journals(date_iso)")
+
+
+def _m006_backfill_state(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS backfill_state (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL, updated_at TEXT)"
+    )
+
+
+# 合并重复 DOI 时，保留行中为空或为占位符的列从被删除的行补上
+_MERGED_COLUMNS = {"title": None, "date": None, "date_iso": None,
+                   "authors": "No authors found", "abstract": "No abstract found"}
+
+
+def _merge_duplicate_dois(conn: sqlite3.Connection) -> None:
+    columns = [col for col in _MERGED_COLUMNS if col in _columns(conn, "journals")]
+    dois = [row[0] for row in conn.execute(
+        "SELECT doi FROM journals WHERE doi IS NOT NULL GROUP BY doi HAVING COUNT(*) > 1"
+    )]
+    for doi in dois:
+        rows = conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM journals WHERE doi = ? ORDER BY COALESCE(last_seen, '') DESC, id DESC",
+            (doi,)
+        ).fetchall()
+        kept_id, kept = rows[0][0], rows[0][1:]
+        fields = {}
+        for i, col in enumerate(columns):
+            if kept[i] not in (None, '', _MERGED_COLUMNS[col]):
+                continue
+            value = next((row[i + 1] for row in rows[1:] if row[i + 1] not in (None, '', _MERGED_COLUMNS[col])), None)
+            if value is not None:
+                fields[col] = value
+        if fields:
+            assignments = ", ".join(f"{col} = ?" for col in fields)
+            conn.execute(f"UPDATE journals SET {assignments}, content_hash = NULL WHERE id = ?",
+                         [*fields.values(), kept_id])
+
+
+def _m007_unique_doi(conn: sqlite3.Connection) -> None:
+    # 规范化历史 DOI；被改动的行清空 content_hash，下次入库时按规范化后的字段重新计算，避免整行重写
+    conn.create_function("normalize_doi", 1, normalize_doi, deterministic=True)
+    conn.execute("UPDATE journals SET doi = normalize_doi(doi), content_hash = NULL WHERE doi IS NOT normalize_doi(doi)")
+    # 同一 DOI 只保留最近一次见到的那一行（通常是正式刊期中的版本）；先把其他行的摘要、作者等补进保留的行
+    _merge_duplicate_dois(conn)
+    removed = conn.execute("""
+        DELETE FROM journals WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY doi ORDER BY COALESCE(last_seen, '') DESC, id DESC
+                ) AS rn
+                FROM journals WHERE doi IS NOT NULL
+            ) WHERE rn > 1
+        )
+    """).rowcount
+    if removed:
+        print(f"Removed {removed} rows with duplicate DOIs")
+    conn.execute("DROP INDEX IF EXISTS idx_journals_doi")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_journals_doi_unique ON journals(doi)")
+
+
+def _m008_near_duplicates(conn: sqlite3.Connection) -> None:
+    # 由 python -m utils.dedup scan 整体重写
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS near_duplicates (
+        article_id INTEGER PRIMARY KEY,
+        cluster_id INTEGER NOT NULL,
+        similarity REAL NOT NULL,
+        detected_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_near_duplicates_cluster ON near_duplicates(cluster_id)")
+
+
+def _m009_saved_searches(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS saved_searches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        query TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        last_matched_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_feed (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        search_id INTEGER NOT NULL,
+        article_id INTEGER NOT NULL,
+        matched_at TEXT NOT NULL,
+        UNIQUE (search_id, article_id)
+        )
+    """)
+
+
+def _m010_journal_meta(conn: sqlite3.Connection) -> None:
+    # 内容由启动时的 sync_journal_meta() 从 JOURNAL_CONFIGS 同步
+    conn.execute(META_SCHEMA)
+
+
+def _m011_enrichment(conn: sqlite3.Connection) -> None:
+    # 详情页补全: 目录页没有的单位和关键词，以及每篇文章的补全状态（重复运行时跳过已完成的行）
+    _add_columns(conn, "journals", {"affiliations": "TEXT", "keywords": "TEXT"})
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS article_enrichment (
+        article_id INTEGER PRIMARY KEY,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        updated_at TEXT NOT NULL
+        )
+    """)
+
+
+def _m012_poll_state(conn: sqlite3.Connection) -> None:
+    # 定时轮询: 每个当前期/ASAP 目录页的文章列表指纹和自适应轮询间隔，重启后继续沿用
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS poll_state (
+        url TEXT PRIMARY KEY,
+        journal_code TEXT NOT NULL,
+        fingerprint TEXT,
+        article_count INTEGER,
+        interval_seconds REAL NOT NULL,
+        next_check TEXT NOT NULL,
+        last_checked TEXT,
+        last_changed TEXT,
+        checks INTEGER NOT NULL DEFAULT 0,
+        changes INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT
+        )
+    """)
+
+
+def _m013_abstract_dictionaries(conn: sqlite3.Connection) -> None:
+    # 摘要压缩用的 zstd 字典（utils/compression.py），id 即帧头中的 dict_id
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS abstract_dictionaries (
+        id INTEGER PRIMARY KEY,
+        dict BLOB NOT NULL,
+        sample_count INTEGER,
+        created_at TEXT NOT NULL
+        )
+    """)
+
+
+# 内存索引（列式引擎、BM25）关心的列；其中任一列的值真正改变时 row_version 取全表最大值 + 1
+_VERSIONED_COLUMNS = ("journal_code", "title", "authors", "abstract", "date_iso")
+
+
+def _m014_row_version(conn: sqlite3.Connection) -> None:
+    # 行内更新的水位线: 任何连接（包括其他进程）原地修改文章后，内存索引按 row_version > 上次水位 增量重载。
+    # 新插入的行不需要版本号，id 是 AUTOINCREMENT，按 id > 已加载的最大 id 即可发现。
+    _add_columns(conn, "journals", {"row_version": "INTEGER"})
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journals_row_version ON journals(row_version)")
+    changed = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in _VERSIONED_COLUMNS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_journals_row_version
+        AFTER UPDATE OF {', '.join(_VERSIONED_COLUMNS)} ON journals
+        WHEN {changed}
+        BEGIN
+            UPDATE journals SET row_version = (SELECT COALESCE(MAX(row_version), 0) + 1 FROM journals)
+            WHERE id = NEW.id;
+        END
+    """)
+
+
+def _m015_retired_dictionaries(conn: sqlite3.Connection) -> None:
+    # decompress 停用字典而不是删除，字典 id 因此单调递增、不会复用（id 即 zstd 帧头中的 dict_id）
+    _add_columns(conn, "abstract_dictionaries", {"retired_at": "TEXT"})
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "create journals", _m001_journals),
+    (2, "index journals.doi", _m002_doi_index),
+    (3, "journal_stats table and triggers", _m003_journal_stats),
+    (4, "journals.content_hash and last_seen", _m004_content_hash),
+    (5, "index journals.date_iso", _m005_date_iso_index),
+    (6, "backfill_state table", _m006_backfill_state),
+    (7, "normalise journals.doi and make it unique", _m007_unique_doi),
+    (8, "near_duplicates table", _m008_near_duplicates),
+    (9, "saved_searches and search_feed tables", _m009_saved_searches),
+    (10, "journal_meta table", _m010_journal_meta),
+    (11, "article enrichment columns and state", _m011_enrichment),
+    (12, "poll_state table", _m012_poll_state),
+    (13, "abstract_dictionaries table", _m013_abstract_dictionaries),
+    (14, "journals.row_version for in-place updates", _m014_row_version),
+    (15, "abstract_dictionaries.retired_at", _m015_retired_dictionaries),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    )
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+
+def run_migrations(conn: sqlite3.Connection) -> List[int]:
+    """执行所有未执行的迁移，返回本次执行的版本号列表。"""
+    version = current_version(conn)
+    conn.commit()
+    applied = []
+    for number, name, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"Applying migration {number:03d}: {name}...")
+        migrate(conn)
+        conn.execute(
+            "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+            (number, name, _utc_now())
+        )
+        conn.commit()
+        applied.append(number)
+    return applied
+
+
+# --- 回填 ---
+
+# 在 SQL 中把 'January 5, 2024' 转为 '2024-01-05'，与 utils.ingest.normalize_date_iso 的结果一致；
+# 不符合该格式的行（如 'No date found'）保持 NULL
+_MONTH_NAMES = ("January", "February", "March", "April", "May", "June", "July",
+                "August", "September", "October", "November", "December")
+_MONTH_CASE = "CASE substr(date, 1, instr(date, ' ') - 1) " + " ".join(
+    f"WHEN '{name}' THEN '{i:02d}'" for i, name in enumerate(_MONTH_NAMES, start=1)
+) + " END"
+_DAY_EXPR = "CAST(substr(date, instr(date, ' ') + 1, instr(date, ',') - instr(date, ' ') - 1) AS INTEGER)"
+_DATE_ISO_EXPR = f"substr(date, -4) || '-' || {_MONTH_CASE} || '-' || printf('%02d', {_DAY_EXPR})"
+
+_DATE_ISO_BACKFILL_SQL = f"""
+    UPDATE journals SET date_iso = {_DATE_ISO_EXPR}
+    WHERE id > ? AND id <= ? AND date_iso IS NULL
+      AND date GLOB '[A-Z]*[a-z] [0-9]*, [0-9][0-9][0-9][0-9]'
+      AND {_MONTH_CASE} IS NOT NULL
+      AND {_DAY_EXPR} BETWEEN 1 AND 31
+"""
+
+
+def _backfill_date_iso(conn: sqlite3.Connection, start_id: int, end_id: int) -> int:
+    return conn.execute(_DATE_ISO_BACKFILL_SQL, (start_id, end_id)).rowcount
+
+
+# (名称, 分块函数) —— 分块函数处理 (start_id, end_id] 区间，返回更新的行数
+BACKFILLS: List[Tuple[str, Callable[[sqlite3.Connection, int, int], int]]] = [
+    ("journals.date_iso", _backfill_date_iso),
+]
+
+
+class BackfillRunner:
+    """
+    在后台线程中按 id 区间分块执行 BACKFILLS。
+    每块通过 db.write() 单独提交，块与块之间让出写锁，服务器可以照常处理请求和爬取入库。
+    进度游标另用 db.write(bump=False) 提交: 没有更新任何行的块不会让查询缓存失效；
+    两次提交之间中断时只会把这一块重做一遍（回填是幂等的）。
+    """
+
+    def __init__(self, db, chunk_size: int = 5000, pause_seconds: float = 0.05):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.progress: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "cursor": 0, "max_id": 0, "updated": 0, "percent": 0.0}
+            for name, _ in BACKFILLS
+        }
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self.run, name="backfill", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def run(self) -> None:
+        for name, step in BACKFILLS:
+            progress = self.progress[name]
+            try:
+                self._run_one(name, step, progress)
+            except Exception as e:
+                progress["status"] = "failed"
+                progress["error"] = str(e)
+                print(f"Backfill {name} failed: {e}")
+
+    def _run_one(self, name: str, step, progress: Dict[str, Any]) -> None:
+        with self.db.read() as conn:
+            row = conn.execute("SELECT last_id FROM backfill_state WHERE name = ?", (name,)).fetchone()
+            cursor = row[0] if row else 0
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM journals").fetchone()[0]
+
+        progress.update(status="running", cursor=cursor, max_id=max_id)
+        start_cursor = cursor
+        if cursor < max_id:
+            print(f"Backfill {name}: processing ids {cursor + 1}..{max_id} in the background")
+        while cursor < max_id:
+            end_id = min(cursor + self.chunk_size, max_id)
+            with self.db.write() as conn:
+                progress["updated"] += step(conn, cursor, end_id)
+            with self.db.write(bump=False) as conn:
+                conn.execute(
+                    "INSERT INTO backfill_state (name, last_id, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at",
+                    (name, end_id, _utc_now())
+                )
+            cursor = end_id
+            progress["cursor"] = cursor
+            progress["percent"] = round((cursor - start_cursor) / (max_id - start_cursor) * 100, 1)
+            time.sleep(self.pause_seconds)
+        progress["status"] = "completed"
+        progress["percent"] = 100.0
+        if max_id > start_cursor:
+            print(f"Backfill {name} complete: {progress['updated']} rows updated.")
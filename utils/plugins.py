@@ -0,0 +1,130 @@
+"""
+爬虫/解析器插件注册表: 按 JOURNAL_CONFIGS 中的 crawler_class / parser_module 在第一次使用时导入，并按期刊缓存实例。
+
+Playwright、requests、bs4 等重依赖只在爬虫/解析器模块里导入，Web 界面启动和只做搜索的部署不会加载它们。
+
+解析规则（crawler_class 与 parser_module 相同）:
+    "package.module:ClassName"   直接指定模块和类
+    已安装包的入口点             crawler_class 对应 journal_scout.crawlers 组、parser_module（及 detail_parser_module）
+                                 对应 journal_scout.parsers 组中同名的入口点（第三方包可以这样注册新的出版社）
+    内置名称                     crawler_class 为 BUILTIN_CRAWLERS 中的类名；parser_module 为模块路径，
+                                 类名取配置中的 parser_class，没有时取模块中定义的唯一 BaseJournalParser 子类
+"""
+import importlib
+import inspect
+import threading
+from importlib.metadata import entry_points
+from typing import Any, Dict, Optional, Tuple, Type
+
+CRAWLER_ENTRY_POINT_GROUP = "journal_scout.crawlers"
+PARSER_ENTRY_POINT_GROUP = "journal_scout.parsers"
+
+BUILTIN_CRAWLERS = {
+    "AcsJournalCrawler": "crawlers.acs_crawler:AcsJournalCrawler",
+}
+
+
+class PluginError(LookupError):
+    """期刊配置中的爬虫或解析器无法解析。"""
+
+
+def _load_target(target: str) -> Any:
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    try:
+        return getattr(module, attr)
+    except AttributeError:
+        raise PluginError(f"{module_name} has no attribute {attr!r}") from None
+
+
+def _entry_point(group: str, name: str) -> Optional[Any]:
+    for ep in entry_points(group=group):
+        if ep.name == name:
+            return ep
+    return None
+
+
+def resolve_crawler_class(config: Dict[str, Any]) -> Type:
+    name = config.get("crawler_class")
+    if not name:
+        raise PluginError(f"journal {config.get('journal_code')!r} has no crawler_class")
+    if ":" in name:
+        return _load_target(name)
+    ep = _entry_point(CRAWLER_ENTRY_POINT_GROUP, name)
+    if ep is not None:
+        return ep.load()
+    if name in BUILTIN_CRAWLERS:
+        return _load_target(BUILTIN_CRAWLERS[name])
+    raise PluginError(f"unknown crawler_class {name!r}: not module:Class, an installed "
+                      f"{CRAWLER_ENTRY_POINT_GROUP} entry point or a built-in crawler")
+
+
+def resolve_parser_class(config: Dict[str, Any], module_key: str = "parser_module", class_key: str = "parser_class") -> Type:
+    from parsers.base_parser import BaseJournalParser
+
+    name = config.get(module_key)
+    if not name:
+        raise PluginError(f"journal {config.get('journal_code')!r} has no {module_key}")
+    if ":" in name:
+        return _load_target(name)
+    ep = _entry_point(PARSER_ENTRY_POINT_GROUP, name)
+    if ep is not None:
+        return ep.load()
+    try:
+        module = importlib.import_module(name)
+    except ModuleNotFoundError as e:
+        if e.name != name:  # 模块存在，但它依赖的包没有安装
+            raise
+        raise PluginError(f"unknown {module_key} {name!r}: not an importable module or an installed "
+                          f"{PARSER_ENTRY_POINT_GROUP} entry point") from None
+    if config.get(class_key):
+        return _load_target(f"{name}:{config[class_key]}")
+    candidates = [
+        obj for obj in vars(module).values()
+        if inspect.isclass(obj) and issubclass(obj, BaseJournalParser) and obj is not BaseJournalParser
+        and obj.__module__ == module.__name__
+    ]
+    if len(candidates) != 1:
+        raise PluginError(f"{name} defines {len(candidates)} parser classes; set {class_key} in the journal config")
+    return candidates[0]
+
+
+class PluginRegistry:
+    """按期刊缓存爬虫和解析器实例；实例只在第一次 crawler()/parser() 时创建。"""
+
+    def __init__(self, configs: Dict[str, Dict[str, Any]]):
+        self.configs = configs
+        self._instances: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, journal_code: str, resolve) -> Any:
+        key = (kind, journal_code)
+        instance = self._instances.get(key)
+        if instance is None:
+            config = self.configs.get(journal_code)
+            if config is None:
+                raise PluginError(f"unknown journal code: {journal_code}")
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    instance = self._instances[key] = resolve(config)(config)
+        return instance
+
+    def crawler(self, journal_code: str):
+        return self._get("crawler", journal_code, resolve_crawler_class)
+
+    def parser(self, journal_code: str):
+        return self._get("parser", journal_code, resolve_parser_class)
+
+    def detail_parser(self, journal_code: str):
+        """文章详情页解析器（配置中的 detail_parser_module / detail_parser_class），用于补全抓取。"""
+        return self._get("detail_parser", journal_code,
+                         lambda config: resolve_parser_class(config, "detail_parser_module", "detail_parser_class"))
+
+    def loaded(self) -> Dict[str, Dict[str, str]]:
+        """已创建的实例: {期刊: {"crawler": 类名, "parser": 类名}}。"""
+        result: Dict[str, Dict[str, str]] = {}
+        for (kind, journal_code), instance in list(self._instances.items()):
+            cls = type(instance)
+            result.setdefault(journal_code, {})[kind] = f"{cls.__module__}:{cls.__qualname__}"
+        return result
@@ -0,0 +1,208 @@
+"""
+定时轮询当前期和 ASAP 目录页，只在文章列表变化时解析入库。
+
+- 每个期刊轮询 poll_paths 中的目录页（默认为 toc_path_template），状态保存在 poll_state 表，重启后沿用。
+- 指纹: 页面中所有 /doi/ 链接的 DOI 去重排序后的 SHA-1，只用正则扫描 HTML，不构建 DOM；
+  与上次相同时跳过解析和入库（仍需抓取页面，但省掉解析、事务、搜索匹配和索引更新）。
+- 自适应间隔: 发现变化时间隔减半，没有变化时乘以 1.5，限制在 [min_interval, max_interval] 内，
+  再加 ±10% 抖动避免所有页面同时到期。出版频繁的期刊很快收敛到较短的间隔，长期不更新的页面逐渐少抓。
+  抓取失败时保持原间隔。
+"""
+import hashlib
+import random
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils import metrics
+
+# /doi/10.xxxx/...、/doi/abs/10.xxxx/... 等链接中的 DOI
+_DOI_LINK_RE = re.compile(r"""/doi/(?:(?:abs|full|pdf|epdf|suppl)/)?(10\.\d{4,9}/[^"'?#\s<>]+)""", re.IGNORECASE)
+
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _format_time(moment: datetime) -> str:
+    return moment.strftime(_TIME_FORMAT)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def article_fingerprint(html: str) -> Tuple[str, int]:
+    """目录页中文章列表的指纹和文章数（按 DOI 计）。"""
+    dois = sorted({doi.lower() for doi in _DOI_LINK_RE.findall(html)})
+    return hashlib.sha1("\n".join(dois).encode("utf-8")).hexdigest(), len(dois)
+
+
+def poll_urls(config: Dict[str, Any]) -> List[str]:
+    """期刊需要轮询的目录页 URL。"""
+    paths = config.get("poll_paths") or [config["toc_path_template"]]
+    return [config["base_url"] + path.format(journal_code=config["journal_code"]) for path in paths]
+
+
+def next_interval(current: float, changed: bool, min_interval: float, max_interval: float) -> float:
+    interval = current * 0.5 if changed else current * 1.5
+    return min(max(interval, min_interval), max_interval)
+
+
+class PollScheduler:
+    """
+    后台轮询线程。fetch(journal_code, url) 返回页面 HTML（失败时抛出异常），
+    ingest(journal_code, html) 解析并入库，返回 store_articles 的计数。
+    """
+
+    def __init__(
+        self,
+        db,
+        configs: Dict[str, Dict[str, Any]],
+        fetch: Callable[[str, str], str],
+        ingest: Callable[[str, str], Dict[str, Any]],
+        initial_interval: float = 3600,
+        min_interval: float = 900,
+        max_interval: float = 86400,
+    ):
+        self.db = db
+        self.configs = configs
+        self.fetch = fetch
+        self.ingest = ingest
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def urls(self) -> Dict[str, str]:
+        """{url: journal_code}，只包含当前配置中的期刊。"""
+        return {url: code for code, config in self.configs.items() for url in poll_urls(config)}
+
+    def sync(self) -> None:
+        """为新配置的目录页登记轮询状态，立即到期。"""
+        now = _format_time(_utc_now())
+        # poll_state 是内部状态，写入不使查询缓存失效（文章由 ingest 单独写入）
+        with self.db.write(bump=False) as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO poll_state (url, journal_code, interval_seconds, next_check) VALUES (?, ?, ?, ?)",
+                [(url, code, self.initial_interval, now) for url, code in self.urls().items()]
+            )
+
+    def start(self) -> threading.Thread:
+        self.sync()
+        self._thread = threading.Thread(target=self.run, name="poll-scheduler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Poll scheduler error: {e}")
+            self._wake.wait(self._seconds_until_next_due())
+            self._wake.clear()
+
+    def _seconds_until_next_due(self) -> float:
+        urls = list(self.urls())
+        if not urls:
+            return 60.0
+        with self.db.read() as conn:
+            row = conn.execute(
+                f"SELECT MIN(next_check) FROM poll_state WHERE url IN ({','.join('?' * len(urls))})", urls
+            ).fetchone()
+        if not row or not row[0]:
+            return 60.0
+        due = datetime.strptime(row[0], _TIME_FORMAT).replace(tzinfo=timezone.utc)
+        # 最多睡一分钟，配置或状态被外部修改后也能及时发现
+        return min(max((due - _utc_now()).total_seconds(), 1.0), 60.0)
+
+    def trigger(self, journal_code: Optional[str] = None) -> int:
+        """让某个期刊（默认全部）的目录页立即到期，返回涉及的页面数。"""
+        self.sync()
+        now = _format_time(_utc_now())
+        with self.db.write(bump=False) as conn:
+            if journal_code:
+                count = conn.execute("UPDATE poll_state SET next_check = ? WHERE journal_code = ?",
+                                     (now, journal_code)).rowcount
+            else:
+                count = conn.execute("UPDATE poll_state SET next_check = ?", (now,)).rowcount
+        self._wake.set()
+        return count
+
+    def run_due(self) -> List[Dict[str, Any]]:
+        """检查所有已到期的目录页，返回每页的结果。同一时间只有一个调用在执行。"""
+        with self._run_lock:
+            urls = self.urls()
+            now = _format_time(_utc_now())
+            with self.db.read() as conn:
+                due = [
+                    (url, fingerprint, interval) for url, fingerprint, interval in conn.execute(
+                        "SELECT url, fingerprint, interval_seconds FROM poll_state WHERE next_check <= ? "
+                        "ORDER BY next_check", (now,)
+                    ).fetchall() if url in urls
+                ]
+            results = []
+            for url, fingerprint, interval in due:
+                if self._stop.is_set():
+                    break
+                results.append(self.check(urls[url], url, fingerprint, interval))
+            return results
+
+    def check(self, journal_code: str, url: str, previous: Optional[str], interval: float) -> Dict[str, Any]:
+        """抓取一个目录页，指纹变化（或第一次检查）时解析入库，并安排下一次检查。"""
+        result: Dict[str, Any] = {"journal_code": journal_code, "url": url, "changed": False, "error": None}
+        fingerprint = previous
+        article_count = None
+        try:
+            html = self.fetch(journal_code, url)
+            current, article_count = article_fingerprint(html)
+            if current != previous:
+                counts = self.ingest(journal_code, html)
+                # 入库成功后才记下新指纹，失败时下次仍会重新解析
+                fingerprint = current
+                result.update(changed=True, inserted=counts["inserted"], updated=counts["updated"],
+                              unchanged=counts["unchanged"])
+                interval = next_interval(interval, True, self.min_interval, self.max_interval)
+            else:
+                interval = next_interval(interval, False, self.min_interval, self.max_interval)
+            metrics.POLL_CHECKS.inc(journal=journal_code, result="changed" if result["changed"] else "unchanged")
+        except Exception as e:
+            result["error"] = str(e)
+            metrics.POLL_CHECKS.inc(journal=journal_code, result="error")
+
+        now = _utc_now()
+        next_check = now + timedelta(seconds=interval * random.uniform(0.9, 1.1))
+        with self.db.write(bump=False) as conn:
+            conn.execute("""
+                UPDATE poll_state SET
+                    fingerprint = ?, article_count = COALESCE(?, article_count), interval_seconds = ?,
+                    next_check = ?, last_checked = ?, checks = checks + 1, last_error = ?,
+                    last_changed = CASE WHEN ? THEN ? ELSE last_changed END,
+                    changes = changes + ?
+                WHERE url = ?
+            """, (fingerprint, article_count, interval, _format_time(next_check), _format_time(now),
+                  result["error"], result["changed"], _format_time(now), int(result["changed"]), url))
+        result["next_check"] = _format_time(next_check)
+        return result
+
+    def status(self) -> List[Dict[str, Any]]:
+        urls = self.urls()
+        with self.db.read() as conn:
+            cursor = conn.execute(
+                "SELECT url, journal_code, article_count, interval_seconds, next_check, last_checked, last_changed, "
+                "checks, changes, last_error FROM poll_state ORDER BY journal_code, url"
+            )
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [row for row in rows if row["url"] in urls]
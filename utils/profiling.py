@@ -0,0 +1,234 @@
+"""
+按需开启的性能剖析。
+
+- 请求: 带 X-Profile: 1 请求头或 ?profile=1 查询参数时，用 cProfile 包住这次请求，
+  结果保存为 <id>.prof（可用 pstats / snakeviz 打开），响应头 X-Profile-Id 返回 id。
+- 批量任务: /batch_crawl 请求体中 "profile": "cprofile" 或 "sample"，任务进度的 profile_id 字段给出 id（任务结束后可读取）。批量任务大部分时间在等浏览器，
+  sample 模式用后台线程每隔 interval 秒采样一次任务线程的调用栈（墙钟时间，开销与任务长短无关），
+  保存为 <id>.folded（折叠栈格式，可直接交给 flamegraph.pl / speedscope）。
+- GET /profiles 列出已保存的剖析，GET /profiles/<id> 返回最热的函数。
+
+不开启时每个请求只多一次请求头/参数检查。每个剖析只作用于所在线程，请求之间、请求与批量任务之间互不阻塞；
+Python 3.12 起 cProfile 全进程同时只能有一个，此时要求剖析的请求返回 409，批量任务改用采样。
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, g, jsonify, request
+
+_ID_RE = re.compile(r"^[0-9a-z-]+$")
+
+
+def new_profile_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+
+def _start_cprofile() -> Optional[cProfile.Profile]:
+    """在当前线程开启 cProfile；已有其他 cProfile 在运行而无法开启时（Python 3.12+）返回 None。"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+class SamplingProfiler:
+    """在后台线程中周期性采样目标线程的调用栈，统计每条栈出现的次数。"""
+
+    def __init__(self, thread_id: int, interval: float = 0.01):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    def __init__(self, profile_dir: str, max_files: int = 50, sample_interval: float = 0.01):
+        self.profile_dir = Path(profile_dir)
+        self.max_files = max_files
+        self.sample_interval = sample_interval
+
+    # --- 请求 ---
+
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    @staticmethod
+    def requested() -> bool:
+        return request.headers.get("X-Profile") in ("1", "true") or request.args.get("profile") in ("1", "true")
+
+    def _before_request(self):
+        if not self.requested():
+            return None
+        profiler = _start_cprofile()
+        if profiler is None:
+            return jsonify({"status": "error", "message": "another profile is running; retry without profiling or later"}), 409
+        g.profiler = profiler
+        g.profile_started = time.perf_counter()
+        return None
+
+    def _after_request(self, response):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            profile_id = new_profile_id()
+            self._save_cprofile(profile_id, profiler, "request", f"{request.method} {request.full_path}",
+                                time.perf_counter() - g.pop("profile_started"))
+            response.headers["X-Profile-Id"] = profile_id
+        return response
+
+    def _teardown_request(self, exc) -> None:
+        # 视图抛出异常时 after_request 不会执行，这里保证剖析器被关闭
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+
+    # --- 批量任务等后台代码 ---
+
+    def run(self, mode: Optional[str], label: str, func, *args, profile_id: Optional[str] = None, **kwargs) -> Optional[str]:
+        """
+        以 mode（None / 'cprofile' / 'sample'）剖析 func(*args, **kwargs)，返回保存的剖析 id（可预先用
+        new_profile_id() 生成并传入）；mode 为空时直接执行，返回 None。无法开启 cProfile 时（见模块说明）改用采样。
+        """
+        if not mode:
+            func(*args, **kwargs)
+            return None
+        profile_id = profile_id or new_profile_id()
+        start = time.perf_counter()
+        profiler = _start_cprofile() if mode == "cprofile" else None
+        if profiler is not None:
+            try:
+                func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                self._save_cprofile(profile_id, profiler, "cprofile", label, time.perf_counter() - start)
+            return profile_id
+        sampler = SamplingProfiler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        try:
+            func(*args, **kwargs)
+        finally:
+            sampler.stop()
+            self._save(profile_id, ".folded", sampler.folded(), "sample", label, time.perf_counter() - start,
+                       samples=sampler.samples)
+        return profile_id
+
+    # --- 保存与读取 ---
+
+    def _save_cprofile(self, profile_id: str, profiler: cProfile.Profile, kind: str, label: str, seconds: float) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(self.profile_dir / f"{profile_id}.prof"))
+        self._write_meta(profile_id, ".prof", kind, label, seconds)
+
+    def _save(self, profile_id: str, suffix: str, content: str, kind: str, label: str, seconds: float, **extra: Any) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        (self.profile_dir / f"{profile_id}{suffix}").write_text(content, encoding="utf-8")
+        self._write_meta(profile_id, suffix, kind, label, seconds, **extra)
+
+    def _write_meta(self, profile_id: str, suffix: str, kind: str, label: str, seconds: float, **extra: Any) -> None:
+        meta = {"id": profile_id, "file": f"{profile_id}{suffix}", "kind": kind, "label": label,
+                "seconds": round(seconds, 4), "created": time.time(), **extra}
+        (self.profile_dir / f"{profile_id}.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        self._prune()
+
+    def _prune(self) -> None:
+        metas = sorted(self.profile_dir.glob("*.json"), key=os.path.getmtime)
+        for meta_path in metas[:-self.max_files] if self.max_files else []:
+            data_file = json.loads(meta_path.read_text(encoding="utf-8")).get("file")
+            if data_file:
+                (self.profile_dir / data_file).unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        if not self.profile_dir.exists():
+            return []
+        metas = [json.loads(p.read_text(encoding="utf-8")) for p in self.profile_dir.glob("*.json")]
+        return sorted(metas, key=lambda m: m["created"], reverse=True)
+
+    def load_meta(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not _ID_RE.match(profile_id):
+            return None
+        meta_path = self.profile_dir / f"{profile_id}.json"
+        if not meta_path.exists():
+            return None
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+
+    def top_functions(self, profile_id: str, limit: int = 25, sort: str = "cumulative") -> Optional[Dict[str, Any]]:
+        """
+        最热的函数。cProfile: 按 cumulative 或 tottime 排序的调用次数和耗时；
+        采样: 按 inclusive（出现在栈中）或 self（位于栈顶）的样本数排序。
+        """
+        meta = self.load_meta(profile_id)
+        if meta is None:
+            return None
+        path = self.profile_dir / meta["file"]
+        if meta["file"].endswith(".prof"):
+            stats = pstats.Stats(str(path)).stats
+            sort = "tottime" if sort == "tottime" else "cumulative"
+            key = 3 if sort == "cumulative" else 2
+            rows = sorted(stats.items(), key=lambda item: item[1][key], reverse=True)[:limit]
+            functions = [
+                {"function": f"{func} ({Path(filename).name}:{line})", "ncalls": nc,
+                 "tottime": round(tt, 6), "cumtime": round(ct, 6)}
+                for (filename, line, func), (cc, nc, tt, ct, _) in rows
+            ]
+        else:
+            inclusive: Counter = Counter()
+            self_samples: Counter = Counter()
+            for line in path.read_text(encoding="utf-8").splitlines():
+                stack, _, count = line.rpartition(" ")
+                frames = stack.split(";")
+                self_samples[frames[-1]] += int(count)
+                for frame in set(frames):
+                    inclusive[frame] += int(count)
+            sort = "self" if sort == "self" else "inclusive"
+            ranking = self_samples if sort == "self" else inclusive
+            total = meta.get("samples") or 1
+            functions = [
+                {"function": frame, "inclusive": inclusive[frame], "self": self_samples[frame],
+                 "inclusive_pct": round(inclusive[frame] * 100 / total, 1)}
+                for frame, _ in ranking.most_common(limit)
+            ]
+        return {**meta, "sort": sort, "functions": functions}
+
+    def path_for(self, profile_id: str) -> Optional[Path]:
+        meta = self.load_meta(profile_id)
+        return self.profile_dir / meta["file"] if meta else None
@@ -0,0 +1,138 @@
+"""
+批量爬取任务的进度状态与事件推送。
+
+爬取线程通过 update() / increment() / add_error() 修改状态，每次真正有字段变化时版本号加一并唤醒等待者；
+/batch_progress 的 SSE 连接阻塞在条件变量上，只在有变化时醒来，发送自上次版本以来变化的字段
+（同一版本区间的增量只序列化一次，多个查看者共享），空闲时只发注释行保活。
+错误只保留最近 error_history 条（环形缓冲），另外按类型累计总数。
+"""
+import json
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+TERMINAL_STATUSES = ("completed", "stopped", "failed")
+
+
+class BatchTask:
+    def __init__(self, error_history: int = 50, **fields: Any):
+        self._cond = threading.Condition()
+        self._version = 0
+        self._fields: Dict[str, Any] = {}
+        self._field_versions: Dict[str, int] = {}
+        self._errors: deque = deque(maxlen=error_history)
+        self._error_totals: Counter = Counter()
+        self._error_count = 0
+        self._errors_version = 0
+        self._delta_cache: Tuple[Optional[Tuple[int, int]], str] = (None, "")
+        self.update(**fields)
+
+    # --- 写入（爬取线程） ---
+
+    def update(self, **fields: Any) -> None:
+        with self._cond:
+            changed = False
+            for key, value in fields.items():
+                if key in self._fields and self._fields[key] == value:
+                    continue
+                if not changed:
+                    self._version += 1
+                    changed = True
+                self._fields[key] = value
+                self._field_versions[key] = self._version
+            if changed:
+                self._cond.notify_all()
+
+    def increment(self, **deltas: int) -> None:
+        with self._cond:
+            self.update(**{key: self._fields.get(key, 0) + delta for key, delta in deltas.items() if delta})
+
+    def add_error(self, url: str, error: str, error_type: str = "error") -> None:
+        with self._cond:
+            self._version += 1
+            self._error_count += 1
+            self._error_totals[error_type] += 1
+            self._errors.append({
+                "seq": self._error_count, "version": self._version,
+                "url": url, "error": error, "type": error_type, "time": time.time(),
+            })
+            self._errors_version = self._version
+            self._cond.notify_all()
+
+    # --- 读取 ---
+
+    def __getitem__(self, key: str) -> Any:
+        with self._cond:
+            return self._fields[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._cond:
+            return self._fields.get(key, default)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def finished(self) -> bool:
+        return self.get("status") in TERMINAL_STATUSES
+
+    def _error_summary(self) -> Dict[str, Any]:
+        return {"error_count": self._error_count, "error_totals": dict(self._error_totals)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            state = dict(self._fields)
+            state.update(self._error_summary())
+            state["errors"] = [{k: v for k, v in e.items() if k != "version"} for e in self._errors]
+            state["version"] = self._version
+            return state
+
+    def changes_since(self, version: int) -> Dict[str, Any]:
+        """version 之后变化的字段；新错误放在 errors_new 中（只包含仍在环形缓冲里的）。"""
+        with self._cond:
+            delta = {key: self._fields[key] for key, v in self._field_versions.items() if v > version}
+            if self._errors_version > version:
+                delta.update(self._error_summary())
+                delta["errors_new"] = [
+                    {k: v for k, v in e.items() if k != "version"} for e in self._errors if e["version"] > version
+                ]
+            delta["version"] = self._version
+            return delta
+
+    def wait_for_change(self, version: int, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._version > version, timeout)
+
+    def _delta_payload(self, version: int) -> Tuple[int, str]:
+        with self._cond:
+            key = (version, self._version)
+            if self._delta_cache[0] != key:
+                self._delta_cache = (key, json.dumps(self.changes_since(version), ensure_ascii=False))
+            return self._version, self._delta_cache[1]
+
+    # --- SSE ---
+
+    def stream(self, last_event_id: Optional[str] = None, keepalive_seconds: float = 15) -> Iterator[str]:
+        """
+        生成 SSE 文本: 先发一次完整快照（event: snapshot），之后只发增量（event: delta），
+        任务结束后发完最后的增量即关闭。客户端断线重连时带上 Last-Event-ID，从该版本继续发增量。
+        """
+        try:
+            version = int(last_event_id) if last_event_id else None
+        except ValueError:
+            version = None
+        if version is None or version > self._version:
+            snapshot = self.snapshot()
+            version = snapshot["version"]
+            yield f"event: snapshot\nid: {version}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+
+        while True:
+            if self._version > version:
+                version, payload = self._delta_payload(version)
+                yield f"event: delta\nid: {version}\ndata: {payload}\n\n"
+            if self.finished and self._version == version:
+                return
+            if not self.wait_for_change(version, keepalive_seconds):
+                yield ": keepalive\n\n"
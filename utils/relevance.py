@@ -0,0 +1,475 @@
+"""
+标题 + 摘要的 BM25 相关度索引（需要 numpy，完全离线）。
+
+索引按"基础段 + 增量段"组织:
+- 基础段: 以 CSC 形式（每个词一段连续的倒排）保存为 .npy 文件，启动时用 mmap 打开，不必读入内存。
+      doc_ids.npy   int64    文档位置 -> journals.id
+      doc_len.npy   float32  文档长度（加权后的词数）
+      indptr.npy    int64    词 t 的倒排位于 [indptr[t], indptr[t+1])
+      post_doc.npy  int32    倒排中的文档位置
+      post_tf.npy   float32  词频（标题中的词按 TITLE_WEIGHT 加权）
+      vocab.json / meta.json
+- 增量段: 新入库或被更新的文章先进入内存中的增量段，旧位置记为删除；增量段超过 delta_limit 篇时
+  与基础段合并后重新写盘（写到临时目录再整体替换）。
+- 同步: meta.json 记录已索引的最大 id 和 row_version 水位（迁移 014）。数据变化后（包括其他进程的提交，
+  以及启动时载入的旧索引之后发生的修改）refresh() 在一个读事务里取 id 更大的新行和 row_version 更大的
+  原地更新行；库中行数与索引中的存活文档数加新行数不一致说明有行被删除，全量重建。
+- 重建和合并在后台线程中进行（同一时刻只有一个），构建期间查询继续使用当前的段，完成后一次性替换；
+  构建期间的新行和更新先照常进入增量段，合并完成后重放到新的段上，重建完成后由下一次 refresh() 补上。
+
+用法:
+    python -m utils.relevance build     # 从 journals 表全量重建索引
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.compression import decode_abstract
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅相关度排序需要
+    np = None
+
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2.0
+INDEX_VERSION = 2
+# 与 AcsJournalParser 的占位符保持一致，不参与索引
+PLACEHOLDER_ABSTRACT = "No abstract found"
+
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can for from has have in into is it its not of on or our that the their
+these this to via was we were which with within without using use used based than both also between
+""".split())
+
+_ARRAY_FILES = ("doc_ids", "doc_len", "indptr", "post_doc", "post_tf")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def document_terms(title: Optional[str], abstract: Optional[str]) -> Counter:
+    """文档的加权词频：标题词计 TITLE_WEIGHT，摘要词计 1。"""
+    terms: Counter = Counter()
+    for token in tokenize(title):
+        terms[token] += TITLE_WEIGHT
+    abstract = decode_abstract(abstract)
+    if abstract and abstract != PLACEHOLDER_ABSTRACT:
+        for token in tokenize(abstract):
+            terms[token] += 1.0
+    return terms
+
+
+class BM25Index:
+    def __init__(self, db, index_dir: str, delta_limit: int = 5000, load: bool = True):
+        if np is None:
+            raise RuntimeError("numpy is required for relevance ranking. Install it with: pip install numpy")
+        self.db = db
+        self.index_dir = Path(index_dir)
+        self.delta_limit = delta_limit
+        self._lock = threading.RLock()
+        # 串行化重建和合并（构建时不持有 _lock）
+        self._build_lock = threading.Lock()
+        self._maintenance: Optional[threading.Thread] = None
+        self._generation: Optional[int] = None
+        if load:
+            self._load_or_build()
+
+    # --- 基础段 ---
+
+    def _load_or_build(self) -> None:
+        meta_file = self.index_dir / "meta.json"
+        if meta_file.exists():
+            try:
+                self._load()
+                return
+            except (OSError, ValueError, KeyError) as e:
+                print(f"BM25 index at {self.index_dir} is unreadable ({e}); rebuilding.")
+        self.rebuild()
+
+    def _load(self) -> None:
+        meta = json.loads((self.index_dir / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported index version {meta.get('version')}")
+        arrays = {name: np.load(self.index_dir / f"{name}.npy", mmap_mode="r") for name in _ARRAY_FILES}
+        vocab = json.loads((self.index_dir / "vocab.json").read_text(encoding="utf-8"))
+        self._set_base(arrays, vocab, meta["max_id"], meta["max_version"])
+
+    def _set_base(self, arrays: Dict[str, Any], vocab: Dict[str, int], max_id: int, max_version: int) -> None:
+        self.base = arrays
+        self.vocab = vocab
+        self.max_id = max_id
+        self.max_version = max_version
+        self.base_dead = np.zeros(len(arrays["doc_ids"]), dtype=bool)
+        self.base_order = np.argsort(arrays["doc_ids"], kind="stable")
+        self.base_df = np.diff(arrays["indptr"]).astype(np.float64)
+        self.base_total_len = float(np.asarray(arrays["doc_len"], dtype=np.float64).sum())
+        self._reset_delta()
+
+    def _reset_delta(self) -> None:
+        self.delta_ids: List[int] = []
+        self.delta_len: List[float] = []
+        self.delta_postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.delta_pos_by_id: Dict[int, int] = {}
+        self.delta_dead: set = set()
+
+    def _write_base(self, arrays: Dict[str, Any], vocab: Dict[str, int], max_id: int, max_version: int) -> None:
+        """写入临时目录后整体替换，已 mmap 的旧文件在替换后仍然有效。"""
+        tmp_dir = self.index_dir.with_name(self.index_dir.name + ".tmp")
+        old_dir = self.index_dir.with_name(self.index_dir.name + ".old")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        for name in _ARRAY_FILES:
+            np.save(tmp_dir / f"{name}.npy", arrays[name])
+        (tmp_dir / "vocab.json").write_text(json.dumps(vocab, ensure_ascii=False), encoding="utf-8")
+        meta = {"version": INDEX_VERSION, "n_docs": int(len(arrays["doc_ids"])), "max_id": max_id,
+                "max_version": max_version, "k1": K1, "b": B}
+        (tmp_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if self.index_dir.exists():
+            os.replace(self.index_dir, old_dir)
+        os.replace(tmp_dir, self.index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @staticmethod
+    def _assemble(doc_ids: "np.ndarray", doc_len: "np.ndarray", term_idx: "np.ndarray",
+                  post_doc: "np.ndarray", post_tf: "np.ndarray", n_terms: int) -> Dict[str, Any]:
+        """把 (词, 文档, 词频) 三元组按词排序，生成 CSC 形式的数组。"""
+        order = np.argsort(term_idx, kind="stable")
+        counts = np.bincount(term_idx, minlength=n_terms) if len(term_idx) else np.zeros(n_terms, dtype=np.int64)
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return {
+            "doc_ids": doc_ids.astype(np.int64),
+            "doc_len": doc_len.astype(np.float32),
+            "indptr": indptr,
+            "post_doc": post_doc[order].astype(np.int32),
+            "post_tf": post_tf[order].astype(np.float32),
+        }
+
+    def _in_background(self, name: str, target) -> None:
+        """在后台线程中执行重建或合并；已有一个在进行时忽略。"""
+        with self._lock:
+            if self._maintenance is not None and self._maintenance.is_alive():
+                return
+
+            def run():
+                try:
+                    target()
+                except Exception as e:
+                    print(f"BM25 index {name} failed: {e}")
+
+            self._maintenance = threading.Thread(target=run, name=f"bm25-{name}", daemon=True)
+            self._maintenance.start()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """等待后台的重建或合并完成。"""
+        thread = self._maintenance
+        if thread is not None:
+            thread.join(timeout)
+
+    def rebuild(self) -> int:
+        """
+        从 journals 表全量重建并写盘，返回索引的文档数。构建期间不持有 _lock，查询继续使用旧的段。
+        调用方不能持有 db.read() 的连接。
+        """
+        with self._build_lock:
+            # 先取版本号: 重建期间的写入会让下一次 refresh() 再同步一次
+            generation = self.db.generation
+            vocab: Dict[str, int] = {}
+            doc_ids, doc_len = array("q"), array("f")
+            term_idx, post_doc, post_tf = array("i"), array("i"), array("f")
+            with self.db.read() as conn:
+                conn.execute("BEGIN")
+                max_version = conn.execute("SELECT COALESCE(MAX(row_version), 0) FROM journals").fetchone()[0]
+                for row_id, title, abstract in conn.execute("SELECT id, title, abstract FROM journals ORDER BY id"):
+                    pos = len(doc_ids)
+                    terms = document_terms(title, abstract)
+                    doc_ids.append(row_id)
+                    doc_len.append(sum(terms.values()))
+                    for term, tf in terms.items():
+                        term_idx.append(vocab.setdefault(term, len(vocab)))
+                        post_doc.append(pos)
+                        post_tf.append(tf)
+            max_id = doc_ids[-1] if doc_ids else 0
+            arrays = self._assemble(
+                np.frombuffer(doc_ids, dtype=np.int64), np.frombuffer(doc_len, dtype=np.float32),
+                np.frombuffer(term_idx, dtype=np.int32), np.frombuffer(post_doc, dtype=np.int32),
+                np.frombuffer(post_tf, dtype=np.float32), len(vocab),
+            )
+            self._write_base(arrays, vocab, max_id, max_version)
+            with self._lock:
+                self._load()
+                self._generation = generation
+            return len(doc_ids)
+
+    def compact(self) -> None:
+        """
+        把增量段合并进基础段并写盘，同时清理被删除的文档位置。构建期间不持有 _lock；
+        其间进入增量段的文档在替换后重放到新的段上。
+        """
+        with self._build_lock:
+            with self._lock:
+                base = self.base
+                base_dead = self.base_dead.copy()
+                vocab = dict(self.vocab)
+                delta_ids = list(self.delta_ids)
+                delta_len = list(self.delta_len)
+                delta_dead = set(self.delta_dead)
+                delta_postings = {term: list(postings) for term, postings in self.delta_postings.items()}
+                max_id = max(self.max_id, max(delta_ids, default=0))
+                max_version = self.max_version
+
+            n_base = len(base["doc_ids"])
+            alive = ~base_dead
+            new_pos = np.cumsum(alive) - 1
+
+            term_of_posting = np.repeat(np.arange(len(vocab), dtype=np.int32), np.diff(base["indptr"]))
+            keep = alive[np.asarray(base["post_doc"])]
+            term_idx = [term_of_posting[keep]]
+            post_doc = [new_pos[np.asarray(base["post_doc"])[keep]]]
+            post_tf = [np.asarray(base["post_tf"])[keep]]
+
+            delta_alive = [p for p in range(len(delta_ids)) if p not in delta_dead]
+            delta_new_pos = {p: int(alive.sum()) + i for i, p in enumerate(delta_alive)}
+            d_terms, d_docs, d_tfs = [], [], []
+            for term, postings in delta_postings.items():
+                t = vocab.setdefault(term, len(vocab))
+                for pos, tf in postings:
+                    if pos in delta_new_pos:
+                        d_terms.append(t)
+                        d_docs.append(delta_new_pos[pos])
+                        d_tfs.append(tf)
+            term_idx.append(np.asarray(d_terms, dtype=np.int32))
+            post_doc.append(np.asarray(d_docs, dtype=np.int64))
+            post_tf.append(np.asarray(d_tfs, dtype=np.float32))
+
+            doc_ids = np.concatenate([np.asarray(base["doc_ids"])[alive], np.asarray([delta_ids[p] for p in delta_alive], dtype=np.int64)])
+            doc_len = np.concatenate([np.asarray(base["doc_len"])[alive], np.asarray([delta_len[p] for p in delta_alive], dtype=np.float32)])
+            arrays = self._assemble(
+                doc_ids, doc_len, np.concatenate(term_idx), np.concatenate(post_doc), np.concatenate(post_tf), len(vocab)
+            )
+            self._write_base(arrays, vocab, max_id, max_version)
+
+            with self._lock:
+                # 合并期间 refresh() 加入增量段的文档（新行和更新，更新会顺带删除新段中的旧版本）
+                later = self._delta_documents_from(len(delta_ids))
+                current_version = self.max_version
+                self._load()
+                self.max_version = current_version
+                for row_id, length, terms in later:
+                    self._add_terms(row_id, length, terms)
+            print(f"BM25 index compacted: {n_base} base + {len(delta_ids)} delta -> {len(doc_ids)} docs")
+
+    def _delta_documents_from(self, start: int) -> List[Tuple[int, float, Dict[str, float]]]:
+        """增量段中位置 >= start 且未被删除的文档: [(id, 长度, {词: 词频})]，按加入顺序。"""
+        terms: Dict[int, Dict[str, float]] = {}
+        for term, postings in self.delta_postings.items():
+            # 倒排按位置递增追加，从尾部往前取
+            for pos, tf in reversed(postings):
+                if pos < start:
+                    break
+                terms.setdefault(pos, {})[term] = tf
+        return [(self.delta_ids[pos], self.delta_len[pos], terms.get(pos, {}))
+                for pos in range(start, len(self.delta_ids)) if pos not in self.delta_dead]
+
+    # --- 增量更新 ---
+
+    def _remove_id(self, row_id: int) -> None:
+        base_ids = self.base["doc_ids"]
+        idx = int(np.searchsorted(base_ids, row_id, sorter=self.base_order))
+        if idx < len(base_ids):
+            pos = int(self.base_order[idx])
+            if base_ids[pos] == row_id:
+                self.base_dead[pos] = True
+        old = self.delta_pos_by_id.pop(row_id, None)
+        if old is not None:
+            self.delta_dead.add(old)
+
+    def _add_document(self, row_id: int, title: Optional[str], abstract: Optional[str]) -> None:
+        terms = document_terms(title, abstract)
+        self._add_terms(row_id, sum(terms.values()), terms)
+
+    def _add_terms(self, row_id: int, length: float, terms: Dict[str, float]) -> None:
+        self._remove_id(row_id)
+        pos = len(self.delta_ids)
+        self.delta_ids.append(row_id)
+        self.delta_len.append(length)
+        self.delta_pos_by_id[row_id] = pos
+        for term, tf in terms.items():
+            self.delta_postings.setdefault(term, []).append((pos, tf))
+
+    def refresh(self) -> None:
+        generation = self.db.generation
+        with self._lock:
+            if generation == self._generation:
+                return
+            with self.db.read() as conn:
+                # 行数、新行和更新的行取自同一个快照
+                conn.execute("BEGIN")
+                total = conn.execute("SELECT COUNT(*) FROM journals").fetchone()[0]
+                max_version = conn.execute("SELECT COALESCE(MAX(row_version), 0) FROM journals").fetchone()[0]
+                max_known = max(self.max_id, max(self.delta_ids, default=0))
+                rows = conn.execute(
+                    "SELECT id, title, abstract FROM journals WHERE id > ? ORDER BY id", (max_known,)
+                ).fetchall()
+                deleted = total != self.alive_count() + len(rows)
+                if max_version > self.max_version:
+                    rows.extend(conn.execute(
+                        "SELECT id, title, abstract FROM journals WHERE row_version > ? AND id <= ?",
+                        (self.max_version, max_known)
+                    ).fetchall())
+            for row_id, title, abstract in rows:
+                self._add_document(row_id, title, abstract)
+            self.max_version = max_version
+            if deleted:
+                # 有行被删除（清库、其他进程删除）: 后台全量重建，完成前被删除的文章仍可能命中（取文章时会被跳过）；
+                # 不记下 generation，重建完成前每次 refresh() 都重新核对
+                self._in_background("rebuild", self.rebuild)
+                return
+            self._generation = generation
+            if len(self.delta_ids) > self.delta_limit:
+                self._in_background("compact", self.compact)
+
+    def alive_count(self) -> int:
+        return int((~self.base_dead).sum()) + len(self.delta_ids) - len(self.delta_dead)
+
+    # --- 查询 ---
+
+    def _score(self, query_terms: Dict[str, float]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """返回 (journals.id 数组, 分数数组)，只包含分数大于 0 的文档。"""
+        n_base = len(self.base["doc_ids"])
+        n_docs = n_base + len(self.delta_ids)
+        if not n_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        # 与 Lucene 相同，被替换掉的旧版本文档在合并前仍计入 N / df / avgdl，合并后分数才完全精确
+        avgdl = (self.base_total_len + sum(self.delta_len)) / n_docs or 1.0
+        doc_len = np.concatenate([np.asarray(self.base["doc_len"], dtype=np.float64), np.asarray(self.delta_len, dtype=np.float64)])
+        norm = K1 * (1 - B + B * doc_len / avgdl)
+        scores = np.zeros(n_docs, dtype=np.float64)
+
+        for term, weight in query_terms.items():
+            t = self.vocab.get(term)
+            base_docs = np.empty(0, dtype=np.int64)
+            base_tf = np.empty(0, dtype=np.float64)
+            if t is not None:
+                start, end = int(self.base["indptr"][t]), int(self.base["indptr"][t + 1])
+                base_docs = np.asarray(self.base["post_doc"][start:end], dtype=np.int64)
+                base_tf = np.asarray(self.base["post_tf"][start:end], dtype=np.float64)
+            delta = self.delta_postings.get(term, [])
+            delta_docs = np.asarray([n_base + p for p, _ in delta], dtype=np.int64)
+            delta_tf = np.asarray([tf for _, tf in delta], dtype=np.float64)
+            docs = np.concatenate([base_docs, delta_docs])
+            if not len(docs):
+                continue
+            tf = np.concatenate([base_tf, delta_tf])
+            df = len(docs)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            np.add.at(scores, docs, weight * idf * tf * (K1 + 1) / (tf + norm[docs]))
+
+        dead = np.concatenate([self.base_dead, np.zeros(len(self.delta_ids), dtype=bool)])
+        if self.delta_dead:
+            dead[[n_base + p for p in self.delta_dead]] = True
+        hit = np.flatnonzero((scores > 0) & ~dead)
+        ids = np.concatenate([np.asarray(self.base["doc_ids"]), np.asarray(self.delta_ids, dtype=np.int64)])
+        return ids[hit], scores[hit]
+
+    def search(
+        self,
+        query: str,
+        allowed_ids: Optional[Iterable[int]] = None,
+        limit: int = 100,
+        exclude_ids: Iterable[int] = (),
+        query_terms: Optional[Dict[str, float]] = None,
+    ) -> List[Tuple[int, float]]:
+        """按 BM25 分数降序返回 [(journals.id, score)]；allowed_ids 用于叠加 /search 的过滤条件。"""
+        self.refresh()
+        terms = query_terms if query_terms is not None else dict(Counter(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            ids, scores = self._score(terms)
+        keep = np.ones(len(ids), dtype=bool)
+        if allowed_ids is not None:
+            keep &= np.isin(ids, np.fromiter(allowed_ids, dtype=np.int64))
+        exclude = list(exclude_ids)
+        if exclude:
+            keep &= ~np.isin(ids, np.asarray(exclude, dtype=np.int64))
+        ids, scores = ids[keep], scores[keep]
+        if limit and len(ids) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            ids, scores = ids[top], scores[top]
+        # 分数相同时按 id 倒序（较新的文章在前）
+        order = np.lexsort((-ids, -scores))
+        return [(int(ids[i]), round(float(scores[i]), 4)) for i in order]
+
+    def more_like_this(self, row_id: int, limit: int = 10, max_terms: int = 25) -> List[Tuple[int, float]]:
+        """用文章自身 TF-IDF 权重最高的 max_terms 个词作为查询，返回相似文章（不含自身）。"""
+        self.refresh()
+        with self.db.read() as conn:
+            row = conn.execute("SELECT title, abstract FROM journals WHERE id = ?", (row_id,)).fetchone()
+        if row is None:
+            return []
+        terms = document_terms(*row)
+        with self._lock:
+            n_docs = max(len(self.base["doc_ids"]) + len(self.delta_ids), 1)
+            weighted = {}
+            for term, tf in terms.items():
+                t = self.vocab.get(term)
+                df = (self.base_df[t] if t is not None else 0) + len(self.delta_postings.get(term, ()))
+                weighted[term] = tf * math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        top_terms = dict(sorted(weighted.items(), key=lambda kv: kv[1], reverse=True)[:max_terms])
+        return self.search("", limit=limit, exclude_ids=[row_id], query_terms=top_terms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "index_dir": str(self.index_dir),
+                "base_docs": int(len(self.base["doc_ids"])),
+                "delta_docs": len(self.delta_ids),
+                "alive_docs": self.alive_count(),
+                "terms": len(self.vocab),
+                "max_id": self.max_id,
+                "max_version": self.max_version,
+            }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import DATABASE_PATH, RELEVANCE_INDEX_DIR
+    from utils.db import Database
+    from utils.migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Build the BM25 relevance index over titles and abstracts.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database path")
+    parser.add_argument("--index-dir", default=RELEVANCE_INDEX_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="rebuild the index from the journals table")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    with db.write() as conn:
+        run_migrations(conn)
+    count = BM25Index(db, args.index_dir, load=False).rebuild()
+    print(f"Built BM25 index with {count} documents at {args.index_dir}")
+    db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+journals 表的列式快照导出与批量导入。
+
+导出: 按批次把 journals 表写成 Parquet / Arrow IPC 文件，日期转为 date32，作者转为字符串列表，
+便于用 pyarrow / pandas / DuckDB 做按年份、按期刊的聚合分析。
+导入: 把快照文件或另一个 journals.db 合并进当前数据库，按 url / doi 去重。摘要按原文导入，
+再按当前库的压缩设置（config.ABSTRACT_COMPRESSION 和库中的字典）重新编码；源库的压缩摘要先用源库自己的字典解压。
+
+用法:
+    python -m utils.snapshot export snapshots/journals.parquet
+    python -m utils.snapshot import snapshots/journals.parquet
+    python -m utils.snapshot import /path/to/other/journals.db
+"""
+import argparse
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.compression import (attach as attach_compression, configure as configure_compression, decode_abstract,
+                               encode_abstract, source_codec)
+from utils.ingest import normalize_date_iso, normalize_doi
+from utils.migrations import run_migrations
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，仅导出/导入快照时需要
+    pa = None
+    pa_ipc = None
+    pq = None
+
+DEFAULT_BATCH_SIZE = 50000
+NO_AUTHORS = "No authors found"
+ARROW_SUFFIXES = {".arrow", ".feather", ".ipc"}
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+ARTICLE_COLUMNS = ["journal_code", "title", "url", "doi", "date", "authors", "abstract", "date_iso"]
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("pyarrow is required for snapshot export/import. Install it with: pip install pyarrow")
+
+
+def _snapshot_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("journal_code", pa.dictionary(pa.int32(), pa.string())),
+        ("title", pa.string()),
+        ("url", pa.string()),
+        ("doi", pa.string()),
+        ("date", pa.string()),
+        ("date_iso", pa.date32()),
+        ("authors", pa.list_(pa.string())),
+        ("abstract", pa.string()),
+    ])
+
+
+def split_authors(authors: Optional[str]) -> List[str]:
+    """把以 ', ' 连接的作者字符串拆成列表，占位符 'No authors found' 视为空列表。"""
+    if not authors or authors == NO_AUTHORS:
+        return []
+    return [a.strip() for a in authors.split(',') if a.strip()]
+
+
+def join_authors(authors: Optional[List[str]]) -> str:
+    return ', '.join(authors) if authors else NO_AUTHORS
+
+
+def _to_date(date_iso: Optional[str], raw_date: Optional[str]) -> Optional[date]:
+    date_iso = date_iso or normalize_date_iso(raw_date)
+    if not date_iso:
+        return None
+    try:
+        return date.fromisoformat(date_iso)
+    except ValueError:
+        return None
+
+
+def _iter_row_batches(conn: sqlite3.Connection, batch_size: int) -> Iterator[List[tuple]]:
+    c = conn.cursor()
+    c.execute("SELECT id, journal_code, title, url, doi, date, date_iso, authors, abstract FROM journals ORDER BY id")
+    while True:
+        rows = c.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def _rows_to_record_batch(rows: List[tuple], schema) -> "pa.RecordBatch":
+    columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+    for row_id, journal_code, title, url, doi, raw_date, date_iso, authors, abstract in rows:
+        columns["id"].append(row_id)
+        columns["journal_code"].append(journal_code)
+        columns["title"].append(title)
+        columns["url"].append(url)
+        columns["doi"].append(doi)
+        columns["date"].append(raw_date)
+        columns["date_iso"].append(_to_date(date_iso, raw_date))
+        columns["authors"].append(split_authors(authors))
+        columns["abstract"].append(decode_abstract(abstract))
+    arrays = [pa.array(columns[field.name], type=field.type) for field in schema]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_snapshot(db_path: str, out_path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    把 journals 表按批次导出为 Parquet（默认）或 Arrow IPC 文件（后缀 .arrow/.feather/.ipc）。
+    返回导出的行数。
+    """
+    _require_pyarrow()
+    schema = _snapshot_schema()
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    use_arrow = out.suffix.lower() in ARROW_SUFFIXES
+
+    conn = sqlite3.connect(db_path)
+    # 压缩存储的摘要导出为原文
+    attach_compression(conn)
+    total = 0
+    try:
+        if use_arrow:
+            writer = pa_ipc.new_file(str(out), schema)
+        else:
+            writer = pq.ParquetWriter(str(out), schema, compression="zstd")
+        try:
+            for rows in _iter_row_batches(conn, batch_size):
+                writer.write_batch(_rows_to_record_batch(rows, schema))
+                total += len(rows)
+                print(f"Snapshot: exported {total} rows...")
+        finally:
+            writer.close()
+    finally:
+        conn.close()
+    return total
+
+
+def _iter_snapshot_batches(src: Path, batch_size: int) -> Iterator["pa.RecordBatch"]:
+    if src.suffix.lower() in ARROW_SUFFIXES:
+        with pa.memory_map(str(src), "r") as source:
+            reader = pa_ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+    else:
+        parquet_file = pq.ParquetFile(str(src))
+        yield from parquet_file.iter_batches(batch_size=batch_size)
+
+
+def _record_batch_to_rows(batch) -> List[tuple]:
+    data = batch.to_pydict()
+    rows = []
+    for i in range(batch.num_rows):
+        raw_date = data["date"][i]
+        date_iso = data["date_iso"][i]
+        date_iso = date_iso.isoformat() if date_iso else normalize_date_iso(raw_date)
+        rows.append((
+            data["journal_code"][i],
+            data["title"][i],
+            data["url"][i],
+            normalize_doi(data["doi"][i]),
+            raw_date,
+            join_authors(data["authors"][i]),
+            encode_abstract(data["abstract"][i]),
+            date_iso,
+        ))
+    return rows
+
+
+# url 冲突由 UNIQUE 约束忽略；（规范化后的）doi 既不能与库中已有行重复，也不能在同一批次内重复
+_MERGE_STAGING_SQL = f"""
+    INSERT OR IGNORE INTO main.journals ({', '.join(ARTICLE_COLUMNS)})
+    SELECT {', '.join('s.' + col for col in ARTICLE_COLUMNS)} FROM temp.snapshot_staging s
+    WHERE s.doi IS NULL
+       OR (NOT EXISTS (SELECT 1 FROM main.journals j WHERE j.doi = s.doi)
+           AND s.rowid = (SELECT MIN(d.rowid) FROM temp.snapshot_staging d WHERE d.doi = s.doi))
+"""
+
+
+def _merge_staging(conn: sqlite3.Connection) -> int:
+    # 用 rowcount 而不是 total_changes，后者会把统计表触发器的写入也算进去
+    return conn.execute(_MERGE_STAGING_SQL).rowcount
+
+
+def _import_sqlite(conn: sqlite3.Connection, src: Path) -> int:
+    conn.execute("ATTACH DATABASE ? AS src", (str(src),))
+    try:
+        src_columns = {row[1] for row in conn.execute("PRAGMA src.table_info(journals)")}
+        if not src_columns:
+            raise ValueError(f"No journals table found in {src}")
+        # 旧版数据库可能没有 date_iso 列，导入后由启动时的后台回填补齐
+        select_cols = [col if col in src_columns else "NULL" for col in ARTICLE_COLUMNS]
+        if "doi" in src_columns:
+            select_cols[ARTICLE_COLUMNS.index("doi")] = "normalize_doi(doi)"
+        if "abstract" in src_columns:
+            # 源库的压缩摘要用源库的字典解压，再按目标库的设置编码
+            abstract = "abstract"
+            decoder = source_codec(conn, "src")
+            if decoder is not None:
+                conn.create_function("src_abstract_text", 1, decoder.decode, deterministic=True)
+                abstract = "src_abstract_text(abstract)"
+            select_cols[ARTICLE_COLUMNS.index("abstract")] = f"encode_abstract({abstract})"
+        with conn:
+            conn.execute(f"INSERT INTO snapshot_staging SELECT {', '.join(select_cols)} FROM src.journals")
+            return _merge_staging(conn)
+    finally:
+        conn.execute("DETACH DATABASE src")
+
+
+def _import_snapshot_file(conn: sqlite3.Connection, src: Path, batch_size: int) -> int:
+    _require_pyarrow()
+    inserted = 0
+    for batch in _iter_snapshot_batches(src, batch_size):
+        with conn:
+            conn.execute("DELETE FROM snapshot_staging")
+            conn.executemany(
+                f"INSERT INTO snapshot_staging VALUES ({', '.join('?' for _ in ARTICLE_COLUMNS)})",
+                _record_batch_to_rows(batch)
+            )
+            inserted += _merge_staging(conn)
+        print(f"Snapshot: merged {inserted} new rows so far...")
+    return inserted
+
+
+def import_snapshot(db_path: str, src_path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    把 Parquet / Arrow 快照或另一个 journals.db 合并到 db_path，已存在的 url 或 doi 会被跳过。
+    返回 {"inserted": 新增行数, "seconds": 耗时}。
+    """
+    src = Path(src_path)
+    if not src.exists():
+        raise FileNotFoundError(f"Snapshot source not found: {src_path}")
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        # 目标库可能还没被应用启动过，先补齐表结构（包括 doi 唯一索引）
+        run_migrations(conn)
+        conn.create_function("normalize_doi", 1, normalize_doi, deterministic=True)
+        # 载入目标库的字典，导入的摘要按目标库的设置压缩
+        attach_compression(conn)
+        conn.create_function("encode_abstract", 1, encode_abstract)
+        conn.execute(f"CREATE TEMP TABLE snapshot_staging ({', '.join(ARTICLE_COLUMNS)})")
+        conn.execute("CREATE INDEX temp.idx_snapshot_staging_doi ON snapshot_staging(doi)")
+        if src.suffix.lower() in SQLITE_SUFFIXES:
+            inserted = _import_sqlite(conn, src)
+        else:
+            inserted = _import_snapshot_file(conn, src, batch_size)
+    finally:
+        conn.close()
+    return {"inserted": inserted, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import DATABASE_PATH, ABSTRACT_COMPRESSION, ABSTRACT_ZSTD_LEVEL, ABSTRACT_MIN_BYTES
+
+    parser = argparse.ArgumentParser(description="Export/import columnar snapshots of the journals table.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database path")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="write journals to a .parquet or .arrow file")
+    export_cmd.add_argument("out_path")
+    import_cmd = sub.add_parser("import", help="merge a snapshot or another journals.db into --db")
+    import_cmd.add_argument("src_path")
+    args = parser.parse_args(argv)
+
+    configure_compression(write=ABSTRACT_COMPRESSION, level=ABSTRACT_ZSTD_LEVEL, min_bytes=ABSTRACT_MIN_BYTES)
+    if args.command == "export":
+        total = export_snapshot(args.db, args.out_path, batch_size=args.batch_size)
+        print(f"Exported {total} rows to {args.out_path}")
+    else:
+        result = import_snapshot(args.db, args.src_path, batch_size=args.batch_size)
+        print(f"Imported {result['inserted']} new rows from {args.src_path} in {result['seconds']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+增量维护的期刊统计表。
+
+journal_stats 表按 (journal_code, granularity, period) 保存文章数、缺失摘要数和缺失日期数:
+    granularity = 'all'   period = ''          该期刊总计
+    granularity = 'year'  period = 'YYYY'
+    granularity = 'month' period = 'YYYY-MM'
+journals 表上的触发器在插入/删除/更新时增量修改计数，统计接口只需读取这张小表。
+触发器之外的批量改动（或怀疑计数漂移）时，用 rebuild 重新计算:
+
+    python -m utils.stats rebuild
+"""
+import argparse
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+GRANULARITIES = ("all", "year", "month")
+
+# 与 AcsJournalParser 的占位符保持一致
+_MISSING_ABSTRACT_SQL = "({row}.abstract IS NULL OR {row}.abstract = '' OR {row}.abstract = 'No abstract found')"
+
+
+def _periods_sql(row: str) -> str:
+    """为一行文章生成其所属的 (granularity, period) 集合。"""
+    return (
+        "SELECT 'all' AS granularity, '' AS period "
+        f"UNION ALL SELECT 'year', substr({row}.date_iso, 1, 4) WHERE {row}.date_iso IS NOT NULL "
+        f"UNION ALL SELECT 'month', substr({row}.date_iso, 1, 7) WHERE {row}.date_iso IS NOT NULL"
+    )
+
+
+def _apply_delta_sql(row: str, sign: int) -> str:
+    missing_abstract = _MISSING_ABSTRACT_SQL.format(row=row)
+    return f"""
+        INSERT INTO journal_stats (journal_code, granularity, period, article_count, missing_abstract, missing_date)
+        SELECT {row}.journal_code, p.granularity, p.period, {sign}, {sign} * {missing_abstract}, {sign} * ({row}.date_iso IS NULL)
+        FROM ({_periods_sql(row)}) p
+        WHERE 1
+        ON CONFLICT(journal_code, granularity, period) DO UPDATE SET
+            article_count = article_count + excluded.article_count,
+            missing_abstract = missing_abstract + excluded.missing_abstract,
+            missing_date = missing_date + excluded.missing_date;"""
+
+
+_PRUNE_SQL = "DELETE FROM journal_stats WHERE journal_code = OLD.journal_code AND article_count <= 0;"
+
+STATS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS journal_stats (
+    journal_code TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    period TEXT NOT NULL,
+    article_count INTEGER NOT NULL DEFAULT 0,
+    missing_abstract INTEGER NOT NULL DEFAULT 0,
+    missing_date INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (journal_code, granularity, period)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_journals_stats_insert AFTER INSERT ON journals BEGIN
+    {_apply_delta_sql('NEW', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_journals_stats_delete AFTER DELETE ON journals BEGIN
+    {_apply_delta_sql('OLD', -1)}
+    {_PRUNE_SQL}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_journals_stats_update AFTER UPDATE OF journal_code, date_iso, abstract ON journals BEGIN
+    {_apply_delta_sql('OLD', -1)}
+    {_apply_delta_sql('NEW', 1)}
+    {_PRUNE_SQL}
+END;
+"""
+
+
+def install_stats(conn: sqlite3.Connection) -> None:
+    """创建统计表和触发器；统计表是新建的时候顺带从 journals 全量计算一次。"""
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'journal_stats'"
+    ).fetchone()
+    conn.executescript(STATS_SCHEMA)
+    if not existed:
+        rebuild_stats(conn)
+
+
+def rebuild_stats(conn: sqlite3.Connection) -> int:
+    """清空并从 journals 表重新计算全部统计，返回写入的统计行数。"""
+    missing_abstract = _MISSING_ABSTRACT_SQL.format(row="j")
+    conn.execute("DELETE FROM journal_stats")
+    for granularity, period_expr, where in (
+        ("all", "''", ""),
+        ("year", "substr(j.date_iso, 1, 4)", "WHERE j.date_iso IS NOT NULL"),
+        ("month", "substr(j.date_iso, 1, 7)", "WHERE j.date_iso IS NOT NULL"),
+    ):
+        conn.execute(f"""
+            INSERT INTO journal_stats (journal_code, granularity, period, article_count, missing_abstract, missing_date)
+            SELECT j.journal_code, '{granularity}', {period_expr}, COUNT(*),
+                   SUM({missing_abstract}), SUM(j.date_iso IS NULL)
+            FROM journals j {where}
+            GROUP BY j.journal_code, {period_expr}
+        """)
+    conn.commit()
+    return conn.execute("SELECT COUNT(*) FROM journal_stats").fetchone()[0]
+
+
+def read_journal_totals(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """各期刊的总计，期刊名称取自 journal_meta（未登记的期刊为 'Unknown'）。"""
+    rows = conn.execute(
+        "SELECT s.journal_code, COALESCE(m.name, 'Unknown'), s.article_count, s.missing_abstract, s.missing_date "
+        "FROM journal_stats s LEFT JOIN journal_meta m ON m.code = s.journal_code "
+        "WHERE s.granularity = 'all' ORDER BY s.journal_code"
+    ).fetchall()
+    return [
+        {"journal_code": code, "journal_name": name, "count": count,
+         "missing_abstract": missing_abstract, "missing_date": missing_date}
+        for code, name, count, missing_abstract, missing_date in rows
+    ]
+
+
+def read_period_stats(
+    conn: sqlite3.Connection,
+    granularity: str = "year",
+    journal_code: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    query = (
+        "SELECT journal_code, period, article_count, missing_abstract, missing_date FROM journal_stats "
+        "WHERE granularity = ?"
+    )
+    params: List[Any] = [granularity]
+    if journal_code:
+        query += " AND journal_code = ?"
+        params.append(journal_code)
+    query += " ORDER BY journal_code, period"
+    return [
+        {"journal_code": code, "period": period, "count": count, "missing_abstract": missing_abstract, "missing_date": missing_date}
+        for code, period, count, missing_abstract, missing_date in conn.execute(query, params).fetchall()
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config import DATABASE_PATH
+
+    parser = argparse.ArgumentParser(description="Maintain the materialised journal_stats table.")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="recompute journal_stats from the journals table")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.executescript(STATS_SCHEMA)
+        rows = rebuild_stats(conn)
+        print(f"Rebuilt journal_stats: {rows} rows")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())